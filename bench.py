@@ -0,0 +1,360 @@
+# =====================================================================
+# BENCHMARKS — synthetic trees, timings, JSON results (no display needed)
+# =====================================================================
+#   python bench.py run [--nodes N] [--fan-in K] [--fan-out K] [--text-words W] [--spread PX] [--out FILE]
+#   python bench.py compare OLD.json NEW.json
+#   python bench.py generate OUT [same tree options]    (write a synthetic tree to open in the editor)
+#
+# Runs the editor's own code (main.py) under SDL's dummy video driver and
+# measures loading and saving, frame times for draw_links + Mission.draw,
+# hit testing and peak memory. Results go to a JSON file per run, named
+# after the commit, so two commits can be compared with "compare".
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Unix only: no process_max_rss on Windows
+    resource = None
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import tree_io
+
+RESULTS_DIR = "bench_results"
+WORDS = ("Power", "Tungsten", "Research", "Habitat", "Rover", "Battery", "Scanner", "Probe", "Trade",
+         "Platform", "Medium", "Large", "Small", "Deep", "Core", "Solar", "Wind", "Storage", "Drill",
+         "Printer", "Shuttle", "Oxygen", "Tether", "Smelter", "Furnace", "Canister", "Hydrazine")
+COLORS = ("#3FA9F5", "#F5D76E", "#7ED957", "#F58A3F", "#C08AF5")
+FRAMES = 120        # frames per scenario
+HIT_TESTS = 2000
+
+
+# =====================================================================
+# SYNTHETIC TREES
+# =====================================================================
+def generate_tree(nodes, fan_in=3, fan_out=8, text_words=4, spread=260, seed=1):
+    """Records for a made-up tree, the same for the same arguments.
+
+    Missions sit on a jittered grid, spread px apart, in creation order. Each one
+    (except about 2% roots) depends on 1..fan_in missions from the few rows above
+    it, and no mission gets more than fan_out dependents.
+    """
+    rng = random.Random(seed)
+    cols = max(1, math.ceil(math.sqrt(nodes)))
+    window = 4 * cols   # dependencies come from roughly the last four rows
+    dependents = [0] * (nodes + 1)
+    records = []
+    for mid in range(1, nodes + 1):
+        i = mid - 1
+        deps = []
+        if mid > 1 and rng.random() >= 0.02:
+            lo = max(1, mid - window)
+            for _ in range(rng.randint(1, fan_in)):
+                for _ in range(8):  # a few tries at a mission that still has room
+                    d = rng.randint(lo, mid - 1)
+                    if d not in deps and dependents[d] < fan_out:
+                        deps.append(d)
+                        dependents[d] += 1
+                        break
+        jitter = spread // 8
+        records.append({
+            "id": mid,
+            "x": (i % cols) * spread + rng.randint(-jitter, jitter),
+            "y": (i // cols) * spread // 2 + rng.randint(-jitter, jitter),
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, text_words))),
+            "type": "special" if rng.random() < 0.05 else "normal",
+            "color": rng.choice(COLORS),
+            "logic": "OR" if rng.random() < 0.2 else "AND",
+            "dependencies": deps,
+            "mission": {"desc": f"Synthetic mission {mid}", "task": "", "item": "", "rwrd": ""},
+        })
+    return records
+
+
+# =====================================================================
+# MEASURING
+# =====================================================================
+def _timed(fn, *args, **kwargs):
+    t = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - t
+
+
+def _summary(samples, scale=1000):
+    """p50 / p99 / mean / max of samples (seconds), in ms unless scale says otherwise."""
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return {
+        "p50": round(statistics.median(samples) * scale, 4),
+        "p99": round(p99 * scale, 4),
+        "mean": round(statistics.fmean(samples) * scale, 4),
+        "max": round(samples[-1] * scale, 4),
+    }
+
+
+def _setup_editor(folder):
+    """Import the editor with fonts + a dummy window, journaling into a scratch folder."""
+    import main as app
+    from journal import Journal
+    pygame.init()
+    app.init_fonts()
+    app.screen = pygame.display.set_mode((app.WIDTH, app.HEIGHT))
+    app.journal = Journal(os.path.join(folder, "journal"))
+    app.PAGED_MIN_MISSIONS = float("inf")  # the numbers are for the whole tree in memory
+    return app
+
+
+def _frames(app, cameras, zoom=1.0):
+    """Full redraws at each camera position (screen px at that zoom):
+    time of draw_links, of the missions and of the whole frame."""
+    app.set_zoom(zoom, (0, 0))
+    links, nodes, frames = [], [], []
+    for cx, cy in cameras:
+        app.camera_x, app.camera_y = cx, cy
+        t0 = time.perf_counter()
+        app.draw_links()
+        t1 = time.perf_counter()
+        if app.zoom >= app.DETAIL_ZOOM:
+            for m in app.visible_missions():
+                m.draw(app.screen)
+        t2 = time.perf_counter()
+        pygame.display.flip()
+        t3 = time.perf_counter()
+        links.append(t1 - t0)
+        nodes.append(t2 - t1)
+        frames.append(t3 - t0)
+    app.set_zoom(1.0, (0, 0))
+    return {"draw_links_ms": _summary(links), "missions_draw_ms": _summary(nodes), "frame_ms": _summary(frames)}
+
+
+def run_benchmark(params, repeat=3, log=print):
+    records = generate_tree(**params)
+    folder = tempfile.mkdtemp(prefix="mtm-bench-")
+    results = {}
+    try:
+        json_path = os.path.join(folder, "tree.anrmt")
+        bin_path = os.path.join(folder, "tree.anrmtb")
+        tree_io.save_records(records, json_path)
+        tree_io.save_records(records, bin_path)
+        results["file_bytes"] = {"json": os.path.getsize(json_path), "binary": os.path.getsize(bin_path)}
+
+        app = _setup_editor(folder)
+
+        log("loading")
+        for name, path in (("load_binary_s", bin_path), ("load_json_s", json_path)):
+            times = [_timed(app.load_file, path) for _ in range(repeat)]
+            results[name] = round(min(times), 4)
+        if len(app.missions) != len(records):
+            raise RuntimeError(f"loaded {len(app.missions)} of {len(records)} missions")
+
+        log("saving")
+        out = os.path.join(folder, "saved")
+        snapshot = lambda: [m.record() for m in app.missions]
+        results["snapshot_s"] = round(min(_timed(snapshot) for _ in range(repeat)), 4)
+        recs = snapshot()
+        for name, kwargs in (("save_json_s", {}), ("save_compact_s", {"compact": True}),
+                             ("save_binary_s", {"binary": True})):
+            times = [_timed(tree_io.save_records, recs, out, **kwargs) for _ in range(repeat)]
+            results[name] = round(min(times), 4)
+
+        log("drawing")
+        rects = [m.rect for m in app.missions]
+        bounds = rects[0].unionall(rects[1:])
+        rng = random.Random(params["seed"])
+        start = (-bounds.x, -bounds.y)
+        pan = [(start[0] - 5 * k, start[1] - 2 * k) for k in range(FRAMES)]   # WASD-style scrolling
+        jumps = [(-rng.randint(bounds.x, max(bounds.x, bounds.right - app.WIDTH)),
+                  -rng.randint(bounds.y, max(bounds.y, bounds.bottom - app.HEIGHT))) for _ in range(FRAMES)]
+        far = app.ZOOM_LEVELS[1]
+        app.draw_links()  # link layer made once, like the first frame after a load
+        results["frames"] = {
+            "pan": _frames(app, pan),
+            "jump": _frames(app, jumps),
+            "zoomed_out_pan": _frames(app, [(round(start[0] * far) - 5 * k, round(start[1] * far) - 2 * k)
+                                            for k in range(FRAMES)], zoom=far),
+        }
+
+        log("hit testing")
+        hits = []
+        found = 0
+        for _ in range(HIT_TESTS):
+            m = rng.choice(rects)
+            app.camera_x = app.WIDTH // 2 - m.centerx + rng.randint(-300, 300)
+            app.camera_y = app.HEIGHT // 2 - m.centery + rng.randint(-200, 200)
+            pos = (rng.randrange(app.WIDTH), rng.randrange(app.HEIGHT))
+            t = time.perf_counter()
+            found += app.mission_at(pos) is not None
+            hits.append(time.perf_counter() - t)
+        results["hit_test_us"] = _summary(hits, scale=1e6)
+        results["hit_test_found"] = found
+
+        log("memory")
+        app.clear_tree()
+        tracemalloc.start()
+        app.load_file(json_path)
+        _, peak = tracemalloc.get_traced_memory()
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results["memory_mb"] = {
+            "load_peak": round(peak / 2 ** 20, 2),
+            "tree_resident": round(current / 2 ** 20, 2),
+        }
+        if resource is not None:
+            results["memory_mb"]["process_max_rss"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+        app.journal.close()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+# =====================================================================
+# COMPARING
+# =====================================================================
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(old, new, threshold=0.10):
+    """Lines describing every metric; the ones more than threshold worse are marked (and counted)."""
+    a = _flatten(old["results"])
+    b = _flatten(new["results"])
+    lines = []
+    worse = 0
+    for key in sorted(a.keys() & b.keys()):
+        if key.startswith("hit_test_found"):
+            continue
+        before, after = a[key], b[key]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if key.endswith(".max"):
+            pass  # single worst samples are too noisy to judge a run by
+        elif change > threshold:
+            flag = "  <-- slower/bigger"
+            worse += 1
+        elif change < -threshold:
+            flag = "  faster/smaller"
+        lines.append(f"{key:40} {before:>12g} {after:>12g} {change:>+8.1%}{flag}")
+    return lines, worse
+
+
+# =====================================================================
+# COMMAND LINE
+# =====================================================================
+def _tree_args(p):
+    p.add_argument("--nodes", type=int, default=10000)
+    p.add_argument("--fan-in", type=int, default=3, help="most dependencies per mission")
+    p.add_argument("--fan-out", type=int, default=8, help="most dependents per mission")
+    p.add_argument("--text-words", type=int, default=4, help="most words in a mission name")
+    p.add_argument("--spread", type=int, default=260, help="px between neighbouring missions")
+    p.add_argument("--seed", type=int, default=1)
+
+
+def _tree_params(args):
+    return {"nodes": args.nodes, "fan_in": args.fan_in, "fan_out": args.fan_out,
+            "text_words": args.text_words, "spread": args.spread, "seed": args.seed}
+
+
+def cmd_run(args):
+    params = _tree_params(args)
+    started = time.time()
+    results = run_benchmark(params, repeat=args.repeat, log=lambda what: print(f"... {what}", file=sys.stderr))
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit or 'unknown'}-{args.nodes}.json")
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=4)
+    for key, value in _flatten(results).items():
+        print(f"{key:40} {value:>12g}")
+    print(f"written to {out}")
+    return 0
+
+
+def cmd_compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old.get("params") != new.get("params"):
+        print("warning: the two runs used different tree parameters", file=sys.stderr)
+    lines, worse = compare(old, new, args.threshold)
+    print(f"{'metric':40} {old.get('commit') or 'old':>12} {new.get('commit') or 'new':>12} {'change':>8}")
+    print("\n".join(lines))
+    return 1 if worse else 0
+
+
+def cmd_generate(args):
+    tree_io.save_records(generate_tree(**_tree_params(args)), args.output)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bench.py", description="Benchmarks for the mission tree editor.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="benchmark a synthetic tree and write the results as JSON")
+    _tree_args(p)
+    p.add_argument("--repeat", type=int, default=3, help="runs of each load/save timing (the best one counts)")
+    p.add_argument("--out", help=f"results file (default: {RESULTS_DIR}/<commit>-<nodes>.json)")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("compare", help="compare two results files (exit 1 if anything got worse)")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=0.10, help="relative change that counts (default 0.10)")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("generate", help="write a synthetic tree (.anrmt, or .anrmtb for binary)")
+    _tree_args(p)
+    p.add_argument("output")
+    p.set_defaults(func=cmd_generate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
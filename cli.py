@@ -0,0 +1,228 @@
+# =====================================================================
+# HEADLESS COMMAND LINE — never touches pygame or tkinter
+# =====================================================================
+#   python cli.py validate FILE [FILE ...]
+#   python cli.py stats FILE [--json]
+#   python cli.py convert IN OUT [--compact]      (OUT ending in .anrmtb = binary)
+#   python cli.py export IN OUT [--format csv|dot|svg|png] [--workers N]
+#   python cli.py rewards FILE [--id ID ...] [--json]
+#   python cli.py diff OLD NEW [--json]
+#   python cli.py merge BASE OURS THEIRS -o OUT [--compact]
+# (png is the one format that needs pygame, imported only when asked for)
+import argparse
+import csv
+import json
+import os
+import sys
+
+import export_svg
+import rewards
+import tree_io
+import treediff
+from tree_io import MISSION_FIELDS, TreeFileError
+
+
+def cmd_validate(args):
+    failed = 0
+    for path in args.files:
+        try:
+            problems = tree_io.validate_records(tree_io.load_records(path))
+        except (OSError, TreeFileError) as ex:
+            problems = [str(ex)]
+        if problems:
+            failed += 1
+            for p in problems:
+                print(f"{path}: {p}")
+        elif not args.quiet:
+            print(f"{path}: OK")
+    return 1 if failed else 0
+
+
+def cmd_stats(args):
+    stats = tree_io.tree_stats(tree_io.load_records(args.file))
+    if args.json:
+        print(json.dumps(stats, indent=4))
+    else:
+        for key, value in stats.items():
+            print(f"{key}: {value}")
+    return 0
+
+
+def cmd_convert(args):
+    records = tree_io.load_records(args.input)
+    tree_io.save_records(records, args.output, compact=args.compact)
+    return 0
+
+
+def _dot_string(s):
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+EXPORT_EXTENSIONS = {".dot": "dot", ".gv": "dot", ".svg": "svg", ".png": "png"}
+
+
+def cmd_export(args):
+    records = tree_io.load_records(args.input)
+    fmt = args.format or EXPORT_EXTENSIONS.get(os.path.splitext(args.output)[1].lower(), "csv")
+
+    if fmt == "svg":
+        export_svg.write_svg(records, args.output)
+    elif fmt == "png":
+        import export_png
+        export_png.export_png(records, args.output, workers=args.workers)
+    elif fmt == "csv":
+        with open(args.output, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["id", "x", "y", "text", "type", "color", "logic", "dependencies", *MISSION_FIELDS])
+            for r in records:
+                w.writerow([
+                    r["id"], r["x"], r["y"], r["text"], r["type"], r["color"], r["logic"],
+                    ";".join(str(d) for d in r["dependencies"]),
+                    *(r["mission"][field] for field in MISSION_FIELDS),
+                ])
+    else:
+        with open(args.output, "w") as f:
+            f.write("digraph missions {\n    node [shape=box, style=\"rounded,filled\"];\n")
+            for r in records:
+                color = "#AAAAAA" if r["type"] == "special" else r["color"]
+                f.write(f"    {r['id']} [label={_dot_string(r['text'])}, fillcolor={_dot_string(color)}];\n")
+            for r in records:
+                for d in r["dependencies"]:
+                    f.write(f"    {d} -> {r['id']};\n")
+            f.write("}\n")
+    return 0
+
+
+def cmd_rewards(args):
+    records = tree_io.load_records(args.file)
+    reach, problems = rewards.aggregate_records(records)
+    wanted = set(args.id) if args.id else None
+    report = []
+    for r in records:
+        if wanted is not None and r["id"] not in wanted:
+            continue
+        totals = reach.get(r["id"])
+        report.append({
+            "id": r["id"],
+            "text": r["text"],
+            "missions": None if totals is None else totals.missions,
+            "via": None if totals is None else totals.via,
+            "tasks": None if totals is None else [[a, b, n] for (a, b), n in sorted(totals.tasks.items())],
+            "rewards": None if totals is None else [[a, b, n] for (a, b), n in sorted(totals.rewards.items())],
+            "problems": problems.get(r["id"], []),
+        })
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        for row in report:
+            print(f"{row['id']}: {row['text']}")
+            for p in row["problems"]:
+                print(f"    ! {p}")
+            totals = reach.get(row["id"])
+            if totals is None:
+                print("    on a dependency cycle")
+                continue
+            print(f"    missions: {totals.missions}" + (f" (via {totals.via})" if totals.via is not None else ""))
+            print(f"    tasks:    {rewards.describe(totals.tasks) or '-'}")
+            print(f"    rewards:  {rewards.describe(totals.rewards) or '-'}")
+    return 1 if any(row["problems"] for row in report) else 0
+
+
+def cmd_diff(args):
+    old = tree_io.load_records(args.old)
+    new = tree_io.load_records(args.new)
+    d = treediff.diff(old, new)
+    if args.json:
+        print(json.dumps(d._asdict(), indent=4))
+    else:
+        names = {r["id"]: r["text"] for r in old}
+        names.update((r["id"], r["text"]) for r in new)
+        for mid in d.added:
+            print(f"+ {mid} {names[mid]!r}")
+        for mid in d.removed:
+            print(f"- {mid} {names[mid]!r}")
+        for mid, fields in d.changed.items():
+            print(f"~ {mid} {names[mid]!r}: {', '.join(fields)}")
+        for dep, mid in d.links_added:
+            print(f"+ link {dep} -> {mid}")
+        for dep, mid in d.links_removed:
+            print(f"- link {dep} -> {mid}")
+        print(treediff.summary(d))
+    return 1 if d.added or d.removed or d.changed else 0
+
+
+def cmd_merge(args):
+    records, conflicts = treediff.merge3(
+        tree_io.load_records(args.base), tree_io.load_records(args.ours), tree_io.load_records(args.theirs))
+    tree_io.save_records(records, args.output, compact=args.compact)
+    for c in conflicts:
+        print(f"conflict: {treediff.describe_conflict(c)}")
+    # e.g. both sides adding links that close a cycle between them
+    problems = [p for p in tree_io.validate_records(records) if "unresolved merge conflict" not in p]
+    for p in problems:
+        print(f"problem: {p}")
+    print(f"{args.output}: {len(records)} missions, {len(conflicts)} conflicts")
+    return 1 if conflicts or problems else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Headless tools for .anrmt mission trees.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("validate", help="check files for broken ids, dependencies and cycles")
+    p.add_argument("files", nargs="+")
+    p.add_argument("-q", "--quiet", action="store_true", help="only print problems")
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("stats", help="print counts, depth and bounds of a tree")
+    p.add_argument("file")
+    p.add_argument("--json", action="store_true", help="machine-readable output")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("convert", help="rewrite a tree (indented/compact JSON, or binary for .anrmtb)")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--compact", action="store_true", help="no indentation")
+    p.set_defaults(func=cmd_convert)
+
+    p = sub.add_parser("export", help="export a tree as CSV, Graphviz DOT or an SVG/PNG image")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--format", choices=("csv", "dot", "svg", "png"), help="default: from the output extension")
+    p.add_argument("--workers", type=int, help="processes rendering PNG tiles (default: one per core)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("rewards", help="task and reward totals of reaching each mission")
+    p.add_argument("file")
+    p.add_argument("--id", type=int, action="append", help="only this mission (can be repeated)")
+    p.add_argument("--json", action="store_true", help="machine-readable output")
+    p.set_defaults(func=cmd_rewards)
+
+    p = sub.add_parser("diff", help="added, removed and changed missions and links between two trees")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--json", action="store_true", help="machine-readable output")
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser("merge", help="three-way merge of two edited copies of a tree")
+    p.add_argument("base", help="the version both copies started from")
+    p.add_argument("ours")
+    p.add_argument("theirs")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--compact", action="store_true", help="no indentation")
+    p.set_defaults(func=cmd_merge)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, TreeFileError) as ex:
+        print(f"error: {ex}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# =====================================================================
+# PNG EXPORT — the whole tree, rendered off-screen in tiles
+# =====================================================================
+# The image is cut into TILE_SIZE x TILE_SIZE tiles, grouped in strips (one
+# row of tiles). Worker processes (one per core by default) each build the
+# tree once, then take a strip at a time: render its tiles with the canvas'
+# own drawing code (a LinkLayer for the arrows, Mission.paint for the boxes),
+# turn them into PNG rows and deflate them. Compressed strips can simply be
+# glued together (the same trick pigz uses), so the main process only writes
+# them out in order. Memory stays at a strip per worker however big the tree is.
+import multiprocessing
+import os
+import struct
+import zlib
+
+import pygame
+
+from linklayer import ARROW_SIZE, LinkLayer
+
+TILE_SIZE = 256
+PAD = 40              # empty border around the tree
+COMPRESS_LEVEL = 6
+ADLER_BASE = 65521
+
+
+def _chunk(f, tag, data):
+    f.write(struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+
+def adler32_combine(a, b, len_b):
+    """Adler-32 of two pieces of data glued together, from the checksums of each piece."""
+    rem = len_b % ADLER_BASE
+    s1 = ((a & 0xFFFF) + (b & 0xFFFF) - 1) % ADLER_BASE
+    s2 = (rem * (a & 0xFFFF) + (a >> 16) + (b >> 16) - rem) % ADLER_BASE
+    return s1 | (s2 << 16)
+
+
+# =====================================================================
+# WORKERS
+# =====================================================================
+_app = None   # the editor module, with the tree loaded into it
+
+
+def _init_worker(records, checked):
+    global _app
+    import main as app  # a fresh process: its globals are ours to fill
+    app.init_fonts()
+    app.build_tree(records)
+    for mid in checked:
+        m = app.missions.get(mid)
+        if m is not None:
+            m.checked = True
+    for m in app.missions:
+        app.recount_done(m)
+    _app = app
+
+
+def _bounds():
+    """(left, top, right, bottom) of the image."""
+    rects = [m.rect for m in _app.missions]
+    if not rects:
+        return 0, 0, 2 * PAD, 2 * PAD
+    box = rects[0].unionall(rects[1:])
+    return box.x - PAD, box.y - PAD, box.right + PAD, box.bottom + PAD
+
+
+def _render_tile(tile):
+    """RGB bytes of one world rect (x, y, w, h), drawn like the canvas at zoom 1.
+    None when nothing is there (most of a big, sparse tree)."""
+    rect = pygame.Rect(tile)
+    near = _app.link_index.query_rect(rect.x - ARROW_SIZE, rect.y - ARROW_SIZE,
+                                      rect.width + 2 * ARROW_SIZE, rect.height + 2 * ARROW_SIZE)
+    boxes = _app.visible_missions(tuple(rect))
+    if not near and not boxes:
+        return None
+    surf = pygame.Surface(rect.size)
+
+    layer = LinkLayer(_app.BG_COLOR, margin=0)
+    for m, d in near:
+        layer.update_link((m, d), m.rect.center, d.rect.center)
+    layer.prepare(tuple(rect), _app.link_index)
+    layer.blit(surf, surf.get_rect(), (-rect.x, -rect.y))
+
+    for m in boxes:
+        m.paint(surf, m.rect.move(-rect.x, -rect.y))
+    return pygame.image.tobytes(surf, "RGB")
+
+
+def _render_strip(strip):
+    """One row of tiles as deflated PNG rows: (raw deflate data, adler32 and length of the rows)."""
+    tiles = [_render_tile(tile) for tile in strip]
+    tiles = [t if t is None else memoryview(t) for t in tiles]
+    blank = memoryview(bytes(_app.BG_COLOR) * max(w for _, _, w, _ in strip))  # a row of an empty tile
+
+    z = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)  # raw deflate, no header
+    out = []
+    adler = 1
+    length = 0
+    for row in range(strip[0][3]):
+        parts = [b"\x00"]  # filter type: none
+        for t, (_, _, w, _) in zip(tiles, strip):
+            parts.append(blank[:w * 3] if t is None else t[row * w * 3:(row + 1) * w * 3])
+        data = b"".join(parts)
+        adler = zlib.adler32(data, adler)
+        length += len(data)
+        out.append(z.compress(data))
+    out.append(z.flush(zlib.Z_SYNC_FLUSH))  # ends on a byte boundary, ready to be glued on
+    return b"".join(out), adler, length
+
+
+# =====================================================================
+# EXPORT
+# =====================================================================
+def export_png(records, path, checked=(), workers=None, tile_size=TILE_SIZE, progress=None):
+    """Render records (and the checked IDs' states) into a PNG at path.
+
+    progress(done, total) is called after each strip of tiles.
+    """
+    records = list(records)
+    ctx = multiprocessing.get_context("spawn")  # forking a process that runs SDL isn't safe
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(records, list(checked))) as pool:
+        left, top, right, bottom = pool.apply(_bounds)
+        strips = [
+            [(x, y, min(tile_size, right - x), min(tile_size, bottom - y)) for x in range(left, right, tile_size)]
+            for y in range(top, bottom, tile_size)
+        ]
+
+        tmp = f"{path}.tmp-{os.getpid()}"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(b"\x89PNG\r\n\x1a\n")
+                # 8-bit RGB, no interlacing
+                _chunk(f, b"IHDR", struct.pack(">IIBBBBB", right - left, bottom - top, 8, 2, 0, 0, 0))
+                _chunk(f, b"IDAT", b"\x78\x9c")  # zlib header
+                adler = 1
+                for i, (data, strip_adler, length) in enumerate(pool.imap(_render_strip, strips)):
+                    _chunk(f, b"IDAT", data)
+                    adler = adler32_combine(adler, strip_adler, length)
+                    if progress is not None:
+                        progress(i + 1, len(strips))
+                # empty final deflate block, then the checksum of all the rows
+                _chunk(f, b"IDAT", b"\x03\x00" + struct.pack(">I", adler))
+                _chunk(f, b"IEND", b"")
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
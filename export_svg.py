@@ -0,0 +1,130 @@
+# =====================================================================
+# SVG EXPORT — the whole tree as a vector image, no pygame
+# =====================================================================
+# Draws what the canvas draws: dependency links under rounded boxes with the
+# wrapped name, the type/logic tag and the checkmark, colored by state when
+# the checked IDs are known. Text widths are estimated for a monospace font
+# (the canvas uses Consolas), unless the caller passes the real box heights.
+import os
+from xml.sax.saxutils import escape
+
+BG_COLOR = "#EBEBEB"
+BOX_WIDTH = 180
+BOX_HEIGHT = 60
+LINE_H = 20
+CHAR_WIDTH = 11    # Consolas at 20 px
+PAD = 40           # empty border around the tree
+BORDER_COLORS = {"done": "#009600", "available": "#000000", "locked": "#828282"}
+LOCKED_FADE = 0.55
+
+
+def wrap_words(text, max_chars):
+    """Same word wrapping as the canvas, counting characters instead of pixels."""
+    lines = []
+    current = ""
+    for w in text.split(" "):
+        test = f"{current} {w}".strip()
+        if len(test) <= max_chars:
+            current = test
+        else:
+            if current:
+                lines.append(current)
+            current = w
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _fade(color, amount=LOCKED_FADE):
+    bg = int(BG_COLOR[1:], 16)
+    try:
+        c = int(color[1:], 16)
+    except ValueError:
+        return color  # a color name: leave it as it is
+    parts = []
+    for shift in (16, 8, 0):
+        a = (c >> shift) & 255
+        b = (bg >> shift) & 255
+        parts.append(round(a + (b - a) * amount))
+    return "#%02X%02X%02X" % tuple(parts)
+
+
+def _status(rec, checked, by_id):
+    if rec["id"] in checked:
+        return "done"
+    deps = [d for d in rec["dependencies"] if d in by_id]
+    if not deps:
+        return "available"
+    done = sum(1 for d in deps if d in checked)
+    if rec["logic"] == "OR":
+        return "available" if done else "locked"
+    return "available" if done == len(deps) else "locked"
+
+
+def write_svg(records, path, checked=(), heights=None):
+    """Write records as an SVG image. heights: id -> box height (default: estimated from the text)."""
+    checked = set(checked)
+    by_id = {r["id"]: r for r in records}
+    boxes = {}   # id -> (x, y, w, h, lines)
+    for r in records:
+        lines = wrap_words(r["text"], (BOX_WIDTH - 10) // CHAR_WIDTH)
+        h = max(BOX_HEIGHT, 10 + len(lines) * LINE_H + 40)
+        if heights is not None and r["id"] in heights:
+            h = heights[r["id"]]
+        boxes[r["id"]] = (int(r["x"]), int(r["y"]), BOX_WIDTH, h, lines)
+
+    if boxes:
+        left = min(b[0] for b in boxes.values()) - PAD
+        top = min(b[1] for b in boxes.values()) - PAD
+        right = max(b[0] + b[2] for b in boxes.values()) + PAD
+        bottom = max(b[1] + b[3] for b in boxes.values()) + PAD
+    else:
+        left, top, right, bottom = 0, 0, 2 * PAD, 2 * PAD
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{right - left}" height="{bottom - top}" '
+                    f'viewBox="{left} {top} {right - left} {bottom - top}">\n')
+            f.write('<defs><marker id="arrow" viewBox="0 0 10 10" refX="5" refY="5" markerWidth="10" '
+                    'markerHeight="10" markerUnits="userSpaceOnUse" orient="auto">'
+                    '<path d="M 0 0 L 10 5 L 0 10 z"/></marker></defs>\n')
+            f.write(f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" fill="{BG_COLOR}"/>\n')
+
+            # Links first, boxes on top (arrows point from a mission to its dependency)
+            f.write('<g stroke="#000000" stroke-width="1" fill="none" marker-mid="url(#arrow)">\n')
+            for r in records:
+                x0, y0, w0, h0, _ = boxes[r["id"]]
+                for d in r["dependencies"]:
+                    if d not in boxes or d == r["id"]:
+                        continue
+                    x1, y1, w1, h1, _ = boxes[d]
+                    sx, sy = x0 + w0 // 2, y0 + h0 // 2
+                    ex, ey = x1 + w1 // 2, y1 + h1 // 2
+                    f.write(f'<path d="M {sx} {sy} L {(sx + ex) / 2} {(sy + ey) / 2} L {ex} {ey}"/>\n')
+            f.write('</g>\n')
+
+            f.write('<g font-family="Consolas, monospace" font-size="20">\n')
+            for r in records:
+                x, y, w, h, lines = boxes[r["id"]]
+                status = _status(r, checked, by_id)
+                fill = "#AAAAAA" if r["type"] == "special" else r["color"].upper()
+                if status == "locked":
+                    fill = _fade(fill)
+                f.write(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" rx="10" fill="{fill}" '
+                        f'stroke="{BORDER_COLORS[status]}" stroke-width="2"/>\n')
+                for i, line in enumerate(lines):
+                    f.write(f'<text x="{x + 5}" y="{y + 20 + i * LINE_H}">{escape(line)}</text>\n')
+                deps = [d for d in r["dependencies"] if d in boxes]
+                tag = r["type"] + (f" | {r['logic']}" if len(deps) > 1 else "")
+                f.write(f'<text x="{x + 5}" y="{y + h - 7}" fill="#1E1E1E">{escape(tag)}</text>\n')
+                if status == "done":
+                    f.write(f'<text x="{x + w - 20}" y="{y + h - 10}" fill="#009600">+</text>\n')
+            f.write('</g>\n</svg>\n')
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
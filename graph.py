@@ -0,0 +1,344 @@
+# =====================================================================
+# DEPENDENCY GRAPH — incremental topological order, depth levels, cycles
+# =====================================================================
+# Edges point from a dependency to the mission that needs it (dep -> mission).
+# Missions are grouped into strongly connected components. A component is just
+# the mission itself unless a cycle glued several together (only possible
+# through a loaded file: the editor won't commit a cycle).
+#
+# Components are kept in topological order with the Pearce-Kelly algorithm:
+# a new edge that already agrees with the order costs O(1), otherwise only the
+# components between its two ends get searched and renumbered. Depth (the
+# longest prerequisite chain in front of a mission) is pushed forward from
+# whatever changed, in topological order, and stops where nothing changes.
+import heapq
+from itertools import count
+
+SMALL = 8   # up to this many neighbours are kept in a tuple (a set costs 200+ bytes even for one)
+
+
+def _with(ids, x):
+    """ids (a tuple or set without x) plus x."""
+    if type(ids) is tuple:
+        if len(ids) < SMALL:
+            return ids + (x,)
+        ids = set(ids)
+    ids.add(x)
+    return ids
+
+
+def _without(ids, x):
+    if type(ids) is tuple:
+        return tuple([y for y in ids if y != x])
+    ids.discard(x)
+    return ids
+
+
+class DepGraph:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.succ = {}      # id -> ids that depend on it (tuple, or set when there are many)
+        self.pred = {}      # id -> ids it depends on (same)
+        self.mult = {}      # (dep, id) -> how many times that link is listed, when more than once
+        self.comp = {}      # id -> component id (the id itself, or < 0 for a cycle)
+        self.members = {}   # cycle component id -> set of ids
+        self.ord = {}       # component id -> position in the topological order
+        self.depth = {}     # component id -> longest chain of components before it
+        self._next_ord = 0
+        self._cycle_ids = count(-1, -1)
+
+    def __contains__(self, mid):
+        return mid in self.succ
+
+    def __len__(self):
+        return len(self.succ)
+
+    # ---- queries ----
+    def level(self, mid):
+        """0 for missions with no dependencies, else 1 + the deepest dependency."""
+        return self.depth[self.comp[mid]]
+
+    def order_key(self, mid):
+        """Sorting by this gives a topological order (dependencies first)."""
+        return self.ord[self.comp[mid]]
+
+    def topo_order(self):
+        return sorted(self.succ, key=self.order_key)
+
+    def on_cycle(self, mid):
+        return self.comp[mid] < 0
+
+    def cycles(self):
+        """Sorted member lists of every dependency cycle."""
+        return [sorted(m) for m in self.members.values()]
+
+    def reaches(self, src, dst):
+        """True if dst (transitively) depends on src."""
+        cs, cd = self.comp[src], self.comp[dst]
+        if cs == cd:
+            return True
+        hi = self.ord[cd]
+        if self.ord[cs] > hi:
+            return False  # the order says no path can exist
+        seen = {cs}
+        stack = [cs]
+        while stack:
+            for c in self._out(stack.pop()):
+                if c == cd:
+                    return True
+                if c not in seen and self.ord[c] < hi:
+                    seen.add(c)
+                    stack.append(c)
+        return False
+
+    def check_deps(self, mid, dep_ids):
+        """Problems with making dep_ids the dependencies of mid (empty list = fine)."""
+        problems = []
+        seen = set()
+        for d in dep_ids:
+            if d == mid:
+                problems.append("can't depend on itself")
+            elif d in seen:
+                problems.append(f"{d} listed twice")
+            elif d not in self:
+                problems.append(f"no mission {d}")
+            elif mid in self and self.reaches(mid, d):
+                problems.append(f"{d} already depends on {mid} (cycle)")
+            seen.add(d)
+        return problems
+
+    # ---- edits ----
+    def rebuild(self, items):
+        """Start over from (id, dependency ids) pairs in O(V + E). Used after loading a file."""
+        self.clear()
+        items = list(items)
+        succ = {mid: set() for mid, _ in items}
+        pred = {mid: set() for mid, _ in items}
+        for mid, deps in items:
+            for d in deps:
+                if d != mid and d in succ:
+                    if mid in succ[d]:
+                        self.mult[(d, mid)] = self.mult.get((d, mid), 1) + 1
+                    succ[d].add(mid)
+                    pred[mid].add(d)
+        self.succ = {mid: tuple(ids) if len(ids) <= SMALL else ids for mid, ids in succ.items()}
+        self.pred = {mid: tuple(ids) if len(ids) <= SMALL else ids for mid, ids in pred.items()}
+
+        sccs = self._sccs(self.succ)
+        sccs.reverse()  # dependencies first
+        for i, scc in enumerate(sccs):
+            c = scc[0] if len(scc) == 1 else next(self._cycle_ids)
+            if len(scc) > 1:
+                self.members[c] = set(scc)
+            for u in scc:
+                self.comp[u] = c
+            self.ord[c] = i
+        self._next_ord = len(sccs)
+        for c in sorted(self.ord, key=self.ord.get):
+            self.depth[c] = 1 + max((self.depth[p] for p in self._in(c)), default=-1)
+
+    def add_node(self, mid):
+        if mid in self.succ:
+            return
+        self.succ[mid] = ()
+        self.pred[mid] = ()
+        self.comp[mid] = mid
+        self.ord[mid] = self._next_ord  # no links yet, so the end of the order is fine
+        self._next_ord += 1
+        self.depth[mid] = 0
+
+    def remove_node(self, mid):
+        for v in list(self.succ[mid]):
+            self._drop_edge(mid, v)
+        for u in list(self.pred[mid]):
+            self._drop_edge(u, mid)
+        # with no links left it is its own component again
+        del self.succ[mid], self.pred[mid], self.comp[mid], self.ord[mid], self.depth[mid]
+
+    def add_edge(self, dep, mid):
+        if dep == mid:
+            return
+        if mid in self.succ[dep]:  # listed again: only counted
+            self.mult[(dep, mid)] = self.mult.get((dep, mid), 1) + 1
+            return
+        self.succ[dep] = _with(self.succ[dep], mid)
+        self.pred[mid] = _with(self.pred[mid], dep)
+
+        cd, cm = self.comp[dep], self.comp[mid]
+        if cd == cm:
+            return
+        if self.ord[cd] > self.ord[cm]:
+            self._reorder(cd, cm)
+        self._update_depths([self.comp[mid]])
+
+    def remove_edge(self, dep, mid):
+        n = self.mult.get((dep, mid))
+        if n is not None:
+            if n > 2:
+                self.mult[(dep, mid)] = n - 1
+            else:
+                del self.mult[(dep, mid)]
+        elif dep in self.succ and mid in self.succ[dep]:
+            self._drop_edge(dep, mid)
+
+    # ---- internals ----
+    def _members(self, c):
+        return self.members.get(c) or (c,)
+
+    def _out(self, c):
+        for u in self._members(c):
+            for v in self.succ[u]:
+                cv = self.comp[v]
+                if cv != c:
+                    yield cv
+
+    def _in(self, c):
+        for u in self._members(c):
+            for v in self.pred[u]:
+                cv = self.comp[v]
+                if cv != c:
+                    yield cv
+
+    def _search(self, start, step, ok):
+        seen = {start}
+        stack = [start]
+        while stack:
+            for c in step(stack.pop()):
+                if c not in seen and ok(self.ord[c]):
+                    seen.add(c)
+                    stack.append(c)
+        return seen
+
+    def _reorder(self, cd, cm):
+        """Pearce-Kelly: the new edge cd -> cm goes against the order, fix the stretch between them."""
+        lo, hi = self.ord[cm], self.ord[cd]
+        fwd = self._search(cm, self._out, lambda o: o <= hi)   # what cm leads to
+        back = self._search(cd, self._in, lambda o: o >= lo)   # what leads to cd
+        cycle = fwd & back  # non-empty iff the edge closed a cycle
+        pool = sorted(self.ord[c] for c in fwd | back)
+
+        # What leads to cd takes the lowest slots, what cm leads to the highest
+        # (so nothing moves past a component outside the stretch), a merged
+        # cycle goes in between.
+        back_only = sorted(back - cycle, key=self.ord.get)
+        fwd_only = sorted(fwd - cycle, key=self.ord.get)
+        for c, o in zip(back_only, pool):
+            self.ord[c] = o
+        for c, o in zip(fwd_only, pool[len(pool) - len(fwd_only):]):
+            self.ord[c] = o
+        if cycle:
+            merged = self._merge(cycle)
+            self.ord[merged] = pool[len(back_only)]
+
+    def _merge(self, comps):
+        new = next(self._cycle_ids)
+        members = set()
+        for c in comps:
+            members.update(self._members(c))
+            self.members.pop(c, None)
+            del self.ord[c], self.depth[c]
+        for u in members:
+            self.comp[u] = new
+        self.members[new] = members
+        self.depth[new] = 0
+        return new
+
+    def _drop_edge(self, dep, mid):
+        self.mult.pop((dep, mid), None)
+        self.succ[dep] = _without(self.succ[dep], mid)
+        self.pred[mid] = _without(self.pred[mid], dep)
+        c = self.comp[dep]
+        if c == self.comp[mid]:
+            self._update_depths(self._split(c))
+        else:
+            self._update_depths([self.comp[mid]])
+
+    def _split(self, c):
+        """A link inside a cycle went away: the cycle may fall apart. Returns the new components."""
+        pieces = self._sccs(self.members[c])
+        if len(pieces) == 1:
+            return [c]
+        pieces.reverse()  # Tarjan hands them out dependents-first
+
+        # Rare (only for cycles from loaded files), so just make room in the order
+        old = self.ord.pop(c)
+        del self.members[c], self.depth[c]
+        shift = len(pieces) - 1
+        for other, o in self.ord.items():
+            if o > old:
+                self.ord[other] = o + shift
+        self._next_ord += shift
+
+        comps = []
+        for i, scc in enumerate(pieces):
+            new = scc[0] if len(scc) == 1 else next(self._cycle_ids)
+            if len(scc) > 1:
+                self.members[new] = set(scc)
+            for u in scc:
+                self.comp[u] = new
+            self.ord[new] = old + i
+            self.depth[new] = 0
+            comps.append(new)
+        return comps
+
+    def _sccs(self, nodes):
+        """Tarjan's algorithm on the links between nodes (iterative)."""
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        out = []
+        for root in nodes:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.succ[root]))]
+            while work:
+                u, it = work[-1]
+                for v in it:
+                    if v not in nodes:
+                        continue
+                    if v not in index:
+                        index[v] = low[v] = len(index)
+                        stack.append(v)
+                        on_stack.add(v)
+                        work.append((v, iter(self.succ[v])))
+                        break
+                    if v in on_stack:
+                        low[u] = min(low[u], index[v])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[u])
+                    if low[u] == index[u]:
+                        scc = []
+                        while True:
+                            w = stack.pop()
+                            on_stack.discard(w)
+                            scc.append(w)
+                            if w == u:
+                                break
+                        out.append(scc)
+        return out
+
+    def _update_depths(self, starts):
+        """Recompute depth from starts onward, in topological order, only as far as it changes."""
+        heap = [(self.ord[c], c) for c in starts if c in self.ord]
+        heapq.heapify(heap)
+        forced = set(starts)  # new components start at depth 0, so always pass theirs on
+        done = set()
+        while heap:
+            _, c = heapq.heappop(heap)
+            if c in done or c not in self.ord:
+                continue
+            done.add(c)
+            new = 1 + max((self.depth[p] for p in self._in(c)), default=-1)
+            if new != self.depth[c] or c in forced:
+                self.depth[c] = new
+                for nxt in self._out(c):
+                    heapq.heappush(heap, (self.ord[nxt], nxt))
@@ -0,0 +1,309 @@
+# =====================================================================
+# EDIT JOURNAL — append-only log of small edits, for crash recovery
+# =====================================================================
+# Every edit made in the editor is appended to journal-<gen>.jsonl as one
+# small JSON line, so autosaving costs as much as the edits, not the tree.
+# The first line of each generation says what the edits apply to:
+#   {"base": "empty"}                      Ctrl+N / fresh start
+#   {"base": "file", "path", "size", ...}  a file that was loaded
+#   {"base": "save", "path"}               a file being saved (good once saved-<gen>.json exists)
+#   {"base": "snapshot"}                   snapshot-<gen>.anrmtb, written in the background
+# If a base can't be used (the save never finished, the snapshot wasn't
+# written, the file changed), recovery falls back to the previous generation
+# and replays it first. Old generations are deleted once a newer base is safe.
+import json
+import os
+import queue
+import threading
+import time
+
+import tree_io
+
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".mission-tree-maker", "journal")
+AUTOSAVE_INTERVAL = 2.0   # seconds between journal flushes
+COMPACT_EVERY = 5000      # edits in one generation before it's folded into a snapshot
+
+
+class JournalError(Exception):
+    pass
+
+
+# =====================================================================
+# REPLAY
+# =====================================================================
+def apply_op(tree, checked, op):
+    """Apply one journal edit to tree (id -> record) and the set of checked IDs."""
+    kind = op.get("op")
+    if kind == "create":
+        rec = tree_io.normalize_record(op["rec"])
+        tree[rec["id"]] = rec
+        return
+
+    rec = tree.get(op.get("id"))
+    if rec is None:
+        return
+    if kind == "delete":
+        del tree[rec["id"]]
+        checked.discard(rec["id"])
+        for dep_id in op.get("dependents", ()):
+            other = tree.get(dep_id)
+            if other is not None:
+                other["dependencies"] = [d for d in other["dependencies"] if d != rec["id"]]
+    elif kind == "move":
+        rec["x"] = op["x"]
+        rec["y"] = op["y"]
+    elif kind == "edit":
+        rec.update(op["fields"])
+    elif kind == "deps":
+        rec["dependencies"] = list(op["deps"])
+    elif kind == "details":
+        rec["mission"] = {field: op["mission"].get(field, "") for field in tree_io.MISSION_FIELDS}
+    elif kind == "check":
+        if op["checked"]:
+            checked.add(rec["id"])
+        else:
+            checked.discard(rec["id"])
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+class Journal:
+    def __init__(self, folder=JOURNAL_DIR):
+        self.folder = folder
+        self.gen = None
+        self.file = None
+        self.buffer = []        # op lines not written yet
+        self.ops_in_gen = 0
+        self.last_flush = time.time()
+        self.jobs = queue.Queue()
+        self.thread = None
+
+    # ---- files ----
+    def _path(self, kind, gen):
+        ext = {"journal": "jsonl", "snapshot": "anrmtb", "checked": "json", "saved": "json"}[kind]
+        return os.path.join(self.folder, f"{kind}-{gen:08d}.{ext}")
+
+    def _gens(self):
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return []
+        gens = []
+        for name in names:
+            if name.startswith("journal-") and name.endswith(".jsonl"):
+                try:
+                    gens.append(int(name[8:-6]))
+                except ValueError:
+                    pass
+        return sorted(gens)
+
+    def _read(self, gen):
+        """(base, ops) of a generation. A torn last line (crash mid-write) is ignored."""
+        base = None
+        ops = []
+        with open(self._path("journal", gen), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if base is None:
+                    base = entry
+                else:
+                    ops.append(entry)
+        if base is None:
+            raise JournalError(f"journal {gen} has no base")
+        return base, ops
+
+    def _delete_before(self, gen):
+        for old in self._gens():
+            if old >= gen:
+                break
+            for kind in ("journal", "snapshot", "checked", "saved"):
+                try:
+                    os.remove(self._path(kind, old))
+                except OSError:
+                    pass
+
+    # ---- recovery ----
+    def _base_state(self, gen, base):
+        """(tree, checked) the generation starts from, or None if that base is unusable."""
+        try:
+            kind = base.get("base")
+            if kind == "empty":
+                return {}, set()
+            if kind == "snapshot":
+                path = self._path("snapshot", gen)
+                if not os.path.exists(path):
+                    return None
+                with open(self._path("checked", gen), "r") as f:
+                    checked = set(json.load(f))
+                return {r["id"]: r for r in tree_io.iter_records(path)}, checked
+            if kind in ("file", "save"):
+                stamp = base if kind == "file" else None
+                if kind == "save":
+                    with open(self._path("saved", gen), "r") as f:
+                        stamp = json.load(f)
+                if _file_stamp(base["path"]) != {"size": stamp["size"], "mtime": stamp["mtime"]}:
+                    return None
+                return {r["id"]: r for r in tree_io.iter_records(base["path"])}, set()
+        except (OSError, ValueError, KeyError, tree_io.TreeFileError):
+            return None
+        return None
+
+    def _state_at_end(self, gen):
+        base, ops = self._read(gen)
+        state = self._base_state(gen, base)
+        if state is None:
+            older = [g for g in self._gens() if g < gen]
+            if not older:
+                raise JournalError(f"can't rebuild the tree behind journal {gen}")
+            state = self._state_at_end(older[-1])
+        tree, checked = state
+        for op in ops:
+            apply_op(tree, checked, op)
+        return tree, checked
+
+    def has_recovery(self):
+        """True if the last session left edits that were never saved."""
+        for gen in reversed(self._gens()):
+            try:
+                base, ops = self._read(gen)
+            except (OSError, JournalError):
+                return False
+            if ops or base.get("base") == "snapshot":
+                return True
+            if self._base_state(gen, base) is not None:
+                return False
+        return False
+
+    def recover(self):
+        """(records, checked ids) as they were at the end of the last session."""
+        gens = self._gens()
+        if not gens:
+            raise JournalError("nothing to recover")
+        tree, checked = self._state_at_end(gens[-1])
+        return list(tree.values()), checked
+
+    def discard(self):
+        self.close()
+        gens = self._gens()
+        if gens:
+            self._delete_before(gens[-1] + 1)
+
+    # ---- recording ----
+    def begin(self, base):
+        """Start a new generation on top of base. Returns its number (None if the journal is off)."""
+        self.close()
+        self.buffer.clear()
+        self.ops_in_gen = 0
+        gens = self._gens()
+        self.gen = max(gens[-1] if gens else 0, self.gen or 0) + 1
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            self.file = open(self._path("journal", self.gen), "a", encoding="utf-8")
+            self.file.write(json.dumps(base, separators=(",", ":")) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError:
+            self._give_up()
+            return None
+        if base["base"] in ("empty", "file"):
+            self._delete_before(self.gen)  # nothing older is needed any more
+        return self.gen
+
+    def begin_file(self, path):
+        """Edits from here on apply to the file at path, as it is on disk right now."""
+        try:
+            return self.begin({"base": "file", "path": os.path.abspath(path), **_file_stamp(path)})
+        except OSError:
+            return self.begin({"base": "empty"})
+
+    def confirm_save(self, gen, path):
+        """The save started by begin({"base": "save"}) finished: that file is a safe base now."""
+        if gen is None or not os.path.exists(self._path("journal", gen)):
+            return  # journal off, or that generation was already dropped (Ctrl+N, load)
+        try:
+            with open(self._path("saved", gen), "w") as f:
+                json.dump(_file_stamp(path), f)
+        except OSError:
+            return
+        self._delete_before(gen)
+
+    def record(self, op):
+        if self.file is None:
+            return
+        self.buffer.append(op)
+        self.ops_in_gen += 1
+
+    def record_move(self, mid, x, y):
+        # arrow-key moves happen every frame: keep only the latest position per flush
+        if self.buffer and self.buffer[-1].get("op") == "move" and self.buffer[-1]["id"] == mid:
+            self.buffer[-1]["x"] = x
+            self.buffer[-1]["y"] = y
+        else:
+            self.record({"op": "move", "id": mid, "x": x, "y": y})
+
+    def flush(self):
+        self.last_flush = time.time()
+        if self.file is None or not self.buffer:
+            return
+        try:
+            self.file.write("".join(json.dumps(op, separators=(",", ":")) + "\n" for op in self.buffer))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError:
+            self._give_up()
+        self.buffer.clear()
+
+    def _give_up(self):
+        # disk full / folder not writable: keep editing, just without a journal
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+        self.file = None
+
+    def tick(self):
+        """Called once per frame: periodic autosave + background compaction."""
+        if self.buffer and time.time() - self.last_flush >= AUTOSAVE_INTERVAL:
+            self.flush()
+        if self.ops_in_gen >= COMPACT_EVERY:
+            self.compact()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    # ---- compaction ----
+    def compact(self):
+        """Fold everything so far into a snapshot, written by a background thread."""
+        gen = self.begin({"base": "snapshot"})
+        if gen is None:
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="journal-compactor", daemon=True)
+            self.thread.start()
+        self.jobs.put(gen)
+
+    def _run(self):
+        while True:
+            gen = self.jobs.get()
+            try:
+                older = [g for g in self._gens() if g < gen]
+                if older:
+                    tree, checked = self._state_at_end(older[-1])
+                    with open(self._path("checked", gen), "w") as f:
+                        json.dump(sorted(checked), f)
+                    # written last: its existence is what makes this base usable
+                    tree_io.save_records(list(tree.values()), self._path("snapshot", gen), binary=True)
+                    self._delete_before(gen)
+            except (OSError, JournalError, tree_io.TreeFileError):
+                pass  # the older generations stay around, recovery still works
+            self.jobs.task_done()
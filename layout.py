@@ -0,0 +1,186 @@
+# =====================================================================
+# AUTOMATIC LAYOUT — layered (Sugiyama style), no pygame
+# =====================================================================
+# 1. Cycle edges (only in broken files) are ignored, found with one DFS.
+# 2. Layering: longest path from the roots, so every mission sits one layer
+#    below its deepest dependency. Links that skip layers get invisible
+#    "dummy" nodes on the layers in between.
+# 3. Crossing reduction: a few up/down sweeps sorting each layer by the
+#    barycenter (average position) of its neighbours in the previous layer.
+# 4. Coordinates: layers stacked top to bottom by their tallest box; in each
+#    layer boxes are pulled towards their neighbours' centers while keeping
+#    their order and a gap, solved exactly per layer with pool-adjacent-violators.
+# Every step is linear in missions + links (+ a sort per layer).
+
+H_GAP = 40      # horizontal space between boxes
+V_GAP = 60      # vertical space between layers
+SWEEPS = 4      # crossing reduction passes (each one down + up)
+COORD_PASSES = 2  # coordinate passes (each one down + up + both ways)
+DUMMY_WIDTH = 0
+
+
+def _back_edges(ids, succs):
+    """(dep, mission) links that close a cycle. Ignoring them leaves a DAG."""
+    state = {}  # 1 = on the DFS stack, 2 = finished
+    back = set()
+    for root in ids:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(succs[root]))]
+        while stack:
+            u, it = stack[-1]
+            for v in it:
+                s = state.get(v)
+                if s is None:
+                    state[v] = 1
+                    stack.append((v, iter(succs[v])))
+                    break
+                if s == 1:
+                    back.add((u, v))
+            else:
+                state[u] = 2
+                stack.pop()
+    return back
+
+
+def _longest_path_layers(ids, preds, succs):
+    indegree = {i: len(preds[i]) for i in ids}
+    layer = {i: 0 for i in ids}
+    queue = [i for i in ids if not indegree[i]]
+    for u in queue:  # the list grows while we walk it
+        for v in succs[u]:
+            layer[v] = max(layer[v], layer[u] + 1)
+            indegree[v] -= 1
+            if not indegree[v]:
+                queue.append(v)
+    return layer
+
+
+def _reorder(row, neighbours, pos):
+    """Sort a layer by the barycenter of each node's neighbours. Nodes without any keep their slot."""
+    keyed = [(sum(pos[n] for n in neighbours[v]) / len(neighbours[v]), v) for v in row if neighbours[v]]
+    keyed.sort(key=lambda t: t[0])
+    moved = iter(v for _, v in keyed)
+    return [next(moved) if neighbours[v] else v for v in row]
+
+
+def _pack(desired, widths, gap):
+    """Left edges as close as possible to desired (least squares) while keeping order + gaps.
+
+    With offset_i = sum of (width + gap) before i, the constraint x_i >= x_(i-1) + w_(i-1) + gap
+    becomes y_i >= y_(i-1) for y_i = x_i - offset_i: an isotonic regression (PAVA).
+    """
+    offsets = []
+    total = 0
+    for w in widths:
+        offsets.append(total)
+        total += w + gap
+    blocks = []  # [sum, count]
+    for d, o in zip(desired, offsets):
+        blocks.append([d - o, 1])
+        while len(blocks) > 1 and blocks[-2][0] * blocks[-1][1] > blocks[-1][0] * blocks[-2][1]:
+            s, c = blocks.pop()
+            blocks[-1][0] += s
+            blocks[-1][1] += c
+    xs = []
+    for s, c in blocks:
+        xs += [s / c] * c
+    return [x + o for x, o in zip(xs, offsets)]
+
+
+def layered_layout(sizes, deps, hint=None, origin=(0, 0), h_gap=H_GAP, v_gap=V_GAP, sweeps=SWEEPS):
+    """New top-left corners for a set of missions.
+
+    sizes: id -> (width, height); deps: id -> dependency ids (ids outside sizes are ignored);
+    hint: id -> current x, used for the starting order of each layer.
+    Returns id -> (x, y), laid out from origin downwards.
+    """
+    ids = list(sizes)
+    if not ids:
+        return {}
+    hint = dict(hint or {})
+    preds = {i: [d for d in dict.fromkeys(deps.get(i, ())) if d in sizes and d != i] for i in ids}
+    succs = {i: [] for i in ids}
+    for i in ids:
+        for d in preds[i]:
+            succs[d].append(i)
+    back = _back_edges(ids, succs)
+    if back:
+        for d, i in back:
+            succs[d].remove(i)
+            preds[i].remove(d)
+
+    layer = _longest_path_layers(ids, preds, succs)
+
+    # Dummy nodes for links that skip layers, so every link joins neighbouring layers
+    up = {i: [] for i in ids}     # neighbours in the layer above
+    down = {i: [] for i in ids}   # neighbours in the layer below
+    width = {i: sizes[i][0] for i in ids}
+    next_dummy = -1
+    for i in ids:
+        for d in preds[i]:
+            prev = d
+            for _ in range(layer[d] + 1, layer[i]):
+                dummy = next_dummy
+                next_dummy -= 1
+                layer[dummy] = layer[prev] + 1
+                width[dummy] = DUMMY_WIDTH
+                hint[dummy] = hint.get(i, 0)
+                up[dummy] = [prev]
+                down[dummy] = []
+                down[prev].append(dummy)
+                prev = dummy
+            up[i].append(prev)
+            down[prev].append(i)
+
+    rows = [[] for _ in range(max(layer.values()) + 1)]
+    for v in sorted(layer, key=lambda v: (hint.get(v, 0), v)):
+        rows[layer[v]].append(v)
+
+    # Crossing reduction
+    pos = {}
+    for row in rows:
+        for k, v in enumerate(row):
+            pos[v] = k
+    for _ in range(sweeps):
+        for sweep, neighbours in ((range(1, len(rows)), up), (range(len(rows) - 2, -1, -1), down)):
+            for r in sweep:
+                rows[r] = _reorder(rows[r], neighbours, pos)
+                for k, v in enumerate(rows[r]):
+                    pos[v] = k
+
+    # Coordinates: y per layer, x pulled towards the neighbours' centers
+    center = {}
+    for row in rows:
+        left = 0
+        for v in row:
+            center[v] = left + width[v] / 2
+            left += width[v] + h_gap
+    both = {v: up[v] + down[v] for v in up}
+    for _ in range(COORD_PASSES):
+        for sweep, neighbours in ((range(1, len(rows)), up), (range(len(rows) - 2, -1, -1), down),
+                                  (range(len(rows)), both)):
+            for r in sweep:
+                row = rows[r]
+                widths = [width[v] for v in row]
+                desired = []
+                for v, w in zip(row, widths):
+                    near = neighbours[v]
+                    if near:
+                        desired.append(sum([center[n] for n in near]) / len(near) - w / 2)
+                    else:
+                        desired.append(center[v] - w / 2)
+                for v, w, nx in zip(row, widths, _pack(desired, widths, h_gap)):
+                    center[v] = nx + w / 2
+    x = {v: center[v] - width[v] / 2 for v in ids}
+
+    left = min(x.values())
+    result = {}
+    top = origin[1]
+    for row in rows:
+        real = [v for v in row if v in sizes]  # drop the dummies
+        for v in real:
+            result[v] = (round(origin[0] + x[v] - left), top)
+        top += max((sizes[v][1] for v in real), default=0) + v_gap
+    return result
@@ -0,0 +1,255 @@
+# =====================================================================
+# LINK LAYER — cached dependency-arrow geometry + pre-rendered surface
+# =====================================================================
+# Each link's arrowheads are computed once (vectorized with NumPy when it's
+# installed) and only recomputed when one of its endpoints moves. The arrows
+# are drawn onto an off-screen layer a bit bigger than the window; the frame
+# just blits the visible part of it, so panning costs one blit instead of a
+# polygon call per arrowhead.
+#
+# A layer can also be drawn at a zoom scale (its pixels are world * scale).
+# Zoomed far out it draws plain lines instead of arrowheads and can carry
+# the mission boxes too, so showing the whole tree is still one blit.
+import math
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, fall back to plain Python
+    np = None
+
+
+ARROW_SIZE = 10
+ARROW_SPACING = 6
+MAX_PENDING = 4096   # queued repaints before a layer just repaints everything
+
+
+def arrow_triangles(start, end, size=ARROW_SIZE, spacing=ARROW_SPACING):
+    """Centers + triangle points of the arrowheads along start -> end.
+
+    With numpy: (centers (k, 2) array, points (k, 3, 2) array).
+    Without:    (list of (cx, cy), list of [(x, y), (x, y), (x, y)]).
+    """
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    dist = math.hypot(dx, dy)
+    step = size + spacing
+    steps = int(dist // step)
+    if dist == 0 or steps == 0:
+        if np is not None:
+            return np.empty((0, 2)), np.empty((0, 3, 2))
+        return [], []
+
+    ux = dx / dist
+    uy = dy / dist
+    half = size / 2
+
+    # Triangle pointing along the link: rotating by atan2(dy, dx) - 90 degrees
+    # is the same as cos = uy, sin = -ux, so no trig is needed.
+    cos_a, sin_a = uy, -ux
+    base = ((0, -half), (-half, half), (half, half))
+    tri = [(x * cos_a - y * sin_a, x * sin_a + y * cos_a) for x, y in base]
+
+    if np is not None:
+        t = np.arange(steps) * step
+        centers = np.column_stack((start[0] + ux * t, start[1] + uy * t))
+        points = centers[:, None, :] + np.asarray(tri)[None, :, :]
+        return centers, points
+
+    centers = [(start[0] + ux * i * step, start[1] + uy * i * step) for i in range(steps)]
+    points = [[(cx + tx, cy + ty) for tx, ty in tri] for cx, cy in centers]
+    return centers, points
+
+
+def draw_triangle_line(surface, start, end, color=(0, 0, 0), size=ARROW_SIZE, spacing=ARROW_SPACING):
+    _, points = arrow_triangles(start, end, size, spacing)
+    if np is not None:
+        points = points.tolist()
+    for tri in points:
+        pygame.draw.polygon(surface, color, tri)
+
+
+def scale_rect(rect, scale):
+    """Smallest pixel rect covering a world rect drawn at scale (at least 1x1)."""
+    if scale == 1:
+        return pygame.Rect(rect)
+    x0 = math.floor(rect[0] * scale)
+    y0 = math.floor(rect[1] * scale)
+    x1 = math.ceil((rect[0] + rect[2]) * scale)
+    y1 = math.ceil((rect[1] + rect[3]) * scale)
+    return pygame.Rect(x0, y0, max(1, x1 - x0), max(1, y1 - y0))
+
+
+def link_bounds(start, end, pad=ARROW_SIZE):
+    """World-space rect covering a link and its arrowheads."""
+    x0, x1 = sorted((start[0], end[0]))
+    y0, y1 = sorted((start[1], end[1]))
+    return pygame.Rect(int(x0) - pad, int(y0) - pad, int(x1 - x0) + 2 * pad + 1, int(y1 - y0) + 2 * pad + 1)
+
+
+class LinkLayer:
+    """scale: layer pixels per world unit. lines: plain lines instead of arrowheads.
+    paint_nodes(surface, world_rect, scale, origin): draws whatever sits on top of the
+    links inside world_rect (called after the links of every repainted rect).
+    """
+
+    def __init__(self, bg_color, color=(0, 0, 0), margin=512, scale=1, lines=False, paint_nodes=None):
+        self.bg_color = bg_color
+        self.color = color
+        self.margin = margin
+        self.scale = scale
+        self.lines = lines
+        self.paint_nodes = paint_nodes
+        self.geometry = {}   # link -> [start, end, centers or None, points or None] (arrowheads scaled)
+        self.surface = None
+        self.origin = (0, 0)  # layer position (world * scale) of the top-left pixel
+        self.pending = []     # layer rects that need repainting
+
+    def clear(self):
+        self.geometry.clear()
+        self.surface = None
+        self.pending.clear()
+
+    def repaint(self):
+        """Paint the layer over when it's next shown, instead of rect by rect
+        (cheaper when a lot of links are about to change at once)."""
+        self.surface = None
+        self.pending.clear()
+
+    # ---- geometry ----
+    def update_link(self, link, start, end):
+        """Call whenever a link is (re)indexed; only moved links get recomputed."""
+        old = self.geometry.get(link)
+        if old is not None:
+            if old[0] == start and old[1] == end:
+                return
+            if self.surface is not None:
+                self.invalidate(link_bounds(old[0], old[1]))
+        self.geometry[link] = [start, end, None, None]  # arrowheads computed on first draw
+        if self.surface is not None:
+            self.invalidate(link_bounds(start, end))
+
+    def remove_link(self, link):
+        old = self.geometry.pop(link, None)
+        if old is not None and self.surface is not None:
+            self.invalidate(link_bounds(old[0], old[1]))
+
+    def invalidate(self, world_rect):
+        """Repaint a world rect of the layer before it's next shown."""
+        if self.surface is None:
+            return  # gets painted whole anyway
+        if len(self.pending) >= MAX_PENDING:
+            self.surface = None  # a layer nobody looked at for a while: start over when it's shown
+            self.pending.clear()
+            return
+        self.pending.append(scale_rect(world_rect, self.scale))
+
+    def _arrows(self, link):
+        geo = self.geometry[link]
+        if geo[2] is None:
+            s = self.scale
+            geo[2], geo[3] = arrow_triangles((geo[0][0] * s, geo[0][1] * s), (geo[1][0] * s, geo[1][1] * s),
+                                             ARROW_SIZE * s, ARROW_SPACING * s)
+        return geo[2], geo[3]
+
+    # ---- layer surface ----
+    def _paint(self, rect, links):
+        """Repaint a rect of the layer (layer coordinates) with the given links."""
+        ox, oy = self.origin
+        local = rect.move(-ox, -oy).clip(self.surface.get_rect())
+        if not local.width or not local.height:
+            return
+        self.surface.set_clip(local)
+        self.surface.fill(self.bg_color, local)
+
+        if self.lines:
+            s = self.scale
+            for link in links:
+                geo = self.geometry.get(link)
+                if geo is not None:
+                    (x0, y0), (x1, y1) = geo[0], geo[1]
+                    pygame.draw.line(self.surface, self.color, (x0 * s - ox, y0 * s - oy), (x1 * s - ox, y1 * s - oy))
+            self._paint_nodes(local)
+            return
+
+        # only the arrowheads near the rect, shifted into layer coordinates
+        pad = ARROW_SIZE * self.scale
+        x0 = local.x + ox - pad
+        y0 = local.y + oy - pad
+        x1 = local.right + ox + pad
+        y1 = local.bottom + oy + pad
+        for link in links:
+            if link not in self.geometry:
+                continue
+            centers, points = self._arrows(link)
+            if np is not None:
+                if not len(centers):
+                    continue
+                mask = (centers[:, 0] >= x0) & (centers[:, 0] <= x1) & (centers[:, 1] >= y0) & (centers[:, 1] <= y1)
+                tris = (points[mask] - (ox, oy)).tolist()
+            else:
+                tris = [
+                    [(x - ox, y - oy) for x, y in tri]
+                    for (cx, cy), tri in zip(centers, points)
+                    if x0 <= cx <= x1 and y0 <= cy <= y1
+                ]
+            for tri in tris:
+                pygame.draw.polygon(self.surface, self.color, tri)
+        self._paint_nodes(local)
+
+    def _paint_nodes(self, local):
+        if self.paint_nodes is not None:
+            s = self.scale
+            ox, oy = self.origin
+            world = pygame.Rect(math.floor((local.x + ox) / s), math.floor((local.y + oy) / s),
+                                math.ceil(local.width / s) + 1, math.ceil(local.height / s) + 1)
+            self.paint_nodes(self.surface, world, s, self.origin)
+        self.surface.set_clip(None)
+
+    def prepare(self, view, link_index):
+        """Make sure the layer covers the view (x, y, w, h in layer coordinates) and is up to date."""
+        vx, vy, vw, vh = view
+        size = (vw + 2 * self.margin, vh + 2 * self.margin)
+        ox, oy = self.origin
+
+        if self.surface is None or self.surface.get_size() != size:
+            self.surface = pygame.Surface(size)
+            if pygame.display.get_surface() is not None:
+                self.surface = self.surface.convert()
+            self.origin = (vx - self.margin, vy - self.margin)
+            self.pending = [pygame.Rect(self.origin, size)]
+        elif not (ox <= vx and oy <= vy and vx + vw <= ox + size[0] and vy + vh <= oy + size[1]):
+            # View left the layer: re-center it, keep what still overlaps
+            new_origin = (vx - self.margin, vy - self.margin)
+            shift_x = ox - new_origin[0]
+            shift_y = oy - new_origin[1]
+            self.surface.scroll(shift_x, shift_y)
+            self.origin = new_origin
+            kept = pygame.Rect(ox, oy, *size).clip(pygame.Rect(new_origin, size))
+            whole = pygame.Rect(new_origin, size)
+            if not kept.width or not kept.height:
+                self.pending = [whole]
+            else:
+                # exposed strips: left/right columns + top/bottom rows
+                strips = [
+                    pygame.Rect(whole.x, whole.y, kept.x - whole.x, whole.height),
+                    pygame.Rect(kept.right, whole.y, whole.right - kept.right, whole.height),
+                    pygame.Rect(kept.x, whole.y, kept.width, kept.y - whole.y),
+                    pygame.Rect(kept.x, kept.bottom, kept.width, whole.bottom - kept.bottom),
+                ]
+                self.pending.extend(r for r in strips if r.width > 0 and r.height > 0)
+
+        layer_rect = pygame.Rect(self.origin, size)
+        pending, self.pending = self.pending, []
+        s = self.scale
+        for rect in pending:
+            rect = rect.clip(layer_rect)
+            if rect.width and rect.height:
+                self._paint(rect, link_index.query_rect(rect.x / s - ARROW_SIZE, rect.y / s - ARROW_SIZE,
+                                                        rect.width / s + 2 * ARROW_SIZE, rect.height / s + 2 * ARROW_SIZE))
+
+    def blit(self, surf, screen_rect, camera):
+        """Copy the part of the layer under screen_rect onto surf."""
+        area = pygame.Rect(screen_rect).move(-camera[0] - self.origin[0], -camera[1] - self.origin[1])
+        surf.blit(self.surface, screen_rect, area)
@@ -1,33 +1,53 @@
 import pygame
+import math
+import os
+import queue
 import sys
+import threading
 import time
-import json
+from collections import OrderedDict, deque
+from types import MappingProxyType
+
+import tree_bin
+import export_png
+import export_svg
+import layout
+import paging
+import rewards
+import tree_io
+import treediff
+from graph import DepGraph
+from journal import Journal, JournalError
+from linklayer import LinkLayer, scale_rect
+from profiler import Profiler
+from registry import MissionRegistry
+from search import SearchIndex
+from spatial import SpatialGrid
+from tree_io import MISSION_FIELDS, TreeFileError
 
 # File dialogs (for Ctrl+S / Ctrl+L)
 import tkinter as tk
-from tkinter import filedialog, simpledialog
-
-# Hidden Tk window for dialogs
-tk_root = tk.Tk()
-tk_root.withdraw()
+from tkinter import filedialog, messagebox, simpledialog
 
-pygame.init()
-FONT = pygame.font.SysFont("consolas", 18)
+# Set up by init_gui(), so importing this file doesn't open a window
+tk_root = None
+FONT = None
+HUD_FONT = None
 
 WIDTH, HEIGHT = 1100, 800
-screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
-pygame.display.set_caption("Astroneer Mission Log Editor")
+screen = None
 
 camera_x = 0
 camera_y = 0
+zoom = 1.0   # screen = world * zoom + camera, always one of ZOOM_LEVELS
 
-# ID system
-next_id = 1
-free_ids = []
+# All missions, indexed by ID, + the ID allocator
+missions = MissionRegistry()
 
 # Save message popup
 save_message = ""
 save_message_time = 0
+toast_rect = pygame.Rect(0, 0, 0, 0)
 
 # Global clipboard for Editor copy/paste
 clipboard = ""
@@ -35,178 +55,1079 @@ clipboard = ""
 # Currently-selected ID for arrow-key moving (0 = none)
 moving_id = 0
 
+# Memory-mapped .anrmtb file the loaded missions still read their details from
+binary_source = None
+
+TREE_FILETYPES = [
+    ("Astroneer Mission Tree", "*.anrmt"),
+    ("Binary Mission Tree", "*.anrmtb"),
+    ("All Files", "*.*"),
+]
+
+IMAGE_FILETYPES = [
+    ("PNG Image", "*.png"),
+    ("SVG Image", "*.svg"),
+]
+
 
 # =====================================================================
 # FILE DIALOG SAVE
 # =====================================================================
-def save_file_dialog():
-    global save_message, save_message_time
-
+def save_file_dialog(compact=False):
     filepath = filedialog.asksaveasfilename(
         defaultextension=".anrmt",
-        filetypes=[("Astroneer Save Mission Tree", "*.anrmt"), ("All Files", "*.*")]
+        filetypes=TREE_FILETYPES
     )
     if not filepath:
         return
 
-    data = []
+    if pager is not None:
+        records, path, then = paged_save(filepath)
+    else:
+        # Building the records decodes every lazy detail block, so the binary
+        # source can be let go before we (possibly) overwrite that same file.
+        # The records are a snapshot: edits made while the file is written don't leak in.
+        records = [m.record() for m in missions]
+        release_binary_source()
+        path, then = filepath, None
+
+    # Edits from now on are journaled on top of the file being written
+    gen = journal.begin({"base": "save", "path": os.path.abspath(filepath)})
+    saver.submit(records, path, compact, journal_gen=gen, then=then)
+    show_message("Saving…")
+
+
+# =====================================================================
+# BACKGROUND SAVING
+# =====================================================================
+SAVE_DONE = pygame.USEREVENT + 1  # posted by the worker when a save finishes
+
+
+class SaveWorker:
+    """Writes snapshots on a background thread, one save at a time, in order."""
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.pending = 0   # only touched on the main thread
+        self.thread = None
+
+    def submit(self, records, path, compact=False, journal_gen=None, then=None):
+        """then: called on the main thread once the file is written, returns where it ended up."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="save-worker", daemon=True)
+            self.thread.start()
+        self.pending += 1
+        self.jobs.put((records, path, compact, journal_gen, then))
+
+    def _run(self):
+        while True:
+            records, path, compact, journal_gen, then = self.jobs.get()
+            error = None
+            try:
+                tree_io.save_records(records, path, compact=compact)
+            except Exception as ex:  # reported on the main thread
+                error = ex
+            pygame.event.post(pygame.event.Event(SAVE_DONE, path=path, error=error, journal_gen=journal_gen,
+                                                 then=then))
+            self.jobs.task_done()
+
+    def finished(self, event):
+        """Handle a SAVE_DONE event."""
+        self.pending -= 1
+        error = event.error
+        path = event.path
+        if error is None and event.then is not None:
+            try:
+                path = event.then()
+            except (OSError, tree_bin.BinaryFormatError) as ex:
+                error = ex
+        if error is not None:
+            show_message(f"Save failed: {error}")
+            return
+        journal.confirm_save(event.journal_gen, path)
+        if not self.pending:
+            show_message("Saved!")
+
+    def wait(self):
+        """Block until every queued save is on disk (used when quitting)."""
+        if self.thread is not None:
+            self.jobs.join()
+
+
+saver = SaveWorker()
+
+
+# =====================================================================
+# IMAGE EXPORT (Ctrl+E) — PNG in tiles on a process pool, or SVG
+# =====================================================================
+EXPORT_DONE = pygame.USEREVENT + 2
+exports_pending = 0
+
+
+def export_image_dialog():
+    global exports_pending
+    if pager is not None:
+        show_message("Too big to export from here: use python cli.py export")
+        return
+    filepath = filedialog.asksaveasfilename(
+        defaultextension=".png",
+        filetypes=IMAGE_FILETYPES
+    )
+    if not filepath:
+        return
+
+    # Same snapshot idea as saving: later edits don't end up in the image
+    records = [m.record() for m in missions]
+    checked = [m.id for m in missions if m.checked]
+    if filepath.lower().endswith(".svg"):
+        heights = {m.id: m.rect.height for m in missions}
+        job = lambda: export_svg.write_svg(records, filepath, checked, heights)
+    else:
+        job = lambda: export_png.export_png(records, filepath, checked)
+
+    def run():
+        error = None
+        try:
+            job()
+        except Exception as ex:  # reported on the main thread
+            error = ex
+        pygame.event.post(pygame.event.Event(EXPORT_DONE, path=filepath, error=error))
+
+    threading.Thread(target=run, name="image-export", daemon=True).start()
+    exports_pending += 1
+    show_message("Exporting…")
+
+
+def export_finished(event):
+    """Handle an EXPORT_DONE event."""
+    global exports_pending
+    exports_pending -= 1
+    if event.error is not None:
+        show_message(f"Export failed: {event.error}")
+    else:
+        show_message(f"Exported {os.path.basename(event.path)}")
+
+
+def release_binary_source():
+    """Decode any details still living in the mmapped .anrmtb file, then close it."""
+    global binary_source
+    if binary_source is None:
+        return
     for m in missions:
-        data.append({
-            "id": m.id,
-            "x": m.x,
-            "y": m.y,
-            "text": m.text,
-            "type": m.type,
-            "color": m.color,
-            "logic": m.logic,
-            "dependencies": [d.id for d in m.dependencies],
-            "mission": {
-                "desc": m.mission.get("desc", ""),
-                "task": m.mission.get("task", ""),
-                "item": m.mission.get("item", ""),
-                "rwrd": m.mission.get("rwrd", "")
-            }
-        })
+        m.mission  # reading it forces the lazy decode
+    binary_source.close()
+    binary_source = None
 
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=4)
 
-    save_message = "Saved!"
-    save_message_time = time.time()
+# =====================================================================
+# EDIT JOURNAL — autosave + crash recovery (see journal.py)
+# =====================================================================
+journal = Journal()
+
+
+def recover_journal():
+    """At startup: offer to bring back edits the last session never saved."""
+    if journal.has_recovery() and messagebox.askyesno(
+            "Recover", "The last session has unsaved edits. Recover them?", parent=tk_root):
+        try:
+            records, checked = journal.recover()
+        except (OSError, JournalError) as ex:
+            show_message(f"Recovery failed: {ex}")
+        else:
+            build_tree(records)
+            for mid in checked:
+                m = missions.get(mid)
+                if m is not None:
+                    m.checked = True
+            for m in missions:
+                recount_done(m)
+            journal.compact()  # the new session starts from a snapshot of the recovered tree
+            show_message(f"Recovered {len(missions)} missions")
+            mark_dirty()
+            return
+    journal.discard()
+    journal.begin({"base": "empty"})
+
+
+def confirm_discard():
+    """Before wiping the tree (Ctrl+N, Ctrl+L): ask if there are edits that were never saved."""
+    journal.flush()
+    if not journal.has_recovery():
+        return True
+    return messagebox.askyesno("Unsaved Edits", "The current tree has unsaved edits. Throw them away?", parent=tk_root)
 
 
 # =====================================================================
 # FILE DIALOG LOAD
 # =====================================================================
 def load_file_dialog():
-    global next_id, free_ids, camera_x, camera_y
-
     filepath = filedialog.askopenfilename(
-        filetypes=[("Astroneer Mission Tree", "*.anrmt"), ("All Files", "*.*")]
+        filetypes=TREE_FILETYPES
     )
-    if not filepath:
+    if not filepath or not confirm_discard():
         return
+    load_file(filepath)
+
+
+def load_file(filepath):
+    """Replace the tree with an .anrmt / .anrmtb file (problems end up in the toast).
 
-    with open(filepath, "r") as f:
-        data = json.load(f)
-
-    missions.clear()
-    free_ids.clear()
-    next_id = 1
-
-    id_map = {}
-
-    # Create missions
-    for m in data:
-        mid = m["id"]
-        new_m = Mission(m["x"], m["y"], mid)
-        new_m.text = m["text"]
-        new_m.type = m["type"]
-        new_m.color = m["color"]
-        new_m.logic = m.get("logic", "AND")
-        mission_block = m.get("mission", {})
-        new_m.mission["desc"] = mission_block.get("desc", "")
-        new_m.mission["task"] = mission_block.get("task", "")
-        new_m.mission["item"] = mission_block.get("item", "")
-        new_m.mission["rwrd"] = mission_block.get("rwrd", "")      # Load extra mission data (if present)
-
-        missions.append(new_m)
-        id_map[mid] = new_m
-
-        next_id = max(next_id, mid + 1)
-
-    # Reconstruct dependencies
-    for m in data:
-        mission_obj = id_map[m["id"]]
-        for dep in m["dependencies"]:
-            if dep in id_map:
-                mission_obj.dependencies.append(id_map[dep])
-                id_map[dep].dependents.append(mission_obj)
-    
+    The file is read into a tree of its own, swapped in once all of it made it: a
+    broken file leaves the open tree, its undo history and its journal as they were.
+    """
+    global camera_x, camera_y, zoom
+
+    try:
+        binary = tree_bin.is_binary_file(filepath)
+    except OSError as ex:
+        show_message(f"Load failed: {ex}")
+        return
+
+    old = swap_tree(empty_tree())
+    try:
+        if binary:
+            duplicates = load_binary(filepath)
+        else:
+            duplicates = build_tree(tree_io.iter_records(filepath, progress=LoadProgress(filepath).update))
+    except (OSError, TreeFileError, tree_bin.BinaryFormatError) as ex:
+        failed = swap_tree(old)
+        if failed[BINARY_SOURCE] is not None:
+            failed[BINARY_SOURCE].close()
+        show_message(f"Load failed: {ex}")
+        mark_dirty()    # the progress bar drew over the canvas
+        return
+
+    new = swap_tree(old)
+    clear_tree()
+    swap_tree(new)
     camera_x = 0
     camera_y = 0
+    zoom = 1.0
+    journal.begin_file(filepath)
+    if duplicates:
+        show_message(f"Skipped {duplicates} missions with duplicate IDs")
+    mark_dirty()
+
+
+BINARY_SOURCE = 6   # where binary_source is in a swap_tree tuple
+
+
+def empty_tree():
+    """Everything a loaded tree lives in, new and empty (see swap_tree)."""
+    return (MissionRegistry(), SpatialGrid(), SpatialGrid(), OrderedDict(), DepGraph(), SearchIndex(), None, None,
+            None, False)
+
+
+def swap_tree(tree):
+    """Make tree (from empty_tree, or an earlier swap_tree) the open one. Returns the one it replaced."""
+    global missions, node_index, link_index, link_layers, graph, search_index, binary_source, pager, page_view
+    global search_ready
+    old = (missions, node_index, link_index, link_layers, graph, search_index, binary_source, pager, page_view,
+           search_ready)
+    (missions, node_index, link_index, link_layers, graph, search_index, binary_source, pager, page_view,
+     search_ready) = tree
+    return old
+
+
+def build_tree(records):
+    """Add missions from an iterable of records (file load, recovery). Returns how many
+    were skipped for duplicate IDs. Errors from the iterable are passed on."""
+    # Missions are built as the records stream in. A dependency on a mission
+    # that hasn't been read yet keeps a None slot (so the order is kept) until
+    # that mission shows up.
+    waiting = {}  # missing id -> [(mission, slot index), ...]
+    duplicates = 0
+    try:
+        for m in records:
+            if m["id"] in missions:
+                duplicates += 1
+                continue
+            new_m = Mission(m["x"], m["y"], m["id"])
+            new_m.dependencies = []   # lists while loading, see freeze_links
+            new_m.dependents = []
+            new_m.text = m["text"]
+            new_m.type = sys.intern(m["type"])      # a handful of distinct values shared by the whole tree
+            new_m.color = sys.intern(m["color"])
+            new_m.logic = sys.intern(m["logic"])
+            new_m.update_details(m["mission"])      # Load extra mission data (if present)
+            missions.add(new_m)
+            new_m.fit_height()
+            node_index.insert_rect(new_m, new_m.rect.x, new_m.rect.y, new_m.rect.width, new_m.rect.height)
+
+            for dep in m["dependencies"]:
+                dep_obj = missions.get(dep)
+                if dep_obj is not None:
+                    if type(dep_obj.dependents) is tuple:  # a mission from before this load
+                        dep_obj.dependents = list(dep_obj.dependents)
+                    new_m.dependencies.append(dep_obj)
+                    dep_obj.dependents.append(new_m)
+                    index_link(new_m, dep_obj)
+                else:
+                    waiting.setdefault(dep, []).append((new_m, len(new_m.dependencies)))
+                    new_m.dependencies.append(None)
+
+            for dependent, slot in waiting.pop(new_m.id, ()):
+                dependent.dependencies[slot] = new_m
+                new_m.dependents.append(dependent)
+                index_link(dependent, new_m)
+    finally:
+        # Dependencies on IDs that never showed up are dropped
+        for slots in waiting.values():
+            for dependent, _ in slots:
+                dependent.dependencies = [d for d in dependent.dependencies if d is not None]
+        freeze_links(missions)
+        rebuild_graph()
+    return duplicates
+
+
+def freeze_links(ms):
+    """Turn the adjacency lists built during a load into tuples (smaller, and shared when empty)."""
+    for m in ms:
+        m.dependencies = tuple(m.dependencies)
+        m.dependents = tuple(m.dependents)
+
+
+def load_binary(filepath):
+    """Load a .anrmtb file. Detail blocks stay in the mmap until something reads them.
+    Returns how many were skipped for duplicate IDs (errors are passed on, like build_tree)."""
+    global binary_source
+    tree = binary_source = tree_bin.BinaryTree(filepath)
+    if len(tree) >= PAGED_MIN_MISSIONS:
+        open_paged(tree)
+        return 0
+
+    progress = LoadProgress(filepath)
+    total = len(tree)
+    loaded = []  # (file index, mission), for the dependency pass
+    for i in range(total):
+        if i % 1024 == 0:
+            progress.update(i, total)
+        mid = tree.id[i]
+        if mid in missions:
+            continue
+        new_m = Mission(tree.number(i, "x"), tree.number(i, "y"), mid)
+        new_m.dependencies = []   # lists while loading, see freeze_links
+        new_m.dependents = []
+        new_m.text = tree.string(tree.text[i])
+        new_m.type = sys.intern(tree.string(tree.type[i]))
+        new_m.color = sys.intern(tree.string(tree.color[i]))
+        new_m.logic = sys.intern(tree.string(tree.logic[i]))
+        if tree.has_details(i):
+            new_m.lazy_details(tree, i)
+        missions.add(new_m)
+        new_m.fit_height()
+        node_index.insert_rect(new_m, new_m.rect.x, new_m.rect.y, new_m.rect.width, new_m.rect.height)
+        loaded.append((i, new_m))
+    progress.update(total, total)
+
+    # Dependencies (CSR column, no per-mission lists until now)
+    for i, new_m in loaded:
+        for dep in tree.dependencies(i):
+            dep_obj = missions.get(dep)
+            if dep_obj is not None:
+                if type(dep_obj.dependents) is tuple:
+                    dep_obj.dependents = list(dep_obj.dependents)
+                new_m.dependencies.append(dep_obj)
+                dep_obj.dependents.append(new_m)
+                index_link(new_m, dep_obj)
+    freeze_links(missions)
+    rebuild_graph()
+    return total - len(loaded)
+
+
+def clear_tree():
+    """Forget every mission (load, Ctrl+N)."""
+    global binary_source, pager
+    if pager is not None:
+        saver.wait()    # a save may still be reading the file
+        pager.close()
+        pager = None
+    missions.clear()    # also resets the ID counter back to 1
+    clear_index()
+    graph.clear()
+    history.clear()
+    reach_cache.clear()
+    reset_search()
+    close_all_popups()
+    if binary_source is not None:
+        binary_source.close()
+        binary_source = None
+
+
+class LoadProgress:
+    """Progress bar drawn straight to the window while a file streams in."""
+
+    def __init__(self, filepath):
+        self.name = os.path.basename(filepath)
+        self.last_draw = 0
+
+    def update(self, done, total):
+        now = time.time()
+        if now - self.last_draw < 0.05 and done < total:
+            return
+        self.last_draw = now
+        pygame.event.pump()  # keep the window responsive
+
+        frac = done / total if total else 1
+        bar = pygame.Rect(0, 0, WIDTH // 2, 24)
+        bar.center = (WIDTH // 2, HEIGHT // 2)
+        screen.fill(BG_COLOR)
+        label = FONT.render(f"Loading {self.name}... {int(frac * 100)}%", True, (0, 0, 0))
+        screen.blit(label, label.get_rect(midbottom=(bar.centerx, bar.y - 8)))
+        pygame.draw.rect(screen, (63, 169, 245), (bar.x, bar.y, int(bar.width * frac), bar.height))
+        pygame.draw.rect(screen, (0, 0, 0), bar, 2)
+        pygame.display.flip()
+
+
+# =====================================================================
+# PAGED CANVAS — huge .anrmtb files, a few tiles at a time (see paging.py)
+# =====================================================================
+# Only the tiles around the camera have their missions in `missions`, along
+# with every mission linked to them ("ghosts" until their own tile loads:
+# some of their links may be missing). Drawing and hit testing just work on
+# what's there. Edits go through find_mission / page_edit, which load the
+# tiles of the missions they change first, and those tiles then stay loaded
+# until the next save. A clean mission's links come from the file, an
+# edited one's only from memory.
+PAGED_MIN_MISSIONS = 250000   # .anrmtb files with at least this many missions open in pages
+PAGE_MARGIN = 512             # world px around the view that must be loaded (boxes stick out of their tile)
+PAGE_CACHE = 64               # tiles kept loaded (at least twice what the view needs)
+PAGED_MIN_ZOOM = 0.2          # further out the view would need most of the tree anyway
+PAGE_BUDGET = 0.03            # seconds of tile loading per frame (the rest waits for the next one)
+
+pager = None       # paging.TilePager of the open tree (None: the whole tree is in memory)
+page_view = None   # tile keys the view needed last frame
+
+
+def open_paged(tree):
+    """Open a big binary tree in pages: nothing is read until the camera looks at it."""
+    global pager, binary_source, page_view
+    pager = paging.TilePager(tree, PAGE_CACHE)
+    binary_source = tree
+    page_view = None
+    missions.next_id = tree.max_id() + 1   # IDs that are only on disk are still taken
+    show_message(f"{len(tree)} missions, opened in pages (only what's on screen is loaded)")
+
+
+def update_pages():
+    """Once a frame: load the tiles the view needs, prefetch the ones around them, unload old clean ones."""
+    global page_view
+    if pager is None:
+        return
+    x, y, w, h = camera_view()
+    view = [key for key in pager.keys_in(x - PAGE_MARGIN, y - PAGE_MARGIN, w + 2 * PAGE_MARGIN, h + 2 * PAGE_MARGIN)
+            if key in pager.numbers]
+    started = time.perf_counter()
+    for key in view:
+        if key not in pager.loaded:
+            if time.perf_counter() - started > PAGE_BUDGET:
+                break  # nearest first, the rest next frame (page_in marked the screen dirty, so it comes soon)
+            page_in(key)
+        pager.seen(key)
+    if view == page_view:
+        return
+    page_view = view
+    pager.prefetch(pager.ring(view))
+    pager.capacity = max(PAGE_CACHE, 2 * len(view))
+    for key in pager.victims(set(view) | busy_tiles()):
+        page_out(key)
+
+
+def busy_tiles():
+    """Tiles that have to stay loaded: something is open on one of their missions."""
+    ids = set(detail_popups)
+    if moving_id:
+        ids.add(moving_id)
+    if editor is not None:
+        ids.add(editor.m.id)
+    return {pager.home[mid] for mid in ids if mid in pager.home}
+
+
+def page_in(key):
+    """Load a tile: its missions, and the ones linked to them (as ghosts, if they aren't in memory yet)."""
+    repaint_links()
+    members, linked = pager.take(key)
+    pinned = []
+    new = []
+    for fields in members + linked:
+        mid = fields[1]
+        if mid in pager.deleted:
+            continue
+        pinned.append(mid)
+        if mid not in missions:
+            new.append(materialize(fields))
+    pager.pin(key, pinned)
+    link_new(new)
+
+
+def materialize(fields):
+    """A mission from a decoded file row (see TilePager.decode_row), not linked yet."""
+    row, mid, x, y, text, mtype, color, logic, details = fields
+    m = Mission(x, y, mid)
+    m.text = text
+    m.type = sys.intern(mtype)
+    m.color = sys.intern(color)
+    m.logic = sys.intern(logic)
+    if details:
+        m.lazy_details(pager.tree, row)
+    m.checked = mid in pager.checked
+    missions.add(m)
+    graph.add_node(mid)
+    m.fit_height(wrap_text(text, Mission.FONT, m.rect.width - 10))  # measured only, drawn when it shows up
+    pager.rows[mid] = row
+    pager.home[mid] = pager.row_key(row)
+    return m
+
+
+def file_dependencies(row):
+    """The missions in memory that a file row depends on, in the file's order."""
+    tree = pager.tree
+    deps = [missions.get(tree.id[r]) for r in tree.dependency_rows(row) if r != tree_bin.NO_ROW]
+    return [d for d in deps if d is not None]
+
+
+def link_new(new):
+    """Link freshly loaded missions as the file has them, to each other and to what was loaded before."""
+    tree = pager.tree
+    fresh = {m.id for m in new}
+    grown = {}   # clean missions loaded before that have more of their dependencies in memory now
+    for m in new:
+        row = pager.rows[m.id]
+        m.dependencies = tuple(file_dependencies(row))
+        for d in m.dependencies:
+            d.dependents += (m,)
+            graph.add_edge(d.id, m.id)
+        for r in tree.dependent_rows(row):
+            dep = missions.get(tree.id[r])
+            if dep is not None and dep.id not in fresh and dep.id not in pager.edited:
+                grown[dep.id] = dep
+    for dep in grown.values():
+        unindex_mission(dep)
+        set_dependencies(dep, file_dependencies(pager.rows[dep.id]))
+        index_mission(dep)
+    for m in new:
+        recount_done(m)
+        index_mission(m)
+
+
+def page_out(key):
+    """Unload a clean tile: the missions no other loaded tile pins leave memory."""
+    drop_missions([missions.get(mid) for mid in pager.unpin(key)])
+
+
+def drop_missions(gone):
+    """Take paged-out missions out of memory (unlike deleting them, the file still has them)."""
+    gone = [m for m in gone if m is not None]
+    if gone:
+        repaint_links()
+    ids = {m.id for m in gone}
+    for m in gone:
+        unindex_mission(m)
+    for m in gone:
+        for d in m.dependencies:
+            if d.id not in ids:
+                d.dependents = tuple(x for x in d.dependents if x is not m)
+        for dep in m.dependents:
+            if dep.id not in ids:  # a ghost: its list was never complete anyway
+                dep.dependencies = tuple(x for x in dep.dependencies if x is not m)
+                recount_done(dep)
+        graph.remove_node(m.id)
+        missions.drop(m)
+        del pager.rows[m.id], pager.home[m.id]
+
+
+def repaint_links():
+    """A tile's worth of links is about to change: one repaint of the whole screen beats
+    hundreds of overlapping dirty rects (their arrows can reach right across the canvas)."""
+    for layer in link_layers.values():
+        layer.repaint()
+    mark_dirty()
+
+
+def is_full(m):
+    """m's links are all in memory (always, unless it's a ghost of a paged tree)."""
+    return pager is None or pager.home.get(m.id) in pager.loaded
+
+
+def find_mission(mid):
+    """missions.get, except that on a paged tree the mission's tile gets loaded first."""
+    m = missions.get(mid)
+    if pager is None or (m is not None and is_full(m)):
+        return m
+    if m is not None:
+        key = pager.home[mid]
+    else:
+        row = pager.tree.row_of(mid) if mid not in pager.deleted else None
+        if row is None:
+            return None
+        key = pager.row_key(row)
+    page_in(key)
+    return missions.get(mid)
+
+
+def page_edit(m):
+    """m is about to change: load its tile (so all its links are there), and keep it until saved."""
+    if pager is None:
+        return
+    key = pager.home[m.id]
+    if key not in pager.loaded:
+        page_in(key)
+    pager.touch(key, m.id)
+
+
+def page_keep(m):
+    """m's links changed: its tile keeps what it depends on now in memory too."""
+    if pager is not None:
+        pager.pin(pager.home[m.id], [m.id] + [d.id for d in m.dependencies])
+
+
+def page_new(m):
+    """m is about to be added, and isn't from the file (created, or a deleted one back from undo)."""
+    if pager is None:
+        return
+    key = pager.key_of(m.x, m.y)
+    if key not in pager.loaded:
+        page_in(key)
+    pager.deleted.discard(m.id)
+    row = pager.tree.row_of(m.id)   # a deleted mission that comes back still has its row
+    pager.rows[m.id] = row
+    if row is None:
+        pager.created[m.id] = True
+    pager.home[m.id] = key
+    pager.touch(key, m.id)
+    pager.pin(key, [m.id])
+
+
+def page_gone(m):
+    """m was deleted."""
+    if pager is None:
+        return
+    mid = m.id
+    if pager.rows.pop(mid) is not None:
+        pager.deleted.add(mid)
+    del pager.home[mid]
+    pager.edited.discard(mid)
+    pager.created.pop(mid, None)
+    pager.checked.discard(mid)
+    pager.changes += 1
+    pager.forget(mid)
+
+
+def mission_exists(mid):
+    if mid in missions:
+        return True
+    return pager is not None and mid not in pager.deleted and pager.tree.row_of(mid) is not None
+
+
+def mission_position(mid):
+    """(x, y) of a mission, loaded or not (None if there's no such mission)."""
+    m = missions.get(mid)
+    if m is not None:
+        return m.x, m.y
+    if not mission_exists(mid):
+        return None
+    row = pager.tree.row_of(mid)
+    return pager.tree.number(row, "x"), pager.tree.number(row, "y")
+
+
+def dependency_ids(mid):
+    """IDs mid depends on, from memory or (a paged tree's unloaded or ghost missions) the file."""
+    m = missions.get(mid)
+    if m is not None and (is_full(m) or mid in pager.edited):
+        return [d.id for d in m.dependencies]
+    tree = pager.tree
+    row = tree.row_of(mid)
+    ids = [tree.id[r] for r in tree.dependency_rows(row) if r != tree_bin.NO_ROW]
+    return [d for d in ids if d not in pager.deleted]
+
+
+def mission_info(mid):
+    """(dependency IDs, logic, parsed details) of a mission, loaded or not."""
+    m = missions.get(mid)
+    if m is not None:
+        return dependency_ids(mid), m.logic, m.parsed_details()
+    tree = pager.tree
+    row = tree.row_of(mid)
+    return dependency_ids(mid), tree.string(tree.logic[row]), rewards.parse_details(tree.details(row))
+
+
+def paged_check_deps(mid, dep_ids):
+    """graph.check_deps for a paged tree (the graph only has what's loaded): the rest comes from the file."""
+    tree = pager.tree
+    edited_deps = {}   # id -> edited missions depending on it (their links aren't in the file)
+    for e in pager.edited:
+        for d in missions.get(e).dependencies:
+            edited_deps.setdefault(d.id, []).append(e)
+
+    def dependent_ids(x):
+        m = missions.get(x)
+        if m is not None and is_full(m):
+            return [dep.id for dep in m.dependents]
+        row = tree.row_of(x)
+        ids = [tree.id[r] for r in tree.dependent_rows(row)] if row is not None else []
+        return [i for i in ids if i not in pager.edited and i not in pager.deleted] + edited_deps.get(x, [])
+
+    problems = []
+    seen = set()
+    for d in dep_ids:
+        if d == mid:
+            problems.append("can't depend on itself")
+        elif d in seen:
+            problems.append(f"{d} listed twice")
+        elif not mission_exists(d):
+            problems.append(f"no mission {d}")
+        elif paging.reaches(mid, d, dependent_ids, dependency_ids):
+            problems.append(f"{d} already depends on {mid} (cycle)")
+        seen.add(d)
+    return problems
+
+
+def paged_records():
+    """Every record of a paged tree, streamed: the file's rows with the edited missions swapped in,
+    then the new ones. The edits are copied now, the rows are read as the records are used."""
+    tree = pager.tree
+    edited = {mid: missions.get(mid).record() for mid in pager.edited}
+    created = [edited.pop(mid) for mid in pager.created]
+    deleted = set(pager.deleted)
+    unique = None if len(tree.tile_rows) == len(tree) else set(tree.tile_rows)  # skip duplicate IDs, like a load
+
+    def records():
+        for i in range(len(tree)):
+            mid = tree.id[i]
+            if mid in deleted or (unique is not None and i not in unique):
+                continue
+            rec = edited.get(mid)
+            yield rec if rec is not None else tree.record(i)
+        yield from created
+    return records()
+
+
+def paged_save(filepath):
+    """(records, path to write, then) to save a paged tree. Its own file can't be replaced while it's
+    mapped (Windows won't), so that one is written next to it and swapped in once it's done."""
+    records = paged_records()
+    if not (os.path.exists(filepath) and os.path.samefile(filepath, pager.tree.path)):
+        return records, filepath, None
+    root, ext = os.path.splitext(filepath)
+    side = f"{root}.saving{ext}"
+    owner = pager
+    changes = pager.changes
+
+    def swap():
+        saver.wait()  # a later save may still be reading the old file
+        if pager is owner:
+            reopen_paged(side, filepath, pager.changes == changes)
+        elif os.path.exists(side):
+            os.replace(side, filepath)
+        return filepath
+    return records, side, swap
+
+
+def reopen_paged(side, path, unchanged):
+    """Put a freshly saved copy in place of the file the paged tree is mapped from, and map it instead.
+    unchanged: nothing was edited since the save started, so every tile is clean again."""
+    global binary_source, page_view
+    pager.close()
+    release_binary_source()   # details still in the old map are read first
+    try:
+        if os.path.exists(side):  # (not if an earlier swap already took it)
+            os.replace(side, path)
+    finally:
+        binary_source = tree_bin.BinaryTree(path)
+        pager.rebind(binary_source)
+    if not unchanged or None in pager.rows.values():
+        return  # the edits stay put until the next save
+    keys = set(pager.loaded)
+    pager.saved()
+    for key in keys | busy_tiles():
+        if key in pager.numbers:
+            page_in(key)
+    drop_missions([m for m in missions if m.id not in pager.pins])
+    page_view = None
+
+
+# =====================================================================
+# TEXT RENDER CACHE
+# =====================================================================
+def wrap_text(text, font, max_width):
+    """Simple word-wrapping helper."""
+    words = text.split(" ")
+    lines = []
+    current = ""
+    for w in words:
+        test = f"{current} {w}".strip()
+        if font.size(test)[0] <= max_width:
+            current = test
+        else:
+            if current:
+                lines.append(current)
+            current = w
+    if current:
+        lines.append(current)
+    return lines
+
+
+class TextCache:
+    """LRU cache of wrapped lines + rendered surfaces, keyed by (text, font, max_width, color).
+
+    max_width=None means "don't wrap" (single line tags, the checkmark, ...).
+    """
+
+    def __init__(self, max_entries=8192):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, text, font, max_width, color):
+        key = (text, font, max_width, color)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+
+        lines = [text] if max_width is None else wrap_text(text, font, max_width)
+        surfaces = [font.render(line, True, color) for line in lines]
+        profiler.count("surfaces", len(surfaces))
+        entry = (lines, surfaces)
+
+        self.entries[key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)  # drop least recently used
+        return entry
+
+    def drop(self, text, font, max_width, color):
+        self.entries.pop((text, font, max_width, color), None)
+
+
+text_cache = TextCache()
+
+
+class CardCache:
+    """Missions drawn at full size once, then scaled down, one surface per (mission, zoom level).
+
+    Each entry remembers what the card looked like, so an edited mission gets redrawn.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # (mission id, zoom) -> (look, surface)
+
+    def get(self, m, scale):
+        key = (m.id, scale)
+        look = m.look()
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == look:
+            self.entries.move_to_end(key)
+            return entry[1]
+
+        card = pygame.Surface(m.rect.size, pygame.SRCALPHA)
+        m.paint(card, card.get_rect())
+        size = (max(1, round(m.rect.width * scale)), max(1, round(m.rect.height * scale)))
+        card = pygame.transform.smoothscale(card, size)
+        if pygame.display.get_surface() is not None:
+            card = card.convert_alpha()
+        profiler.count("surfaces")
+
+        self.entries[key] = (look, card)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return card
+
+    def clear(self):
+        self.entries.clear()
+
+
+card_cache = CardCache()
 
 
 # =====================================================================
 # MISSION CLASS
 # =====================================================================
+NO_DETAILS = MappingProxyType({field: "" for field in MISSION_FIELDS})  # shared by every mission without details
+
+
 class Mission:
-    FONT = pygame.font.SysFont("consolas", 20)  # create once per class
+    # Slots instead of a __dict__: a big tree has a lot of these
+    __slots__ = ("id", "rect", "_exact", "text", "type", "color", "logic", "checked", "dependencies", "dependents",
+                 "done_deps", "_details", "_render_key", "_parsed")
+    FONT = None  # created once per class, by init_gui()
+    TEXT_COLOR = (0, 0, 0)
+    TAG_COLOR = (30, 30, 30)
+    CHECK_COLOR = (0, 150, 0)
+    BORDER_COLORS = {"done": (0, 150, 0), "available": (0, 0, 0), "locked": (130, 130, 130)}
+    LOCKED_FADE = 0.55   # how far locked missions fade into the background
+    LINE_H = 20
 
     def __init__(self, x, y, mid):
         self.id = mid
-        self.x = x
-        self.y = y
+        self.rect = pygame.Rect(0, 0, 180, 60)
+        self.move_to(x, y)
         self.text = f"Mission {mid}"
         self.type = "normal"
         self.color = "#3FA9F5"
         self.logic = "AND"
         self.checked = False
-        self.dependencies = []
-        self.dependents = []
-        self.rect = pygame.Rect(self.x, self.y, 180, 60)
-        self.mission = {
-            "desc": "",
-            "task": "",
-            "item": "",
-            "rwrd": ""
+        # Tuples (the empty one is shared): links change rarely, and rebuilding one is cheap
+        self.dependencies = ()
+        self.dependents = ()
+        self.done_deps = 0   # how many entries of dependencies are checked
+        # None while every detail field is empty, a dict once something is in it, or
+        # (BinaryTree, index) while the detail block is still only in the .anrmtb file
+        self._details = None
+        # (text, tag) this mission last drew with, so stale cache entries can be dropped
+        self._render_key = None
+        # (tasks, rewards, problems) parsed from the detail block, until it changes
+        self._parsed = None
+
+    # The position is the rect's corner. Only one that isn't in whole pixels (a hand-edited
+    # file) is kept as given as well, so it saves back unchanged.
+    @property
+    def x(self):
+        return self.rect.x if self._exact is None else self._exact[0]
+
+    @property
+    def y(self):
+        return self.rect.y if self._exact is None else self._exact[1]
+
+    def move_to(self, x, y):
+        self.rect.x = int(x)
+        self.rect.y = int(y)
+        self._exact = None if x == self.rect.x and y == self.rect.y else (x, y)
+
+    @property
+    def mission(self):
+        """Detail block (desc/task/item/rwrd), decoded from the binary file on first use.
+        Read only: change it with update_details()."""
+        details = self._details
+        if type(details) is tuple:
+            tree, i = details
+            details = tree.details(i)
+            self._details = details = details if any(details.values()) else None
+        return NO_DETAILS if details is None else details
+
+    def update_details(self, block):
+        """Merge block into the detail block. An all-empty block isn't stored at all."""
+        details = dict(self.mission)
+        details.update(block)
+        self._details = details if any(details.values()) else None
+        self._parsed = None
+
+    def lazy_details(self, tree, i):
+        """Read the detail block from an .anrmtb file only when something asks for it."""
+        self._details = (tree, i)
+        self._parsed = None
+
+    def parsed_details(self):
+        """Task/Reward tuples (and format problems) of the detail block, parsed once."""
+        if self._parsed is None:
+            self._parsed = rewards.parse_details(self.mission)
+        return self._parsed
+
+    def record(self):
+        """This mission as an .anrmt record (what gets saved)."""
+        details = self.mission
+        return {
+            "id": self.id,
+            "x": self.x,
+            "y": self.y,
+            "text": self.text,
+            "type": self.type,
+            "color": self.color,
+            "logic": self.logic,
+            "dependencies": [d.id for d in self.dependencies],
+            "mission": {field: details.get(field, "") for field in MISSION_FIELDS},
         }
 
+    def status(self):
+        """"done" (checked), "available" (its AND/OR over the dependencies is met) or "locked"."""
+        if self.checked:
+            return "done"
+        if not self.dependencies:
+            return "available"
+        if self.logic == "OR":
+            return "available" if self.done_deps else "locked"
+        return "available" if self.done_deps == len(self.dependencies) else "locked"
+
     def contains(self, pos):
-        px, py = pos
-        return self.rect.collidepoint(px - camera_x, py - camera_y)
-
-    def wrap_text(self, text, font, max_width):
-        """Simple word-wrapping helper."""
-        words = text.split(" ")
-        lines = []
-        current = ""
-        for w in words:
-            test = f"{current} {w}".strip()
-            if font.size(test)[0] <= max_width:
-                current = test
-            else:
-                if current:
-                    lines.append(current)
-                current = w
-        if current:
-            lines.append(current)
-        return lines
+        px, py = to_world(pos)
+        return self.rect.collidepoint(math.floor(px), math.floor(py))
+
+    def tag_text(self):
+        logic_text = f" | {self.logic}" if len(self.dependencies) > 1 else ""
+        return sys.intern(f"{self.type}{logic_text}")  # kept in _render_key: one copy per distinct tag
+
+    def render_text(self):
+        """Wrapped lines + surfaces for the name and the type/logic tag (cached)."""
+        max_width = self.rect.width - 10
+        render_key = (self.text, self.tag_text(), max_width)
+
+        # Text, type, logic or dependency count changed -> forget the old surfaces
+        if self._render_key is not None and self._render_key != render_key:
+            old_text, old_tag, old_width = self._render_key
+            if old_text != self.text or old_width != max_width:
+                text_cache.drop(old_text, self.FONT, old_width, self.TEXT_COLOR)
+            if old_tag != render_key[1]:
+                text_cache.drop(old_tag, self.FONT, None, self.TAG_COLOR)
+        self._render_key = render_key
+
+        lines, line_surfs = text_cache.get(self.text, self.FONT, max_width, self.TEXT_COLOR)
+        _, tag_surfs = text_cache.get(render_key[1], self.FONT, None, self.TAG_COLOR)
+        return lines, line_surfs, tag_surfs[0]
+
+    def fit_height(self, lines=None):
+        """Grow the rect to fit the wrapped name. Returns True if the height changed."""
+        if lines is None:
+            lines = self.render_text()[0]
+        needed_height = 10 + len(lines) * self.LINE_H + 40  # top pad + lines + bottom pad
+        if needed_height > self.rect.height:
+            self.rect.height = needed_height
+            return True
+        return False
+
+    def fill_color(self, status=None):
+        bg_color = pygame.Color((170, 170, 170) if self.type == "special" else self.color)
+        if (status or self.status()) == "locked":
+            bg_color = bg_color.lerp(BG_COLOR, self.LOCKED_FADE)
+        return bg_color
+
+    def look(self):
+        """Everything the drawn box depends on (see CardCache)."""
+        return (self.text, self.tag_text(), self.type, self.color, self.status(), self.rect.size)
 
     def draw(self, surf):
-        draw_rect = self.rect.move(camera_x, camera_y)
-        bg_color = (170, 170, 170) if self.type == "special" else pygame.Color(self.color)
+        if zoom == 1:
+            self.paint(surf, self.rect.move(camera_x, camera_y))
+            return
+        # Zoomed out: the scaled card from the cache (grown to fit its text first)
+        if self.fit_height():
+            index_mission(self)
+        surf.blit(card_cache.get(self, zoom), to_screen_rect(self.rect))
 
-        pygame.draw.rect(surf, bg_color, draw_rect, border_radius=10)
-        pygame.draw.rect(surf, (0, 0, 0), draw_rect, 2, border_radius=10)
+    def paint(self, surf, draw_rect):
+        """The full size box at draw_rect (screen position, or a card surface)."""
+        status = self.status()
+        pygame.draw.rect(surf, self.fill_color(status), draw_rect, border_radius=10)
+        pygame.draw.rect(surf, self.BORDER_COLORS[status], draw_rect, 2, border_radius=10)
 
         # Checkmark
         if self.checked:
-            check = self.FONT.render("+", True, (0, 150, 0))
+            check = text_cache.get("+", self.FONT, None, self.CHECK_COLOR)[1][0]
             surf.blit(check, (draw_rect.right - 20, draw_rect.bottom - 25))
 
-        # Text wrapping
-        max_width = self.rect.width - 10
-        lines = self.wrap_text(self.text, self.FONT, max_width)
+        # Text wrapping (cached)
+        lines, line_surfs, tag = self.render_text()
 
         # Dynamic height
-        line_h = 20
-        top_pad = 10
-        bottom_pad = 40
-        needed_height = top_pad + len(lines) * line_h + bottom_pad
-        if needed_height > self.rect.height:
-            self.rect.height = needed_height
-            draw_rect.height = needed_height
+        if self.fit_height(lines):
+            draw_rect.height = self.rect.height
+            index_mission(self)
 
         y_offset = draw_rect.y + 5
-        for line in lines:
-            txt = self.FONT.render(line, True, (0, 0, 0))
+        for txt in line_surfs:
             surf.blit(txt, (draw_rect.x + 5, y_offset))
-            y_offset += line_h
+            y_offset += self.LINE_H
 
         # Type + logic tag
-        logic_text = f" | {self.logic}" if len(self.dependencies) > 1 else ""
-        tag = self.FONT.render(f"{self.type}{logic_text}", True, (30, 30, 30))
         surf.blit(tag, (draw_rect.x + 5, draw_rect.bottom - 22))
 
 
@@ -214,6 +1135,8 @@ class Mission:
 # EDITOR POPUP
 # =====================================================================
 class Editor:
+    RECT = pygame.Rect(150, 100, 800, 500)
+
     def __init__(self, mission):
         self.m = mission
         self.active = True
@@ -226,10 +1149,38 @@ class Editor:
 
         self.fields = ["name", "type", "color", "logic", "deps"]
         self.current_field = 0
+        self.check_deps()
+
+    def parse_deps(self):
+        """(IDs, entries that aren't IDs) in the deps field. Empty entries ("1,,2", a trailing comma) are fine."""
+        ids = []
+        bad = []
+        for s in self.deps_buffer.split(","):
+            s = s.strip()
+            if not s:
+                continue
+            try:
+                ids.append(int(s))
+            except ValueError:
+                bad.append(s)
+        return ids, bad
+
+    def dep_ids(self):
+        return self.parse_deps()[0]
+
+    def check_deps(self):
+        """Entries that aren't IDs, self-references, duplicates, unknown IDs and cycles in the deps field
+        (every keystroke)."""
+        ids, bad = self.parse_deps()
+        self.deps_problems = [f"{s!r} isn't an ID" for s in bad]
+        if pager is not None:
+            self.deps_problems += paged_check_deps(self.m.id, ids)
+        else:
+            self.deps_problems += graph.check_deps(self.m.id, ids)
 
     def draw(self, surf):
-        pygame.draw.rect(surf, (40, 40, 40), (150, 100, 800, 500))
-        pygame.draw.rect(surf, (200, 200, 200), (150, 100, 800, 500), 3)
+        pygame.draw.rect(surf, (40, 40, 40), self.RECT)
+        pygame.draw.rect(surf, (200, 200, 200), self.RECT, 3)
 
         lines = [
             f"Editing Mission ID: {self.m.id}",
@@ -239,7 +1190,7 @@ class Editor:
             f"Color (hex): {self.color_buffer}",
             f"Logic (AND/OR): {self.logic_buffer}",
             f"Dependencies (IDs): {self.deps_buffer}",
-            "",
+            f"  ! {'; '.join(self.deps_problems)}" if self.deps_problems else "",
             "TAB = switch field",
             "ENTER = save changes",
             "T = toggle AND/OR",
@@ -252,6 +1203,8 @@ class Editor:
         for i, line in enumerate(lines):
             highlight_row = 2 + self.current_field
             color = (255, 255, 0) if i == highlight_row else (230, 230, 230)
+            if i == 7:
+                color = (255, 110, 110)  # deps problems
             txt = FONT.render(line, True, color)
             surf.blit(txt, (170, y))
             y += 30
@@ -301,6 +1254,7 @@ class Editor:
             elif field == "deps":
                 if isinstance(clipboard, str):
                     self.deps_buffer = clipboard
+                    self.check_deps()
 
             return
 
@@ -314,21 +1268,22 @@ class Editor:
             return
 
         if e.key == pygame.K_RETURN:
-            # Save data back to mission
-            self.m.text = self.text_buffer
-            self.m.type = self.type_buffer
-            self.m.color = self.color_buffer
-            self.m.logic = self.logic_buffer
-
-            self.m.dependencies.clear()
-            ids = [s.strip() for s in self.deps_buffer.split(",") if s.strip().isdigit()]
-            for d in ids:
-                did = int(d)
-                for m in missions:
-                    if m.id == did:
-                        self.m.dependencies.append(m)
-                        m.dependents.append(self.m)
+            if self.deps_problems:
+                show_message("Can't save, dependencies: " + "; ".join(self.deps_problems))
+                return
 
+            # Save data back to mission
+            before = edit_state(self.m)
+            apply_edit(self.m, {
+                "text": self.text_buffer,
+                "type": self.type_buffer,
+                "color": self.color_buffer,
+                "logic": self.logic_buffer,
+                "deps": self.dep_ids(),
+            })
+            after = edit_state(self.m)
+            if after != before:
+                history.push({"op": "edit", "id": self.m.id, "before": before, "after": after})
             self.active = False
             return
 
@@ -363,69 +1318,1012 @@ class Editor:
                 self.deps_buffer = self.deps_buffer[:-1]
             else:
                 self.deps_buffer += e.unicode
+            self.check_deps()
 
 
 # =====================================================================
-# TRIANGLE DRAWING (fixed rotation)
+# SEARCH (Ctrl+F, see search.py)
 # =====================================================================
-import math
+search_index = SearchIndex()
+search_ready = False   # built on the first Ctrl+F, so opening a .anrmtb doesn't decode every detail block
+search_box = None
+
+
+def search_texts(m):
+    return [m.text] + [m.mission.get(field, "") for field in MISSION_FIELDS]
+
 
+def index_search(m):
+    """Call after m's name or details change (or it is created)."""
+    if search_ready:
+        search_index.update(m.id, search_texts(m))
 
-def draw_rotated_triangle(surface, center, angle, size, color):
-    half = size / 2
 
-    points = [
-        (0, -half),
-        (-half, half),
-        (half, half),
-    ]
+def unindex_search(m):
+    if search_ready:
+        search_index.remove(m.id)
 
-    rad = math.radians(angle)
-    cos_a = math.cos(rad)
-    sin_a = math.sin(rad)
 
-    rotated = []
-    for x, y in points:
-        rx = x * cos_a - y * sin_a
-        ry = x * sin_a + y * cos_a
-        rotated.append((center[0] + rx, center[1] + ry))
+def reset_search():
+    global search_ready, search_box
+    search_index.clear()
+    search_ready = False
+    search_box = None
 
-    pygame.draw.polygon(surface, color, rotated)
+
+def open_search():
+    global search_ready, search_box
+    if not search_ready:
+        if pager is not None:  # (every row gets decoded once, the missions stay on disk)
+            search_index.build((r["id"], [r["text"]] + [r["mission"][field] for field in MISSION_FIELDS])
+                               for r in paged_records())
+        else:
+            search_index.build((m.id, search_texts(m)) for m in missions)
+        search_ready = True
+    search_box = SearchBox()
+    mark_dirty()
+
+
+def sort_by_position(ids):
+    """The IDs that are missions, top to bottom then left to right."""
+    found = [(pos, mid) for mid, pos in ((mid, mission_position(mid)) for mid in ids) if pos is not None]
+    found.sort(key=lambda f: (f[0][1], f[0][0]))
+    return [mid for _, mid in found]
+
+
+def center_on(m):
+    """Move the camera so m is in the middle of the window."""
+    global camera_x, camera_y
+    cx, cy = m.rect.center
+    camera_x = round(WIDTH / 2 - cx * zoom)
+    camera_y = round(HEIGHT / 2 - cy * zoom)
+    mark_dirty()
+
+
+class SearchBox:
+    HIT_COLOR = (255, 190, 0)
+    CURRENT_COLOR = (255, 60, 0)
+    takes_text = True   # has the keyboard while open (no WASD)
+
+    def __init__(self):
+        self.active = True
+        self.query = ""
+        self.hits = []      # mission IDs, top to bottom then left to right
+        self.current = 0
+
+    def rect(self):
+        return pygame.Rect(WIDTH - 530, 10, 520, 64)
+
+    def run_query(self):
+        self.hits = sort_by_position(search_index.search(self.query))
+        self.current = 0
+        self.show_current()
+        mark_dirty()  # the outlines
+
+    def show_current(self):
+        m = find_mission(self.hits[self.current]) if self.hits else None
+        if m is not None:  # (not if it was deleted since the query ran)
+            center_on(m)
+
+    def step(self, n):
+        """Jump to the next (n=1) or previous (n=-1) match."""
+        if not self.hits:
+            return
+        self.current = (self.current + n) % len(self.hits)
+        self.show_current()
+        mark_dirty()
+
+    def lines(self):
+        """The two lines of text in the box."""
+        if not self.query:
+            status = "Words (or their start) in names and details"
+        elif self.hits:
+            status = f"{self.current + 1} / {len(self.hits)}  ENTER next, SHIFT+ENTER back"
+        else:
+            status = "No matches"
+        return f"Find: {self.query}_", status
+
+    def draw(self, surf):
+        r = self.rect()
+        pygame.draw.rect(surf, (40, 40, 40), r)
+        pygame.draw.rect(surf, (200, 200, 200), r, 2)
+        title, status = self.lines()
+        surf.blit(FONT.render(title, True, (230, 230, 230)), (r.x + 10, r.y + 8))
+        surf.blit(FONT.render(status, True, (170, 170, 170)), (r.x + 10, r.y + 36))
+
+    def draw_hits(self, surf, world_rect):
+        """Outline the matches inside world_rect, the current one in a stronger color."""
+        for i, mid in enumerate(self.hits):
+            m = missions.get(mid)
+            if m is None or not m.rect.colliderect(world_rect):
+                continue
+            color = self.CURRENT_COLOR if i == self.current else self.HIT_COLOR
+            # inside mark_mission_dirty's rect, so it gets cleaned up when the mission moves
+            pygame.draw.rect(surf, color, to_screen_rect(m.rect).inflate(6, 6), 3, border_radius=12)
+
+    def handle_event(self, e):
+        """Returns True if the key was used (the search box takes every key while open)."""
+        if e.type != pygame.KEYDOWN:
+            return False
+        if e.key == pygame.K_ESCAPE:
+            self.active = False
+        elif e.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+            self.step(-1 if pygame.key.get_mods() & pygame.KMOD_SHIFT else 1)
+        elif e.key == pygame.K_BACKSPACE:
+            self.query = self.query[:-1]
+            self.run_query()
+        elif e.unicode and e.unicode.isprintable():
+            self.query += e.unicode
+            self.run_query()
+        return True
+
+
+class ChangeList(SearchBox):
+    """Looks like the search box, but steps through a fixed set of missions (Ctrl+M).
+    Only ENTER and ESC are its keys, everything else still works while it's open."""
+    takes_text = False
+
+    def __init__(self, title, notes):
+        super().__init__()
+        self.title = title
+        self.notes = notes  # mission ID -> what to say about it
+        self.hits = sort_by_position(notes)
+        self.show_current()
+
+    def lines(self):
+        title = self.title if len(self.title) <= 50 else self.title[:49] + "…"
+        if not self.hits:
+            return title, "None of them are on the canvas"
+        note = self.notes[self.hits[self.current]]
+        if len(note) > 40:
+            note = note[:39] + "…"
+        return title, f"{self.current + 1} / {len(self.hits)}  {note}"
+
+    def handle_event(self, e):
+        if e.type == pygame.KEYDOWN and e.key in (pygame.K_ESCAPE, pygame.K_RETURN, pygame.K_KP_ENTER):
+            return super().handle_event(e)
+        return False
 
 
-def draw_triangle_line(surface, start, end, color=(0, 0, 0), size=10, spacing=6):
-    dx = end[0] - start[0]
-    dy = end[1] - start[1]
-    dist = math.hypot(dx, dy)
-    if dist == 0:
+def typing():
+    """The editor or the search box has the keyboard (no WASD camera)."""
+    return bool(editor and editor.active) or bool(search_box and search_box.active and search_box.takes_text)
+
+
+# =====================================================================
+# SPATIAL INDEX — missions and dependency links, in world coordinates
+# =====================================================================
+node_index = SpatialGrid()
+link_index = SpatialGrid()
+
+# Topological order, depth levels and cycles of the dependency links (see graph.py)
+graph = DepGraph()
+
+
+def index_link(m, d):
+    link_index.insert_segment((m, d), m.rect.center, d.rect.center)
+    for layer in link_layers.values():
+        layer.update_link((m, d), m.rect.center, d.rect.center)
+
+
+def index_mission(m):
+    """(Re)insert a mission and every link touching it. Call after it moves or resizes."""
+    node_index.insert_rect(m, m.rect.x, m.rect.y, m.rect.width, m.rect.height)
+    for d in m.dependencies:
+        index_link(m, d)
+    for dep in m.dependents:
+        index_link(dep, m)
+    mark_mission_dirty(m)
+
+
+def unindex_mission(m):
+    mark_mission_dirty(m)
+    node_index.remove(m)
+    for d in m.dependencies:
+        link_index.remove((m, d))
+        for layer in link_layers.values():
+            layer.remove_link((m, d))
+    for dep in m.dependents:
+        link_index.remove((dep, m))
+        for layer in link_layers.values():
+            layer.remove_link((dep, m))
+
+
+def rebuild_graph():
+    """Rebuild the dependency graph in one go after a load, and point out any cycles."""
+    graph.rebuild((m.id, [d.id for d in m.dependencies]) for m in missions)
+    cycles = graph.cycles()
+    if cycles:
+        show_message(f"{sum(map(len, cycles))} missions are on dependency cycles")
+
+
+def clear_index():
+    node_index.clear()
+    link_index.clear()
+    for layer in link_layers.values():
+        layer.clear()
+    card_cache.clear()
+
+
+def camera_view():
+    """The visible window in world coordinates (x, y, w, h)."""
+    return tuple(to_world_rect((0, 0, WIDTH, HEIGHT)))
+
+
+def visible_missions(window=None):
+    return node_index.in_order(node_index.query_rect(*(window or camera_view())))
+
+
+# =====================================================================
+# ZOOM + LEVEL OF DETAIL
+# =====================================================================
+# Zoom only takes a few fixed levels, so everything drawn zoomed out can be
+# cached per level: scaled mission cards (CardCache) and one link layer per
+# level. Below DETAIL_ZOOM missions are plain boxes without text and links
+# plain lines, both painted into that level's layer: with the whole tree on
+# screen a frame is still one blit.
+ZOOM_LEVELS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.7, 1.0)
+DETAIL_ZOOM = 0.5      # from here up missions show their text and links their arrowheads
+ZOOM_LAYERS_KEPT = 3   # link layers kept around for quickly zooming back
+
+
+def to_world(pos):
+    """Screen position -> world position (floats when zoomed out)."""
+    return (pos[0] - camera_x) / zoom, (pos[1] - camera_y) / zoom
+
+
+def to_world_rect(rect):
+    """Smallest world rect covering a screen rect."""
+    x, y, w, h = rect
+    x0 = math.floor((x - camera_x) / zoom)
+    y0 = math.floor((y - camera_y) / zoom)
+    x1 = math.ceil((x + w - camera_x) / zoom)
+    y1 = math.ceil((y + h - camera_y) / zoom)
+    return pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+
+
+def to_screen_rect(rect):
+    """Smallest screen rect covering a world rect."""
+    return scale_rect(rect, zoom).move(camera_x, camera_y)
+
+
+def paint_plain_missions(surface, world_rect, scale, origin):
+    """Far out zoom: missions as flat boxes in their fill color (for the link layer)."""
+    ox, oy = origin
+    for m in node_index.in_order(node_index.query_rect(*world_rect)):
+        surface.fill(m.fill_color(), scale_rect(m.rect, scale).move(-ox, -oy))
+
+
+def current_layer():
+    """The link layer for the current zoom level (made on first use, least recently used dropped)."""
+    layer = link_layers.get(zoom)
+    if layer is None:
+        if zoom < DETAIL_ZOOM:
+            layer = LinkLayer(BG_COLOR, color=(90, 90, 90), scale=zoom, lines=True,
+                              paint_nodes=paint_plain_missions)
+        else:
+            layer = LinkLayer(BG_COLOR, color=(0, 0, 0), scale=zoom)
+        for m, d in link_index.item_cells:
+            layer.update_link((m, d), m.rect.center, d.rect.center)
+        link_layers[zoom] = layer
+        if len(link_layers) > ZOOM_LAYERS_KEPT:
+            link_layers.popitem(last=False)
+    link_layers.move_to_end(zoom)
+    return layer
+
+
+def set_zoom(level, anchor):
+    """Switch to another zoom level, keeping the world point under anchor (screen pos) in place."""
+    global zoom, camera_x, camera_y
+    if level == zoom:
+        return
+    wx, wy = to_world(anchor)
+    zoom = level
+    camera_x = round(anchor[0] - wx * zoom)
+    camera_y = round(anchor[1] - wy * zoom)
+    mark_dirty()
+
+
+def zoom_step(steps, anchor):
+    """Mouse wheel: steps > 0 zooms in, < 0 out."""
+    i = ZOOM_LEVELS.index(zoom) + steps
+    level = ZOOM_LEVELS[max(0, min(len(ZOOM_LEVELS) - 1, i))]
+    if pager is not None:
+        level = max(level, PAGED_MIN_ZOOM)
+    set_zoom(level, anchor)
+
+
+# =====================================================================
+# DIRTY REGIONS — only redraw what changed
+# =====================================================================
+BG_COLOR = (235, 235, 235)
+MAX_DIRTY_RECTS = 32     # past this, just redraw their bounding box
+IDLE_TIMEOUT_MS = 100    # how long to sleep in event.wait when nothing is happening
+TK_TIMEOUT_MS = 15       # shorter while detail popups are open, so they stay snappy
+
+dirty_rects = []         # screen-space rects to redraw next frame
+full_redraw = True
+
+
+def mark_dirty(rect=None):
+    """Queue a screen rect for redrawing (or the whole window when rect is None)."""
+    global full_redraw
+    if rect is None:
+        full_redraw = True
+    elif not full_redraw:
+        dirty_rects.append(pygame.Rect(rect))
+
+
+def mark_link_dirty(m, d):
+    (x0, y0), (x1, y1) = m.rect.center, d.rect.center
+    link = to_screen_rect((min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0)))
+    mark_dirty(link.inflate(24, 24))  # room for the arrowheads
+
+
+def mark_mission_dirty(m, links=True):
+    """The mission's box (and the links touching it) at its current position."""
+    for layer in link_layers.values():
+        if layer.paint_nodes is not None:
+            layer.invalidate(m.rect)  # the plain boxes live in the far out layers
+    if full_redraw:
+        return
+    mark_dirty(to_screen_rect(m.rect).inflate(6, 6))
+    if links:
+        for d in m.dependencies:
+            mark_link_dirty(m, d)
+        for dep in m.dependents:
+            mark_link_dirty(dep, m)
+
+
+def show_message(text):
+    """Show text in the toast at the top of the window for 2 seconds."""
+    global save_message, save_message_time
+    mark_dirty(toast_rect)
+    save_message = text
+    save_message_time = time.time()
+    draw_toast(None)
+
+
+def draw_toast(surf):
+    """Blit the toast (if any) and remember where it goes so it can be marked dirty."""
+    global toast_rect
+    if not save_message:
+        return
+    msg = text_cache.get(save_message, FONT, None, (0, 0, 0))[1][0]
+    toast_rect = msg.get_rect(midtop=(WIDTH // 2, 20))
+    if surf is None:
+        mark_dirty(toast_rect)
+    else:
+        surf.blit(msg, toast_rect)
+
+
+def render_dirty():
+    """Redraw the dirty parts of the screen and push only those to the display."""
+    global full_redraw
+    screen_rect = screen.get_rect()
+    if full_redraw:
+        rects = [screen_rect]
+    else:
+        rects = [r.clip(screen_rect) for r in dirty_rects]
+        rects = [r for r in rects if r.width and r.height]
+        if len(rects) > MAX_DIRTY_RECTS:
+            rects = [rects[0].unionall(rects[1:])]
+    dirty_rects.clear()
+    full_redraw = False
+    if not rects:
+        return
+
+    profiler.count("rects", len(rects))
+    for r in rects:
+        screen.set_clip(r)
+        with profiler.span("draw_links"):
+            draw_links(r)
+        if zoom >= DETAIL_ZOOM:  # further out the layer already has the missions
+            with profiler.span("missions"):
+                for m in visible_missions(to_world_rect(r)):
+                    m.draw(screen)
+                    profiler.count("nodes")
+        if search_box:
+            search_box.draw_hits(screen, to_world_rect(r))
+            search_box.draw(screen)
+        if editor:
+            editor.draw(screen)
+        draw_toast(screen)
+        draw_hud(screen)
+    screen.set_clip(None)
+
+    with profiler.span("display"):
+        pygame.display.update(rects)
+
+
+# =====================================================================
+# PROFILER HUD (F3) + TRACE DUMP (F4)
+# =====================================================================
+profiler = Profiler()
+HUD_PHASES = ("input", "events", "pages", "draw_links", "missions", "display", "journal", "tk")
+HUD_REFRESH = 0.25   # seconds between HUD updates (redrawing it every frame, it would mostly measure itself)
+HUD_POS = (8, 8)
+hud_visible = False
+hud_surface = None
+hud_rect = pygame.Rect(HUD_POS, (0, 0))
+hud_time = 0.0
+hud_seen = (0, {})   # profiler.frame_count and totals at the last update
+
+
+def refresh_hud():
+    """Re-render the HUD from the profiler's rolling p50/p99 and the counters since the last update."""
+    global hud_surface, hud_rect, hud_time, hud_seen
+    stats = profiler.summary()
+    frames = max(1, profiler.frame_count - hud_seen[0])
+    per_frame = {k: (v - hud_seen[1].get(k, 0)) / frames for k, v in profiler.totals.items()}
+    hud_seen = (profiler.frame_count, dict(profiler.totals))
+    hud_time = time.time()
+
+    p50, p99 = stats.get("frame", (0.0, 0.0))
+    lines = [f"{'frame':<11}p50 {p50:6.2f}  p99 {p99:6.2f} ms"]
+    for name in HUD_PHASES:
+        if name in stats:
+            p50, p99 = stats[name]
+            lines.append(f"{name:<11}p50 {p50:6.2f}  p99 {p99:6.2f}")
+    lines.append("per frame: rects %.1f  nodes %.1f  surfaces %.1f" % (
+        per_frame.get("rects", 0), per_frame.get("nodes", 0), per_frame.get("surfaces", 0)))
+    lines.append("F4: dump trace")
+
+    labels = [HUD_FONT.render(line, True, (255, 255, 255)) for line in lines]
+    w = max(l.get_width() for l in labels) + 12
+    h = sum(l.get_height() for l in labels) + 8
+    hud_surface = pygame.Surface((w, h), pygame.SRCALPHA)
+    hud_surface.fill((0, 0, 0, 180))
+    y = 4
+    for l in labels:
+        hud_surface.blit(l, (6, y))
+        y += l.get_height()
+    mark_dirty(hud_rect)  # where the old one was
+    hud_rect = hud_surface.get_rect(topleft=HUD_POS)
+    mark_dirty(hud_rect)
+
+
+def draw_hud(surf):
+    if hud_visible and hud_surface is not None:
+        surf.blit(hud_surface, hud_rect)
+
+
+def toggle_hud():
+    global hud_visible
+    hud_visible = not hud_visible
+    if hud_visible:
+        refresh_hud()
+    else:
+        mark_dirty(hud_rect)
+
+
+def dump_trace():
+    """Write the recent frames as a Chrome trace (chrome://tracing, Perfetto, speedscope)."""
+    folder = os.path.join(os.path.expanduser("~"), ".mission-tree-maker", "traces")
+    path = os.path.join(folder, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+    try:
+        n = profiler.dump_chrome_trace(path)
+    except OSError as ex:
+        show_message(f"Trace failed: {ex}")
+        return
+    show_message(f"Trace ({n} events) written to {path}")
+
+
+def next_events(busy):
+    """Pending events. When idle, sleep in event.wait instead of spinning at 60 fps."""
+    if busy:
+        return pygame.event.get()
+    timeout = TK_TIMEOUT_MS if detail_popups else IDLE_TIMEOUT_MS
+    if save_message and not saver.pending and not exports_pending:
+        # wake up in time to clear the toast (a SAVE_DONE event wakes us while saving)
+        timeout = max(1, min(timeout, int((save_message_time + 2 - time.time()) * 1000) + 1))
+    first = pygame.event.wait(timeout)
+    if first.type == pygame.NOEVENT:
+        return []
+    return [first] + pygame.event.get()
+
+
+# =====================================================================
+# HIT TESTING + CREATE/DELETE
+# =====================================================================
+def mission_at(pos):
+    """Topmost (last drawn) mission under a screen position, or None."""
+    candidates = [m for m in node_index.query_point(*to_world(pos)) if m.contains(pos)]
+    if not candidates:
+        return None
+    return max(candidates, key=node_index.order.__getitem__)
+
+
+def create_mission(x, y):
+    """New mission with the smallest free ID at world position (x, y)."""
+    m = Mission(x, y, missions.alloc_id())
+    page_new(m)
+    missions.add(m)
+    graph.add_node(m.id)
+    index_mission(m)
+    index_search(m)
+    journal.record({"op": "create", "rec": m.record()})
+    return m
+
+
+def delete_mission(m):
+    """Remove a mission and unhook it from its neighbours through the adjacency lists."""
+    reach_cache.clear()
+    page_edit(m)
+    for dep in m.dependents:
+        page_edit(dep)
+    journal.record({"op": "delete", "id": m.id, "dependents": [dep.id for dep in m.dependents]})
+    unindex_mission(m)
+    unindex_search(m)
+    graph.remove_node(m.id)
+    for d in m.dependencies:
+        d.dependents = tuple(x for x in d.dependents if x is not m)
+    for dep in m.dependents:
+        dep.dependencies = tuple(x for x in dep.dependencies if x is not m)
+    for dep in set(m.dependents):
+        recount_done(dep)
+        mark_mission_dirty(dep, links=False)
+    m.dependencies = ()
+    m.dependents = ()
+
+    missions.remove(m)
+    page_gone(m)
+    close_mission_popup(m.id)
+
+
+def dependent_slots(m):
+    """(dependent id, index in its dependency list) for every link pointing at m."""
+    if pager is not None:   # a ghost's lists are short, and undo would put the link back in the wrong place
+        find_mission(m.id)
+        for dep in tuple(m.dependents):
+            find_mission(dep.id)
+    slots = []
+    seen = set()
+    for dep in m.dependents:
+        if dep.id not in seen:
+            seen.add(dep.id)
+            slots += [(dep.id, i) for i, d in enumerate(dep.dependencies) if d is m]
+    return slots
+
+
+def restore_mission(rec, slots=(), checked=False):
+    """Bring back a deleted mission (same ID) with its links. Undo of a delete."""
+    reach_cache.clear()
+    m = Mission(rec["x"], rec["y"], rec["id"])
+    m.text = rec["text"]
+    m.type = sys.intern(rec["type"])
+    m.color = sys.intern(rec["color"])
+    m.logic = sys.intern(rec["logic"])
+    m.update_details(rec["mission"])
+    page_new(m)
+    missions.reuse(m.id)
+    missions.add(m)
+    index_search(m)
+    graph.add_node(m.id)
+    deps = [find_mission(d) for d in rec["dependencies"]]
+    m.dependencies = tuple(dep for dep in deps if dep is not None)
+    for dep in m.dependencies:
+        dep.dependents += (m,)
+        graph.add_edge(dep.id, m.id)
+    recount_done(m)
+    page_keep(m)
+    journal.record({"op": "create", "rec": m.record()})
+
+    for dep_id, slot in sorted(slots, key=lambda s: s[1]):
+        dep = find_mission(dep_id)
+        if dep is None:
+            continue
+        page_edit(dep)
+        unindex_mission(dep)
+        slot = min(slot, len(dep.dependencies))
+        dep.dependencies = dep.dependencies[:slot] + (m,) + dep.dependencies[slot:]
+        m.dependents += (dep,)
+        graph.add_edge(m.id, dep.id)
+        page_keep(dep)
+        index_mission(dep)
+        journal.record({"op": "deps", "id": dep.id, "deps": [d.id for d in dep.dependencies]})
+
+    m.fit_height()
+    index_mission(m)
+    if checked:
+        set_checked(m, True)
+    return m
+
+
+def set_position(m, x, y):
+    page_edit(m)
+    mark_mission_dirty(m)  # old position
+    m.move_to(x, y)
+    index_mission(m)
+    journal.record_move(m.id, m.x, m.y)
+
+
+def set_positions(positions):
+    """Move many missions at once (layout, undo of a layout)."""
+    mark_dirty()  # cheaper than a dirty rect per mission
+    for mid, (x, y) in positions.items():
+        m = find_mission(mid)
+        if m is not None:
+            set_position(m, x, y)
+
+
+def edit_state(m):
+    """What the Editor can change, as plain values (for undo)."""
+    return {"text": m.text, "type": m.type, "color": m.color, "logic": m.logic,
+            "deps": [d.id for d in m.dependencies]}
+
+
+def apply_edit(m, state):
+    """Set name/type/color/logic and rebuild the dependency list from IDs."""
+    reach_cache.clear()
+    page_edit(m)
+    deps = [find_mission(d) for d in state["deps"]]
+    m.text = state["text"]
+    m.type = sys.intern(state["type"])
+    m.color = sys.intern(state["color"])
+    m.logic = sys.intern(state["logic"])
+
+    unindex_mission(m)
+    set_dependencies(m, [dep for dep in deps if dep is not None])
+    page_keep(m)
+
+    m.fit_height()
+    index_mission(m)
+    index_search(m)
+    journal.record({"op": "edit", "id": m.id, "fields": {
+        "text": m.text, "type": m.type, "color": m.color, "logic": m.logic}})
+    journal.record({"op": "deps", "id": m.id, "deps": [d.id for d in m.dependencies]})
+
+
+def set_dependencies(m, deps):
+    """Replace m's dependency list, unhooking the old links (call with m unindexed)."""
+    for old in m.dependencies:
+        if m in old.dependents:
+            i = old.dependents.index(m)  # one entry per link, like list.remove
+            old.dependents = old.dependents[:i] + old.dependents[i + 1:]
+        graph.remove_edge(old.id, m.id)
+    m.dependencies = tuple(deps)
+    for dep in m.dependencies:
+        dep.dependents += (m,)
+        graph.add_edge(dep.id, m.id)
+    recount_done(m)
+
+
+def recount_done(m):
+    m.done_deps = sum(1 for d in m.dependencies if d.checked)
+
+
+def set_checked(m, value):
+    """Check/uncheck a mission. Only its direct dependents can change state, so only
+    their done-dependency counters are touched (no walk over the tree)."""
+    if m.checked == value:
+        return
+    m.checked = value
+    if pager is not None:
+        (pager.checked.add if value else pager.checked.discard)(m.id)
+    mark_mission_dirty(m, links=False)
+    step = 1 if value else -1
+    for dep in m.dependents:
+        before = dep.status()
+        dep.done_deps += step
+        if dep.status() != before:
+            mark_mission_dirty(dep, links=False)
+    journal.record({"op": "check", "id": m.id, "checked": value})
+
+
+def set_details(m, block):
+    reach_cache.clear()
+    page_edit(m)
+    m.update_details(block)
+    index_search(m)
+    journal.record({"op": "details", "id": m.id, "mission": dict(m.mission)})
+
+
+# =====================================================================
+# UNDO / REDO — each step only holds what changed, never the whole tree
+# =====================================================================
+#   {"op": "create", "rec": record}
+#   {"op": "delete", "rec": record, "slots": [(dependent id, index), ...], "checked": bool}
+#   {"op": "move",    "id": id, "before": (x, y), "after": (x, y)}
+#   {"op": "edit",    "id": id, "before": edit_state, "after": edit_state}
+#   {"op": "details", "id": id, "before": block, "after": block}
+#   {"op": "layout",  "before": {id: (x, y)}, "after": {id: (x, y)}}   (only the missions laid out)
+#   {"op": "merge",   "steps": [step, ...]}   (Ctrl+M: the steps above, undone last to first)
+UNDO_LIMIT = 500
+
+
+class History:
+    def __init__(self, limit=UNDO_LIMIT):
+        self.undo_steps = deque(maxlen=limit)  # oldest steps fall off the end
+        self.redo_steps = []
+
+    def push(self, step):
+        self.undo_steps.append(step)
+        self.redo_steps.clear()
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+
+
+history = History()
+move_session = None  # (id, x, y) where the current arrow-key move started
+
+
+def end_move_session():
+    """Arrow keys let go: the whole move becomes one undo step."""
+    global move_session
+    if move_session is None:
+        return
+    mid, x, y = move_session
+    move_session = None
+    m = missions.get(mid)
+    if m is not None and (m.x, m.y) != (x, y):
+        history.push({"op": "move", "id": mid, "before": (x, y), "after": (m.x, m.y)})
+
+
+def apply_step(step, forward):
+    op = step["op"]
+    if op in ("create", "delete"):
+        if (op == "create") == forward:
+            restore_mission(step["rec"], step.get("slots", ()), step.get("checked", False))
+        else:
+            m = find_mission(step["rec"]["id"])
+            if m is not None:
+                delete_mission(m)
         return
+    if op == "layout":
+        set_positions(step["after"] if forward else step["before"])
+        return
+    if op == "merge":
+        mark_dirty()
+        for sub in (step["steps"] if forward else reversed(step["steps"])):
+            apply_step(sub, forward)
+        return
+
+    m = find_mission(step["id"])
+    if m is None:
+        return
+    state = step["after"] if forward else step["before"]
+    if op == "move":
+        set_position(m, *state)
+    elif op == "edit":
+        apply_edit(m, state)
+    elif op == "details":
+        set_details(m, state)
+
+
+# =====================================================================
+# AUTOMATIC LAYOUT (see layout.py)
+# =====================================================================
+def auto_layout(root=None):
+    """Lay out the whole tree (Ctrl+R), or root and everything that depends on it (R)."""
+    if pager is not None:
+        show_message("Automatic layout needs the whole tree in memory (too big)")
+        return
+    if root is None:
+        group = list(missions)
+    else:
+        group = [root]
+        seen = {root.id}
+        for m in group:  # grows while we walk it
+            for dep in m.dependents:
+                if dep.id not in seen:
+                    seen.add(dep.id)
+                    group.append(dep)
+    if not group:
+        return
+
+    end_move_session()
+    if root is None:
+        origin = (min(m.x for m in group), min(m.y for m in group))
+    else:
+        origin = (root.x, root.y)
+    positions = layout.layered_layout(
+        {m.id: (m.rect.width, m.rect.height) for m in group},
+        {m.id: [d.id for d in m.dependencies] for m in group},
+        hint={m.id: m.x for m in group},
+        origin=origin,
+    )
+    if root is not None:
+        # the selected mission stays put, its subtree hangs below it
+        dx = root.x - positions[root.id][0]
+        positions = {mid: (x + dx, y) for mid, (x, y) in positions.items()}
+
+    before = {m.id: (m.x, m.y) for m in group}
+    set_positions(positions)
+    history.push({"op": "layout", "before": before, "after": positions})
+    show_message(f"Laid out {len(group)} missions")
+
+
+def undo():
+    end_move_session()
+    if not history.undo_steps:
+        show_message("Nothing to undo")
+        return
+    step = history.undo_steps.pop()
+    apply_step(step, forward=False)
+    history.redo_steps.append(step)
+    show_message(f"Undid {step['op']}")
+
+
+def redo():
+    end_move_session()
+    if not history.redo_steps:
+        show_message("Nothing to redo")
+        return
+    step = history.redo_steps.pop()
+    apply_step(step, forward=True)
+    history.undo_steps.append(step)
+    show_message(f"Redid {step['op']}")
 
-    ux = dx / dist
-    uy = dy / dist
 
-    angle = math.degrees(math.atan2(dy, dx)) - 90
+# =====================================================================
+# COMPARE + MERGE (Ctrl+M, see treediff.py)
+# =====================================================================
+EDIT_FIELDS = ("text", "type", "color", "logic", "dependencies")
 
-    step = size + spacing
-    steps = int(dist // step)
 
-    for i in range(steps):
-        cx = start[0] + ux * i * step
-        cy = start[1] + uy * i * step
-        draw_rotated_triangle(surface, (cx, cy), angle, size, color)
+def merge_dialog():
+    """Compare the tree with another file, or merge that file in given their common ancestor."""
+    global search_box
+    if pager is not None:
+        show_message("Too big to compare here: use python cli.py diff / merge")
+        return
+    theirs_path = filedialog.askopenfilename(title="Compare with / merge in", filetypes=TREE_FILETYPES)
+    if not theirs_path:
+        return
+    base_path = filedialog.askopenfilename(
+        title="Version both started from (Cancel: only compare)", filetypes=TREE_FILETYPES)
+    name = os.path.basename(theirs_path)
+    ours = [m.record() for m in missions]
+    try:
+        theirs = tree_io.load_records(theirs_path)
+        base = tree_io.load_records(base_path) if base_path else None
+    except (OSError, TreeFileError) as ex:
+        show_message(f"Merge failed: {ex}")
+        return
+
+    if base is None:
+        # what they did, seen from here: the missions they changed or don't have
+        d = treediff.diff(ours, theirs)
+        notes = {mid: "changed: " + ", ".join(fields) for mid, fields in d.changed.items()}
+        notes.update((mid, f"not in {name}") for mid in d.removed)
+        search_box = ChangeList(f"{name}: {treediff.summary(d)}", notes)
+        show_message(f"Compared with {name}")
+        mark_dirty()
+        return
+
+    records, conflicts = treediff.merge3(base, ours, theirs)
+    apply_records(records)
+    notes = {}
+    for c in conflicts:
+        notes[c.id] = notes[c.id] + ", " + c.field if c.id in notes else "conflict: " + c.field
+    count = f"{len(conflicts)} conflict" + ("" if len(conflicts) == 1 else "s")
+    search_box = ChangeList(f"Merged {name}: {count}", notes)
+    show_message(f"Merged {name}" + (f", {count}" if conflicts else ""))
+
+
+def apply_records(records):
+    """Turn the tree into records with ordinary edits (one undo step, journaled as usual)."""
+    end_move_session()
+    d = treediff.diff([m.record() for m in missions], records)
+    new = {r["id"]: r for r in records}
+    steps = []
+    # New missions first, without links (some may need others that aren't there yet)
+    for mid in d.added:
+        rec = dict(new[mid], dependencies=[])
+        restore_mission(rec)
+        steps.append({"op": "create", "rec": rec})
+
+    for mid in d.added + list(d.changed):
+        m = missions.get(mid)
+        r = new[mid]
+        fields = d.changed.get(mid, EDIT_FIELDS + MISSION_FIELDS)
+        if any(f in EDIT_FIELDS for f in fields):
+            before = edit_state(m)
+            after = {"text": r["text"], "type": r["type"], "color": r["color"], "logic": r["logic"],
+                     "deps": list(r["dependencies"])}
+            apply_edit(m, after)
+            steps.append({"op": "edit", "id": mid, "before": before, "after": after})
+        if any(f in MISSION_FIELDS for f in fields):
+            before = dict(m.mission)
+            set_details(m, r["mission"])
+            steps.append({"op": "details", "id": mid, "before": before, "after": dict(r["mission"])})
+        if "position" in fields:
+            before = (m.x, m.y)
+            set_position(m, r["x"], r["y"])
+            steps.append({"op": "move", "id": mid, "before": before, "after": (m.x, m.y)})
+
+    for mid in d.removed:
+        m = missions.get(mid)
+        steps.append({"op": "delete", "rec": m.record(), "slots": dependent_slots(m), "checked": m.checked})
+        delete_mission(m)
+
+    if steps:
+        history.push({"op": "merge", "steps": steps})
+    mark_dirty()
 
 
 # =====================================================================
 # MAIN DRAW — dependency lines
 # =====================================================================
-def draw_links():
-    for m in missions:
-        for d in m.dependencies:
-            start = ((m.rect.centerx + camera_x), (m.rect.centery + camera_y))
-            end = ((d.rect.centerx + camera_x), (d.rect.centery + camera_y))
-            draw_triangle_line(screen, start, end, color=(0, 0, 0), size=10, spacing=6)
+link_layers = OrderedDict()   # zoom level -> LinkLayer (see current_layer)
+
+
+def draw_links(screen_rect=None):
+    """Background + arrows for part of the screen, straight from the cached link layer."""
+    layer = current_layer()
+    surface = layer.surface
+    layer.prepare((-camera_x, -camera_y, WIDTH, HEIGHT), link_index)
+    if layer.surface is not surface:
+        profiler.count("surfaces")
+    layer.blit(screen, screen_rect or screen.get_rect(), (camera_x, camera_y))
+
+
+# =====================================================================
+# MISSION DETAIL POPUPS (non-blocking, pumped by tk_root.update())
+# =====================================================================
+detail_popups = {}  # mission id -> open Toplevel
+reach_cache = {}    # mission id -> Reach (or None: on a cycle), until the next edit that can change one
+
+
+def close_mission_popup(mid):
+    popup = detail_popups.pop(mid, None)
+    if popup is not None:
+        try:
+            popup.destroy()
+        except tk.TclError:
+            pass
+
+
+def close_all_popups():
+    for mid in list(detail_popups):
+        close_mission_popup(mid)
+
+
+def mission_reach(m):
+    """rewards.Reach of m (None on a cycle). The walk covers everything in front of m, so
+    the totals of all of those come out too and are kept until the tree changes."""
+    if m.id in reach_cache:
+        return reach_cache[m.id]
+    info = {}  # m and everything in front of it: id -> mission_info
+    todo = [m.id]
+    while todo:
+        mid = todo.pop()
+        if mid not in info:
+            info[mid] = mission_info(mid)
+            todo += info[mid][0]
+    own = {mid: rewards.tally(*parsed[:2]) for mid, (_, _, parsed) in info.items()}
+    reach = rewards.aggregate({mid: deps for mid, (deps, _, _) in info.items()},
+                              {mid: logic for mid, (_, logic, _) in info.items()}, own)
+    for mid in info:
+        reach_cache[mid] = reach.get(mid)
+    return reach_cache[m.id]
+
+
+def reach_summary(m):
+    """Popup text: format problems, then the task/reward totals of reaching m."""
+    reach = mission_reach(m)
+    lines = [f"! {p}" for p in m.parsed_details()[2]]
+    if reach is None:
+        lines.append("On a dependency cycle: no totals")
+    else:
+        lines.append(f"Reaching this mission takes {reach.missions} mission{'s' if reach.missions != 1 else ''} (itself included)")
+        lines.append("Tasks: " + (rewards.describe(reach.tasks, 8) or "none"))
+        lines.append("Rewards: " + (rewards.describe(reach.rewards, 8) or "none"))
+    return "\n".join(lines)
+
 
 def open_mission_popup(mission):
+    # Already open? just bring it to the front
+    existing = detail_popups.get(mission.id)
+    if existing is not None and existing.winfo_exists():
+        existing.lift()
+        return
+
     popup = tk.Toplevel()
+    detail_popups[mission.id] = popup
     popup.title(f"Edit Mission {mission.id} Details")
     popup.geometry("600x850")  # extra space for instructions
 
@@ -455,14 +2353,22 @@ def open_mission_popup(mission):
 
     # === Save + Close ===
     def save_and_close():
-        mission.mission["desc"] = desc_box.get("1.0", "end").strip()
-        mission.mission["task"] = task_box.get("1.0", "end").strip()
-        mission.mission["item"] = item_box.get("1.0", "end").strip()
-        mission.mission["rwrd"] = rwrd_box.get("1.0", "end").strip()
-        popup.destroy()
+        before = dict(mission.mission)
+        set_details(mission, {
+            "desc": desc_box.get("1.0", "end").strip(),
+            "task": task_box.get("1.0", "end").strip(),
+            "item": item_box.get("1.0", "end").strip(),
+            "rwrd": rwrd_box.get("1.0", "end").strip(),
+        })
+        if mission.mission != before:
+            history.push({"op": "details", "id": mission.id, "before": before, "after": dict(mission.mission)})
+        close_mission_popup(mission.id)
 
     tk.Button(popup, text="Save", command=save_and_close).pack(pady=10)
 
+    # === What reaching this mission takes (as saved, see rewards.py) ===
+    tk.Label(popup, text=reach_summary(mission), justify="left", anchor="w", wraplength=570).pack(anchor="w", padx=10)
+
     # === Instructions below Save button ===
     instructions = (
         "Format for Mission Tasks (example):\n"
@@ -479,207 +2385,310 @@ def open_mission_popup(mission):
     popup.attributes("-topmost", True)
     popup.after(100, lambda: popup.attributes("-topmost", False))
 
-    # 🔥 BLOCK pygame but exit automatically when popup closes
-    while popup.winfo_exists():
-        popup.update()
+    # Closing with the window X just drops the edits
+    popup.protocol("WM_DELETE_WINDOW", lambda: close_mission_popup(mission.id))
 
 # =====================================================================
-# MAIN LOOP
+# GUI STARTUP
 # =====================================================================
-missions = []
-editor = None
+def init_fonts():
+    """Fonts only, enough to draw missions off-screen (image export workers)."""
+    global FONT, HUD_FONT
+    pygame.font.init()
+    FONT = pygame.font.SysFont("consolas", 18)
+    HUD_FONT = pygame.font.SysFont("consolas", 14)
+    Mission.FONT = pygame.font.SysFont("consolas", 20)
+
+
+def init_gui():
+    """Tk root, pygame, fonts and the window. Only the editor needs these."""
+    global tk_root, screen
+    if screen is not None:
+        return
 
-clock = pygame.time.Clock()
+    # Hidden Tk window for dialogs
+    tk_root = tk.Tk()
+    tk_root.withdraw()
 
-while True:
-    screen.fill((235, 235, 235))
+    pygame.init()
+    init_fonts()
 
-    # Get pressed keys once per frame
-    pressed = pygame.key.get_pressed()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Astroneer Mission Log Editor")
 
-    move_speed = 5
-    moving_speed = 4
 
-    # If editor isn't open, allow camera WASD movement
-    if not (editor and editor.active):
-        if pressed[pygame.K_w]:
-            camera_y += move_speed
-        if pressed[pygame.K_s]:
-            camera_y -= move_speed
-        if pressed[pygame.K_a]:
-            camera_x += move_speed
-        if pressed[pygame.K_d]:
-            camera_x -= move_speed
+# =====================================================================
+# MAIN LOOP
+# =====================================================================
+editor = None
 
-    # If moving_id is active (>0), move that mission with arrow keys
-    if moving_id:
-        target = next((mm for mm in missions if mm.id == moving_id), None)
-        if target:
-            dx = 0
-            dy = 0
-            if pressed[pygame.K_UP]:
-                dy -= moving_speed
-            if pressed[pygame.K_DOWN]:
-                dy += moving_speed
-            if pressed[pygame.K_LEFT]:
-                dx -= moving_speed
-            if pressed[pygame.K_RIGHT]:
-                dx += moving_speed
-            if dx or dy:
-                # Update both stored position and rect so saving works
-                target.x += dx
-                target.y += dy
-                target.rect.x = int(target.x)
-                target.rect.y = int(target.y)
-        else:
-            # invalid ID: clear moving_id and notify
-            moving_id = 0
-            save_message = "Move ID not found — stopped"
-            save_message_time = time.time()
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-
-        if event.type == pygame.VIDEORESIZE:
-            WIDTH, HEIGHT = event.w, event.h
-            screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
-
-        # Ctrl+S save and Ctrl+L load and P popup handling
-        if event.type == pygame.KEYDOWN:
-            mods = pygame.key.get_mods()
-            if event.key == pygame.K_s and mods & pygame.KMOD_CTRL:
-                save_file_dialog()
-
-            if event.key == pygame.K_l and mods & pygame.KMOD_CTRL:
-                load_file_dialog()
-
-            # Press P to open a popup to enter ID to move (0 = stop moving)
-            if event.key == pygame.K_p and not(editor and editor.active):
-                try:
-                    val = simpledialog.askinteger("Move Mission", "Enter mission ID (0 to exit):", parent=tk_root, minvalue=0)
-                    # askinteger returns None if cancelled
-                    if val is None:
-                        # cancelled, do nothing
-                        pass
+def main():
+    global camera_x, camera_y, moving_id, editor, search_box, save_message, screen, WIDTH, HEIGHT, move_session
+
+    init_gui()
+    recover_journal()
+    clock = pygame.time.Clock()
+    busy = True
+
+    while True:
+        profiler.begin_frame()
+        frame_start = time.perf_counter()
+
+        # Get pressed keys once per frame
+        pressed = pygame.key.get_pressed()
+
+        move_speed = 5
+        moving_speed = 4
+
+        # If nothing is being typed into, allow camera WASD movement
+        if not typing():
+            old_camera = (camera_x, camera_y)
+            if pressed[pygame.K_w]:
+                camera_y += move_speed
+            if pressed[pygame.K_s]:
+                camera_y -= move_speed
+            if pressed[pygame.K_a]:
+                camera_x += move_speed
+            if pressed[pygame.K_d]:
+                camera_x -= move_speed
+            if (camera_x, camera_y) != old_camera:
+                mark_dirty()
+
+        # If moving_id is active (>0), move that mission with arrow keys
+        moving = False
+        if moving_id:
+            target = missions.get(moving_id)
+            if target:
+                dx = 0
+                dy = 0
+                if pressed[pygame.K_UP]:
+                    dy -= moving_speed
+                if pressed[pygame.K_DOWN]:
+                    dy += moving_speed
+                if pressed[pygame.K_LEFT]:
+                    dx -= moving_speed
+                if pressed[pygame.K_RIGHT]:
+                    dx += moving_speed
+                if dx or dy:
+                    moving = True
+                    if move_session is not None and move_session[0] != target.id:
+                        end_move_session()
+                    if move_session is None:
+                        move_session = (target.id, target.x, target.y)
+                    set_position(target, target.x + dx, target.y + dy)
+            else:
+                # invalid ID: clear moving_id and notify
+                moving_id = 0
+                show_message("Move ID not found — stopped")
+        if not moving:
+            end_move_session()
+        profiler.add("input", frame_start)
+
+        # Keep ticking at 60 fps while keys are held, otherwise wait for events
+        busy = full_redraw or bool(dirty_rects) or moving or (
+            not typing()
+            and any(pressed[k] for k in (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d))
+        )
+
+        with profiler.span("wait"):
+            events = next_events(busy)
+        events_start = time.perf_counter()
+        for event in events:
+            if event.type == pygame.QUIT:
+                saver.wait()
+                for done in pygame.event.get(SAVE_DONE):
+                    saver.finished(done)  # so the journal knows the file made it
+                journal.close()
+                pygame.quit()
+                sys.exit()
+
+            if event.type == SAVE_DONE:
+                saver.finished(event)
+
+            if event.type == EXPORT_DONE:
+                export_finished(event)
+
+            if event.type == pygame.VIDEORESIZE:
+                WIDTH, HEIGHT = event.w, event.h
+                screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+                mark_dirty()
+
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                mark_dirty()
+
+            # While the search box is open it gets the keys (the mouse still works)
+            if search_box and search_box.active and not (editor and editor.active) and event.type == pygame.KEYDOWN:
+                used = search_box.handle_event(event)
+                if not search_box.active:
+                    search_box = None
+                    mark_dirty()
+                if used:
+                    continue
+
+            # Ctrl+S save and Ctrl+L load and P popup handling
+            if event.type == pygame.KEYDOWN:
+                mods = pygame.key.get_mods()
+                if event.key == pygame.K_s and mods & pygame.KMOD_CTRL:
+                    # Ctrl+Shift+S writes compact (non-indented) JSON
+                    save_file_dialog(compact=bool(mods & pygame.KMOD_SHIFT))
+                    mark_dirty()
+
+                if event.key == pygame.K_l and mods & pygame.KMOD_CTRL:
+                    load_file_dialog()
+                    mark_dirty()
+
+                if event.key == pygame.K_e and mods & pygame.KMOD_CTRL and not (editor and editor.active):
+                    export_image_dialog()
+                    mark_dirty()
+
+                # Ctrl+M compares with / merges in another copy of the tree
+                if event.key == pygame.K_m and mods & pygame.KMOD_CTRL and not (editor and editor.active):
+                    merge_dialog()
+                    mark_dirty()
+
+                # Ctrl+F search names and details
+                if event.key == pygame.K_f and mods & pygame.KMOD_CTRL and not (editor and editor.active):
+                    open_search()
+
+                # Ctrl+Z undo, Ctrl+Y / Ctrl+Shift+Z redo (not while typing in the editor)
+                if mods & pygame.KMOD_CTRL and not (editor and editor.active):
+                    if event.key == pygame.K_z and not mods & pygame.KMOD_SHIFT:
+                        undo()
+                    elif event.key == pygame.K_y or event.key == pygame.K_z:
+                        redo()
+
+                # Ctrl+R lays out the whole tree, R the subtree of the mission selected with P
+                if event.key == pygame.K_r and not (editor and editor.active):
+                    if mods & pygame.KMOD_CTRL:
+                        auto_layout()
+                    elif moving_id and find_mission(moving_id) is not None:
+                        auto_layout(missions.get(moving_id))
                     else:
-                        moving_id = int(val)
-                        if moving_id == 0:
-                            save_message = "Move mode exited"
+                        show_message("Press P to select a mission to lay out below")
+
+                # Press P to open a popup to enter ID to move (0 = stop moving)
+                if event.key == pygame.K_p and not(editor and editor.active):
+                    try:
+                        val = simpledialog.askinteger("Move Mission", "Enter mission ID (0 to exit):", parent=tk_root, minvalue=0)
+                        mark_dirty()
+                        # askinteger returns None if cancelled
+                        if val is None:
+                            # cancelled, do nothing
+                            pass
                         else:
-                            # if id not found warn user
-                            if not any(mm.id == moving_id for mm in missions):
-                                save_message = f"ID {moving_id} not found"
-                                moving_id = 0
+                            moving_id = int(val)
+                            if moving_id == 0:
+                                show_message("Move mode exited")
                             else:
-                                save_message = f"Moving mission ID {moving_id} (use arrows)"
-                        save_message_time = time.time()
-                except Exception as ex:
-                    save_message = f"Error: {ex}"
-                    save_message_time = time.time()
+                                # if id not found warn user
+                                if find_mission(moving_id) is None:
+                                    show_message(f"ID {moving_id} not found")
+                                    moving_id = 0
+                                else:
+                                    show_message(f"Moving mission ID {moving_id} (use arrows)")
+                    except Exception as ex:
+                        show_message(f"Error: {ex}")
             
-            # Q = open mission popup for the selected ID
-            if event.key == pygame.K_q and not (editor and editor.active):
-                if moving_id != 0:
-                    # find that mission object
-                    target = next((mm for mm in missions if mm.id == moving_id), None)
-                    if target: open_mission_popup(target)
-                    else: print("No mission with that ID exists.")
-                else: print("No mission ID selected. Press P to select one.")
-
-
-            # Ctrl+N - create a fresh mission tree (wipe everything)
-            if event.key == pygame.K_n and mods & pygame.KMOD_CTRL:
-                missions.clear()
-                free_ids.clear()
-                camera_x = 0
-                camera_y = 0
-                next_id = 1     # reset ID counter back to 1 (or whatever your base is)
-                moving_id = 0
-                editor = None
-
-        # When editor is active, forward events to the editor only
-        if editor and editor.active:
-            editor.handle_event(event)
-            continue
-        else:
-            editor = None
-
-        # Right-click delete
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
-            mx, my = event.pos
-            to_delete = None
-
-            for m in missions:
-                if m.contains((mx, my)):
-                    to_delete = m
-                    break
-
-            if to_delete:
-                for other in missions:
-                    if to_delete in other.dependencies:
-                        other.dependencies.remove(to_delete)
-                    if to_delete in other.dependents:
-                        other.dependents.remove(to_delete)
-
-                missions.remove(to_delete)
-                free_ids.append(to_delete.id)
-                free_ids.sort()
+                # Q = open mission popup for the selected ID
+                if event.key == pygame.K_q and not (editor and editor.active):
+                    if moving_id != 0:
+                        # find that mission object
+                        target = find_mission(moving_id)
+                        if target: open_mission_popup(target)
+                        else: print("No mission with that ID exists.")
+                    else: print("No mission ID selected. Press P to select one.")
+
+
+                # F3 toggles the profiler HUD, F4 dumps the recent frames as a trace file
+                if event.key == pygame.K_F3:
+                    toggle_hud()
+                if event.key == pygame.K_F4:
+                    dump_trace()
+
+                # Ctrl+N - create a fresh mission tree (wipe everything)
+                if event.key == pygame.K_n and mods & pygame.KMOD_CTRL and confirm_discard():
+                    clear_tree()
+                    journal.begin({"base": "empty"})
+                    set_zoom(1.0, (0, 0))
+                    camera_x = 0
+                    camera_y = 0
+                    moving_id = 0
+                    editor = None
+                    mark_dirty()
+
+            # When editor is active, forward events to the editor only
+            if editor and editor.active:
+                if event.type == pygame.KEYDOWN:
+                    editor.handle_event(event)
+                    mark_dirty(Editor.RECT)
+                    if not editor.active:
+                        editor = None
                 continue
-
-        # Left click create/edit
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            mx, my = event.pos
-
-            clicked = None
-            for m in missions:
-                if m.contains((mx, my)):
-                    clicked = m
-                    break
-
-            if clicked:
-                editor = Editor(clicked)
             else:
-                if free_ids:
-                    mid = free_ids.pop(0)
-                else:
-                    mid = next_id
-                    next_id += 1
-
-                new_m = Mission(mx - camera_x - 90, my - camera_y - 30, mid)
-                # ensure internal x/y and rect agree
-                new_m.x = float(new_m.rect.x)
-                new_m.y = float(new_m.rect.y)
-                missions.append(new_m)
-
-        # Toggle checkmark (E)
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_e:
-            mx, my = pygame.mouse.get_pos()
-            for m in missions:
-                if m.contains((mx, my)):
-                    m.checked = not m.checked
-                    break
-
-    draw_links()
-
-    for m in missions:
-        m.draw(screen)
-
-    if editor:
-        editor.draw(screen)
-
-    # show save/mode messages briefly
-    if save_message and time.time() - save_message_time < 2:
-        msg = FONT.render(save_message, True, (0, 0, 0))
-        screen.blit(msg, (WIDTH // 2 - msg.get_width() // 2, 20))
-    else:
-        save_message = ""
-
-    try:
-        tk_root.update()
-    except:
-        pass
+                editor = None
 
-    pygame.display.flip()
-    clock.tick(60)
+            # Mouse wheel zooms around the cursor
+            if event.type == pygame.MOUSEWHEEL and event.y:
+                zoom_step(1 if event.y > 0 else -1, pygame.mouse.get_pos())
+
+            # Right-click delete
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                to_delete = mission_at(event.pos)
+
+                if to_delete:
+                    to_delete = find_mission(to_delete.id)   # a ghost's record is missing links
+                    step = {"op": "delete", "rec": to_delete.record(), "slots": dependent_slots(to_delete),
+                            "checked": to_delete.checked}
+                    delete_mission(to_delete)
+                    history.push(step)
+                    continue
+
+            # Left click create/edit
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                mx, my = to_world(event.pos)
+                clicked = mission_at(event.pos)
+
+                if clicked:
+                    editor = Editor(find_mission(clicked.id))
+                    mark_dirty(Editor.RECT)
+                else:
+                    m = create_mission(math.floor(mx) - 90, math.floor(my) - 30)
+                    history.push({"op": "create", "rec": m.record()})
+
+            # Toggle checkmark (E)
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_e and not pygame.key.get_mods() & pygame.KMOD_CTRL:
+                target = mission_at(pygame.mouse.get_pos())
+                if target:
+                    set_checked(target, not target.checked)
+
+        profiler.add("events", events_start)
+
+        # clear save/mode messages after 2 seconds (but keep "Saving…" up while it is)
+        if save_message and time.time() - save_message_time >= 2 and not saver.pending and not exports_pending:
+            mark_dirty(toast_rect)
+            save_message = ""
+
+        if hud_visible and time.time() - hud_time >= HUD_REFRESH:
+            refresh_hud()
+
+        with profiler.span("pages"):
+            update_pages()
+        render_dirty()
+        with profiler.span("journal"):
+            journal.tick()
+
+        with profiler.span("tk"):
+            try:
+                tk_root.update()
+            except:
+                pass
+
+        if busy:
+            with profiler.span("wait"):
+                clock.tick(60)
+        # a wake-up that handled nothing and drew nothing isn't a frame worth counting
+        profiler.end_frame(keep=bool(events) or "rects" in profiler.counters)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# =====================================================================
+# REGION PAGING — a huge .anrmtb opened a few tiles at a time, no pygame
+# =====================================================================
+# The tile index in the file (see tree_bin.py) cuts the canvas into
+# squares. The editor loads the tiles around the camera, and a loaded tile
+# pins its own missions plus every mission linked to one of them, so a link
+# leaving the tile still has both ends in memory (it draws and edits like
+# any other). The tiles just outside the view are decoded ahead of time on
+# a background thread. Once more than `capacity` tiles are loaded the least
+# recently seen clean ones go again; a tile with an edit in it stays until
+# the tree is saved, its missions being the only copy of that edit.
+#
+# The pager only keeps the books (which tiles, which IDs, what was edited);
+# main.py turns rows into missions and back.
+import threading
+from collections import OrderedDict
+
+from tree_bin import NO_ROW, tile_of
+
+
+class TilePager:
+    def __init__(self, tree, capacity=64):
+        self.capacity = capacity
+        self.loaded = OrderedDict()   # tile key -> set of IDs it pins, least recently seen first
+        self.pins = {}                # id -> how many loaded tiles pin it
+        self.dirty = set()            # keys of tiles with edits in them
+        self.home = {}                # id -> key of the tile a mission in memory belongs to
+        self.rows = {}                # id -> file row of a mission in memory (None: not in the file)
+        self.edited = set()           # IDs whose missions differ from the file (saved from memory)
+        self.created = {}             # IDs that aren't in the file at all, in creation order
+        self.deleted = set()          # IDs in the file that were deleted
+        self.checked = set()          # checkmarks (missions come and go, these stay)
+        self.changes = 0              # edits so far (a save can tell if any came in while it ran)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._open(tree)
+
+    def _open(self, tree):
+        tree.index_tiles()
+        self.tree = tree
+        self.size = tree.tile_size
+        self.numbers = tree.tiles()   # tile key -> tile number in the file
+        self._wanted = []             # keys for the prefetch thread, nearest first
+        self._ready = {}              # key -> decode(key), done ahead of time
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="tile-prefetch", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the prefetch thread (before the file gets closed)."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join()
+
+    def rebind(self, tree):
+        """Carry on from another copy of the file (the same tree, saved): rows are looked up again."""
+        self.close()
+        self._open(tree)
+        self.rows = {mid: tree.row_of(mid) for mid in self.rows}
+        self.created = {mid: True for mid in self.created if self.rows.get(mid) is None}
+
+    # ---- tile keys ----
+    def key_of(self, x, y):
+        return tile_of(x, y, self.size)
+
+    def row_key(self, row):
+        return tile_of(self.tree.x[row], self.tree.y[row], self.size)
+
+    def keys_in(self, x, y, w, h):
+        """Keys of every tile overlapping the world rect, nearest to its middle first."""
+        x0, y0 = self.key_of(x, y)
+        x1, y1 = self.key_of(x + w, y + h)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        keys = [(tx, ty) for tx in range(x0, x1 + 1) for ty in range(y0, y1 + 1)]
+        keys.sort(key=lambda k: (k[0] - cx) ** 2 + (k[1] - cy) ** 2)
+        return keys
+
+    def ring(self, keys):
+        """The tiles around a block of keys (the next ones panning would need)."""
+        inside = set(keys)
+        out = {}
+        for tx, ty in keys:
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    key = (tx + dx, ty + dy)
+                    if key not in inside and key in self.numbers:
+                        out[key] = True
+        return list(out)
+
+    # ---- decoding (main thread, or ahead of time on the prefetch thread) ----
+    def decode_row(self, i):
+        """(row, id, x, y, text, type, color, logic, has details) of a file row."""
+        tree = self.tree
+        return (i, tree.id[i], tree.number(i, "x"), tree.number(i, "y"), tree.string(tree.text[i]),
+                tree.string(tree.type[i]), tree.string(tree.color[i]), tree.string(tree.logic[i]),
+                tree.has_details(i))
+
+    def decode(self, key):
+        """Decoded rows of a tile's missions, and of the missions linked to them."""
+        tree = self.tree
+        k = self.numbers.get(key)
+        if k is None:
+            return [], []
+        members = tree.tile_members(k)
+        inside = set(members)
+        linked = {}
+        for i in members:
+            for r in tree.dependency_rows(i):
+                if r != NO_ROW and r not in inside:
+                    linked[r] = True
+            for r in tree.dependent_rows(i):
+                if r not in inside:
+                    linked[r] = True
+        return [self.decode_row(i) for i in members], [self.decode_row(i) for i in linked]
+
+    def take(self, key):
+        """decode(key), from the prefetch thread if it got there first."""
+        with self._cond:
+            ready = self._ready.pop(key, None)
+        return ready if ready is not None else self.decode(key)
+
+    def prefetch(self, keys):
+        """Decode these tiles in the background (forgets earlier requests)."""
+        with self._cond:
+            self._wanted = [key for key in keys if key not in self.loaded and key not in self._ready]
+            wanted = set(keys)
+            for key in list(self._ready):
+                if key not in wanted:
+                    del self._ready[key]
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._wanted and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                key = self._wanted.pop(0)
+            decoded = self.decode(key)
+            with self._cond:
+                if key not in self.loaded:
+                    self._ready[key] = decoded
+
+    # ---- loaded tiles ----
+    def pin(self, key, ids):
+        """Keep ids in memory while the tile is loaded (the tile counts as loaded from now on)."""
+        pinned = self.loaded.get(key)
+        if pinned is None:
+            pinned = self.loaded[key] = set()
+        for mid in ids:
+            if mid not in pinned:
+                pinned.add(mid)
+                self.pins[mid] = self.pins.get(mid, 0) + 1
+
+    def unpin(self, key):
+        """Unload a tile. Returns the IDs nothing pins any more."""
+        free = []
+        for mid in self.loaded.pop(key, ()):
+            n = self.pins.get(mid, 0) - 1
+            if n > 0:
+                self.pins[mid] = n
+            else:
+                self.pins.pop(mid, None)
+                free.append(mid)
+        return free
+
+    def forget(self, mid):
+        """A deleted mission: nothing pins it any more."""
+        for pinned in self.loaded.values():
+            pinned.discard(mid)
+        self.pins.pop(mid, None)
+
+    def touch(self, key, mid):
+        """mid (in tile key) is being edited."""
+        self.dirty.add(key)
+        self.edited.add(mid)
+        self.changes += 1
+
+    def saved(self):
+        """Everything in memory is in the file now: start over with nothing loaded or edited
+        (main.py loads the tiles again, around the missions it already has)."""
+        self.loaded.clear()
+        self.pins.clear()
+        self.dirty.clear()
+        self.edited.clear()
+        self.created.clear()
+        self.deleted.clear()
+        self.home = {mid: self.row_key(row) for mid, row in self.rows.items()}
+
+    def seen(self, key):
+        self.loaded.move_to_end(key)
+
+    def victims(self, keep):
+        """Least recently seen clean tiles to unload, to get back down to capacity."""
+        extra = len(self.loaded) - self.capacity
+        out = []
+        for key in self.loaded:
+            if extra <= 0:
+                break
+            if key not in keep and key not in self.dirty:
+                out.append(key)
+                extra -= 1
+        return out
+
+
+def reaches(src, dst, forward, backward):
+    """True if following forward(id) from src gets to dst. Searches from both ends, always
+    growing the smaller side, so it's quick when either end has little around it."""
+    if src == dst:
+        return True
+    seen_fwd, seen_back = {src}, {dst}
+    front_fwd, front_back = [src], [dst]
+    while front_fwd and front_back:
+        if len(front_fwd) <= len(front_back):
+            front, seen, other, step = front_fwd, seen_fwd, seen_back, forward
+        else:
+            front, seen, other, step = front_back, seen_back, seen_fwd, backward
+        nxt = []
+        for u in front:
+            for v in step(u):
+                if v in other:
+                    return True
+                if v not in seen:
+                    seen.add(v)
+                    nxt.append(v)
+        if front is front_fwd:
+            front_fwd = nxt
+        else:
+            front_back = nxt
+    return False
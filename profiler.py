@@ -0,0 +1,120 @@
+# =====================================================================
+# PROFILER — per-frame timing spans, counters, Chrome trace dumps
+# =====================================================================
+# The main loop wraps each phase in a span:
+#   with profiler.span("events"):
+#       ...
+# and bumps counters (profiler.count("nodes")) in the hot paths. Every
+# finished frame keeps its total and per-phase times for the HUD's rolling
+# p50/p99; every span also goes into a bounded event buffer that can be
+# written out in the Chrome trace format (chrome://tracing, Perfetto,
+# speedscope all open it). Nothing here knows about pygame.
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ROLLING_FRAMES = 600       # frames the p50/p99 are taken over (10 s at 60 fps)
+MAX_EVENTS = 200000        # spans kept for the trace dump (oldest dropped first)
+IDLE_PHASES = ("wait",)    # time spent sleeping doesn't count towards the frame time
+
+
+def percentile(values, p):
+    """Nearest-rank percentile (p in 0..100) of a non-empty iterable."""
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))]
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start)
+        return False
+
+
+class Profiler:
+    def __init__(self, frames=ROLLING_FRAMES, max_events=MAX_EVENTS):
+        self.origin = time.perf_counter()
+        self.frame_times = deque(maxlen=frames)   # busy seconds per frame
+        self.phase_times = {}                     # phase -> deque of seconds per frame it ran in
+        self.frames = frames
+        self.events = deque(maxlen=max_events)    # trace events (dicts, Chrome format)
+        self.phases = {}                          # this frame: phase -> seconds
+        self.counters = {}                        # this frame: counter -> count
+        self.totals = {}                          # counter -> count over every frame so far
+        self.frame_start = self.origin
+        self.frame_count = 0
+        self.pid = os.getpid()
+
+    # ---- recording ----
+    def span(self, name):
+        return _Span(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add(self, name, start):
+        """Record a span that started at start (a perf_counter() value) and ends now.
+        For phases that are awkward to wrap in a with block."""
+        duration = time.perf_counter() - start
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+        self.events.append({"name": name, "ph": "X", "ts": (start - self.origin) * 1e6, "dur": duration * 1e6,
+                            "pid": self.pid, "tid": threading.get_ident()})
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+
+    def end_frame(self, keep=True):
+        """Close the frame. keep=False leaves it out of the rolling stats (an idle wake-up
+        with nothing to do would only drag the percentiles down); it still goes in the trace."""
+        end = time.perf_counter()
+        busy = end - self.frame_start - sum(self.phases.get(p, 0.0) for p in IDLE_PHASES)
+        if keep:
+            self.frame_times.append(busy)
+            for name, seconds in self.phases.items():
+                times = self.phase_times.get(name)
+                if times is None:
+                    times = self.phase_times[name] = deque(maxlen=self.frames)
+                times.append(seconds)
+            self.frame_count += 1
+        for name, n in self.counters.items():
+            self.totals[name] = self.totals.get(name, 0) + n
+        ts = (self.frame_start - self.origin) * 1e6
+        self.events.append({"name": "frame", "ph": "X", "ts": ts, "dur": (end - self.frame_start) * 1e6,
+                            "pid": self.pid, "tid": threading.get_ident(), "args": {"busy_ms": busy * 1000}})
+        if self.counters:
+            self.events.append({"name": "counters", "ph": "C", "ts": ts, "pid": self.pid,
+                                "args": dict(self.counters)})
+
+    # ---- reading ----
+    def summary(self):
+        """{"frame": (p50, p99), phase: (p50, p99), ...} in milliseconds, over the rolling window."""
+        out = {}
+        if self.frame_times:
+            out["frame"] = (percentile(self.frame_times, 50) * 1000, percentile(self.frame_times, 99) * 1000)
+        for name, times in self.phase_times.items():
+            if times:
+                out[name] = (percentile(times, 50) * 1000, percentile(times, 99) * 1000)
+        return out
+
+    def dump_chrome_trace(self, path):
+        """Write the buffered spans as a Chrome trace JSON file. Returns the number of events."""
+        events = list(self.events)
+        meta = {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": threading.get_ident(),
+                "args": {"name": "main loop"}}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": [meta] + events, "displayTimeUnit": "ms"}, f)
+        return len(events)
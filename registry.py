@@ -0,0 +1,63 @@
+# =====================================================================
+# MISSION REGISTRY
+# =====================================================================
+# Every mission in the tree, indexed by ID, plus the ID allocator.
+# Freed IDs go into a min-heap so the smallest one is reused first,
+# same as the old sorted free_ids list but O(log n) instead of a re-sort.
+import heapq
+
+
+class MissionRegistry:
+    def __init__(self):
+        self.by_id = {}      # id -> mission (dicts keep insertion order)
+        self.free_ids = []   # min-heap of IDs freed by deletes
+        self.next_id = 1
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, mid):
+        return mid in self.by_id
+
+    def get(self, mid, default=None):
+        return self.by_id.get(mid, default)
+
+    def clear(self):
+        self.by_id.clear()
+        self.free_ids.clear()
+        self.next_id = 1
+
+    def alloc_id(self):
+        """Smallest freed ID if there is one, otherwise the next fresh ID."""
+        while self.free_ids:
+            mid = heapq.heappop(self.free_ids)
+            if mid not in self.by_id:
+                return mid
+        mid = self.next_id
+        self.next_id += 1
+        return mid
+
+    def add(self, m):
+        self.by_id[m.id] = m
+        if m.id >= self.next_id:
+            self.next_id = m.id + 1
+
+    def remove(self, m):
+        if self.by_id.get(m.id) is m:
+            del self.by_id[m.id]
+            heapq.heappush(self.free_ids, m.id)
+
+    def reuse(self, mid):
+        """A freed ID is back in use (undo of a delete), so it isn't handed out again. Matters
+        once the mission is paged out: then it's not in by_id for alloc_id to see."""
+        if mid in self.free_ids:
+            self.free_ids.remove(mid)
+            heapq.heapify(self.free_ids)
+
+    def drop(self, m):
+        """Forget m without freeing its ID (a paged-out mission still exists on disk)."""
+        if self.by_id.get(m.id) is m:
+            del self.by_id[m.id]
@@ -0,0 +1,92 @@
+# =====================================================================
+# SEARCH INDEX — inverted index over the mission texts, no pygame
+# =====================================================================
+# Every mission's name and detail fields are split into lowercase words.
+# postings maps each word to the IDs containing it, and a sorted list of
+# all the words turns a prefix ("astro") into one bisect plus a walk over
+# the words that start with it. A query matches the missions that have a
+# word starting with each of its words. Updating a mission only touches
+# the words that changed, so nothing ever rescans the whole tree.
+import re
+from bisect import bisect_left, insort
+
+WORD_RE = re.compile(r"\w+")
+
+
+def words(text):
+    return WORD_RE.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}   # word -> set of mission IDs
+        self.words_of = {}   # mission ID -> frozenset of its words
+        self.sorted_words = []
+
+    def __len__(self):
+        return len(self.words_of)
+
+    def clear(self):
+        self.postings.clear()
+        self.words_of.clear()
+        self.sorted_words.clear()
+
+    def build(self, items):
+        """Index (id, texts) pairs in one go (a sort at the end instead of an insort per new word)."""
+        self.clear()
+        for mid, texts in items:
+            found = frozenset(w for t in texts for w in words(t))
+            self.words_of[mid] = found
+            for w in found:
+                ids = self.postings.get(w)
+                if ids is None:
+                    ids = self.postings[w] = set()
+                ids.add(mid)
+        self.sorted_words = sorted(self.postings)
+
+    def update(self, mid, texts):
+        """(Re)index one mission from its current texts."""
+        found = frozenset(w for t in texts for w in words(t))
+        old = self.words_of.get(mid, frozenset())
+        self.words_of[mid] = found
+        for w in old - found:
+            self._drop(w, mid)
+        for w in found - old:
+            ids = self.postings.get(w)
+            if ids is None:
+                ids = self.postings[w] = set()
+                insort(self.sorted_words, w)
+            ids.add(mid)
+
+    def remove(self, mid):
+        for w in self.words_of.pop(mid, ()):
+            self._drop(w, mid)
+
+    def _drop(self, w, mid):
+        ids = self.postings[w]
+        ids.discard(mid)
+        if not ids:
+            del self.postings[w]
+            del self.sorted_words[bisect_left(self.sorted_words, w)]
+
+    def prefix(self, p):
+        """IDs with a word starting with p."""
+        found = set()
+        i = bisect_left(self.sorted_words, p)
+        sorted_words = self.sorted_words
+        while i < len(sorted_words) and sorted_words[i].startswith(p):
+            found |= self.postings[sorted_words[i]]
+            i += 1
+        return found
+
+    def search(self, query):
+        """IDs matching every word of query as a prefix (empty query: nothing)."""
+        terms = sorted(set(words(query)), key=len, reverse=True)  # longest first: usually the fewest hits
+        if not terms:
+            return set()
+        found = self.prefix(terms[0])
+        for t in terms[1:]:
+            if not found:
+                break
+            found &= self.prefix(t)
+        return found
@@ -0,0 +1,166 @@
+# =====================================================================
+# SPATIAL GRID
+# =====================================================================
+# Uniform-grid spatial index. Items are any hashable object (missions,
+# (mission, dependency) link tuples, ...) stored under every cell their
+# rect or line segment touches, so a camera window only has to look at
+# the cells it covers instead of the whole tree.
+import math
+
+SMALL_BUCKET = 8   # cells with up to this many items keep them in a tuple, bigger ones in a set
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self.cells = {}        # (cx, cy) -> tuple (few items) or set of items
+        self.keys = {}         # (cx, cy) -> the same tuple, shared by every item in that cell
+        self.item_cells = {}   # item -> tuple of (cx, cy)
+        self.order = {}        # item -> insertion sequence (draw order)
+        self._seq = 0
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def __contains__(self, item):
+        return item in self.item_cells
+
+    def clear(self):
+        self.cells.clear()
+        self.keys.clear()
+        self.item_cells.clear()
+        self.order.clear()
+        self._seq = 0
+
+    # ---- cell helpers ----
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _rect_cells(self, x, y, w, h):
+        x0, y0 = self._cell(x, y)
+        x1, y1 = self._cell(x + w, y + h)
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def _segment_cells(self, start, end):
+        # Walk every cell the segment passes through (Amanatides & Woo)
+        cs = self.cell_size
+        x0, y0 = start
+        x1, y1 = end
+        cx, cy = self._cell(x0, y0)
+        ex, ey = self._cell(x1, y1)
+        cells = [(cx, cy)]
+
+        dx = x1 - x0
+        dy = y1 - y0
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        if dx:
+            next_x = (cx + (step_x > 0)) * cs
+            t_max_x = (next_x - x0) / dx
+            t_delta_x = cs / abs(dx)
+        else:
+            t_max_x = t_delta_x = math.inf
+        if dy:
+            next_y = (cy + (step_y > 0)) * cs
+            t_max_y = (next_y - y0) / dy
+            t_delta_y = cs / abs(dy)
+        else:
+            t_max_y = t_delta_y = math.inf
+
+        limit = abs(ex - cx) + abs(ey - cy)
+        for _ in range(limit):
+            if t_max_x < t_max_y:
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                cy += step_y
+                t_max_y += t_delta_y
+            cells.append((cx, cy))
+        return cells
+
+    # ---- insert / remove ----
+    def _store(self, item, cells):
+        if item in self.item_cells:
+            self._unstore(item)
+        else:
+            self._seq += 1
+            self.order[item] = self._seq
+        # Long links touch a lot of cells: keep one key tuple per cell instead of one per item.
+        # Most cells only ever see a handful of items, and a tuple is a fraction of a set's size.
+        keys = self.keys
+        all_cells = self.cells
+        shared = []
+        for key in cells:
+            bucket = all_cells.get(key)
+            if bucket is None:
+                keys[key] = key
+                shared.append(key)
+                all_cells[key] = (item,)
+                continue
+            shared.append(keys[key])
+            if type(bucket) is tuple:
+                if len(bucket) < SMALL_BUCKET:
+                    all_cells[key] = bucket + (item,)
+                else:
+                    bucket = all_cells[key] = set(bucket)
+                    bucket.add(item)
+            else:
+                bucket.add(item)
+        self.item_cells[item] = tuple(shared)
+
+    def _unstore(self, item):
+        for key in self.item_cells.pop(item, ()):
+            bucket = self.cells.get(key)
+            if bucket is None:
+                continue
+            if type(bucket) is tuple:
+                bucket = tuple([x for x in bucket if x != item])  # equal, not identical: link tuples
+                if bucket:
+                    self.cells[key] = bucket
+            else:
+                bucket.discard(item)
+            if not bucket:
+                del self.cells[key]
+                del self.keys[key]
+
+    def insert_rect(self, item, x, y, w, h):
+        """Insert (or move) an item covering the given rect."""
+        self._store(item, self._rect_cells(x, y, w, h))
+
+    def insert_segment(self, item, start, end):
+        """Insert (or move) an item covering the line segment start -> end."""
+        self._store(item, self._segment_cells(start, end))
+
+    def remove(self, item):
+        self._unstore(item)
+        self.order.pop(item, None)
+
+    # ---- queries ----
+    def query_rect(self, x, y, w, h):
+        """Every item stored in a cell overlapping the rect (a superset of exact hits)."""
+        x0, y0 = self._cell(x, y)
+        x1, y1 = self._cell(x + w, y + h)
+        found = set()
+
+        # Huge window over a sparse grid: walk the occupied cells instead
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            for (cx, cy), bucket in self.cells.items():
+                if x0 <= cx <= x1 and y0 <= cy <= y1:
+                    found.update(bucket)
+            return found
+
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    def query_point(self, x, y):
+        """Items stored in the cell under the point (candidates, not exact hits)."""
+        return self.cells.get(self._cell(x, y), ())
+
+    def in_order(self, items):
+        """Sort items by insertion order (first inserted first)."""
+        order = self.order
+        return sorted(items, key=order.__getitem__)
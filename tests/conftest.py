@@ -0,0 +1,37 @@
+# =====================================================================
+# TEST SETUP — the repo root on sys.path, pygame without a window
+# =====================================================================
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+def rec(mid, deps=(), x=0, y=0, task="", **fields):
+    """A mission record as the files have it; fields overrides any top-level key."""
+    r = {"id": mid, "x": x, "y": y, "text": f"Mission {mid}", "type": "normal", "color": "#3FA9F5",
+         "logic": "AND", "dependencies": list(deps), "mission": {"desc": "", "task": task, "item": "", "rwrd": ""}}
+    r.update(fields)
+    return r
+
+
+@pytest.fixture
+def app(tmp_path):
+    """main.py with fonts and a dummy window, journaling into tmp_path, starting from an empty tree."""
+    pygame = pytest.importorskip("pygame")
+    import main
+    from journal import Journal
+    pygame.init()
+    main.init_fonts()
+    if main.screen is None:
+        main.screen = pygame.display.set_mode((main.WIDTH, main.HEIGHT))
+    main.journal = Journal(str(tmp_path / "journal"))
+    main.clear_tree()
+    main.set_zoom(1.0, (0, 0))
+    main.camera_x = main.camera_y = 0
+    yield main
+    main.clear_tree()
@@ -0,0 +1,31 @@
+import importlib
+import sys
+
+import pytest
+
+pytest.importorskip("pygame")
+
+import bench
+
+
+def test_imports_without_resource(monkeypatch):
+    monkeypatch.setitem(sys.modules, "resource", None)   # what Windows has
+    try:
+        assert importlib.reload(bench).resource is None
+    finally:
+        monkeypatch.undo()
+        importlib.reload(bench)
+
+
+def test_generate_tree_is_repeatable():
+    assert bench.generate_tree(200) == bench.generate_tree(200)
+    ids = {r["id"] for r in bench.generate_tree(200)}
+    assert all(d in ids for r in bench.generate_tree(200) for d in r["dependencies"])
+
+
+def test_compare_flags_what_got_worse():
+    old = {"results": {"load_s": 1.0, "frames": {"p50": 10.0, "max": 10.0}}}
+    new = {"results": {"load_s": 1.5, "frames": {"p50": 8.0, "max": 50.0}, "only_new": 3}}
+    lines, worse = bench.compare(old, new)
+    assert worse == 1   # load_s; .max is too noisy to count, only_new has nothing to compare with
+    assert len(lines) == 3
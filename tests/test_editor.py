@@ -0,0 +1,95 @@
+# main.py's editing functions, headless (see the app fixture in conftest.py).
+from conftest import rec
+
+
+def test_reach_is_worked_out_once_per_tree_change(app):
+    app.build_tree([rec(1, task="(Resin,5,collect)"), rec(2, [1], task="(Resin,1,collect)"), rec(3, [2])])
+    reach = app.mission_reach(app.missions.get(3))
+    assert reach.missions == 3
+    assert reach.tasks == {("Resin", "collect"): 6}
+    assert set(app.reach_cache) == {1, 2, 3}   # the walk from 3 answered for 1 and 2 as well
+    assert app.mission_reach(app.missions.get(2)) is app.reach_cache[2]
+
+    app.set_details(app.missions.get(1), {"task": "(Resin,7,collect)"})
+    assert not app.reach_cache
+    assert app.mission_reach(app.missions.get(3)).tasks == {("Resin", "collect"): 8}
+
+    app.apply_edit(app.missions.get(3), dict(app.edit_state(app.missions.get(3)), deps=[]))
+    assert app.mission_reach(app.missions.get(3)).missions == 1
+
+
+def tree(app):
+    return sorted(((m.record(), m.checked) for m in app.missions), key=lambda r: r[0]["id"])
+
+
+def delete(app, mid):
+    """A right-click delete."""
+    m = app.missions.get(mid)
+    step = {"op": "delete", "rec": m.record(), "slots": app.dependent_slots(m), "checked": m.checked}
+    app.delete_mission(m)
+    app.history.push(step)
+
+
+def test_undo_redo_round_trip(app):
+    app.history.clear()
+    app.build_tree([rec(1), rec(2), rec(3), rec(4, [1, 2, 3], x=50), rec(5, [2, 2])])
+    app.set_checked(app.missions.get(2), True)
+    start = tree(app)
+
+    m = app.create_mission(300, 300)
+    app.history.push({"op": "create", "rec": m.record()})
+    delete(app, 2)   # in the middle of 4's list, twice in 5's
+    m4 = app.missions.get(4)
+    before = app.edit_state(m4)
+    app.apply_edit(m4, dict(before, text="Boss", deps=[3, m.id]))
+    app.history.push({"op": "edit", "id": 4, "before": before, "after": app.edit_state(m4)})
+    app.set_position(m4, 80, 90)
+    app.history.push({"op": "move", "id": 4, "before": (50, 0), "after": (80, 90)})
+    app.set_details(m4, {"rwrd": "gold"})
+    app.history.push({"op": "details", "id": 4, "before": rec(4)["mission"], "after": dict(m4.mission)})
+    end = tree(app)
+
+    for _ in range(5):
+        app.undo()
+    assert tree(app) == start
+    assert [d.id for d in app.missions.get(5).dependencies] == [2, 2]
+    assert app.missions.get(4).done_deps == 1   # 2 came back checked
+    assert app.graph.level(4) == 1 and app.graph.check_deps(2, [4]) == ["4 already depends on 2 (cycle)"]
+    app.undo()   # nothing left to undo
+    assert tree(app) == start
+
+    for _ in range(5):
+        app.redo()
+    assert tree(app) == end
+    assert app.missions.get(2) is None and app.missions.alloc_id() == 2
+
+    app.undo()
+    app.history.push({"op": "move", "id": 4, "before": (80, 90), "after": (80, 90)})
+    assert not app.history.redo_steps   # a new edit drops what could be redone
+
+
+def key(k=0, text=""):
+    import pygame
+    return pygame.event.Event(pygame.KEYDOWN, key=k, unicode=text, mod=0)
+
+
+def test_deps_field_that_isnt_ids_is_refused(app):
+    import pygame
+    app.build_tree([rec(1), rec(2), rec(3, [1])])
+    m3 = app.missions.get(3)
+    editor = app.Editor(m3)
+    editor.current_field = editor.fields.index("deps")
+
+    editor.handle_event(key(text="²"))   # isdigit() but not int()
+    assert editor.deps_problems == ["'1²' isn't an ID"]
+    editor.deps_buffer = "1,abc"
+    editor.check_deps()
+    assert editor.deps_problems == ["'abc' isn't an ID"]
+    editor.handle_event(key(pygame.K_RETURN, "\r"))
+    assert editor.active and [d.id for d in m3.dependencies] == [1]
+
+    editor.deps_buffer = " 2, 1,"
+    editor.check_deps()
+    assert editor.deps_problems == []
+    editor.handle_event(key(pygame.K_RETURN, "\r"))
+    assert not editor.active and [d.id for d in m3.dependencies] == [2, 1]
@@ -0,0 +1,83 @@
+import random
+from collections import Counter
+
+from graph import DepGraph
+
+
+def reaches(edges, src, dst):
+    seen = {src}
+    stack = [src]
+    while stack:
+        u = stack.pop()
+        for (a, b), n in edges.items():
+            if a == u and n and b not in seen:
+                seen.add(b)
+                stack.append(b)
+    return dst in seen
+
+
+def check(g, nodes, edges):
+    """g, built up edit by edit, says what a graph built from scratch says."""
+    fresh = DepGraph()
+    fresh.rebuild((mid, [a for (a, b), n in edges.items() if b == mid for _ in range(n)]) for mid in nodes)
+    assert set(g.succ) == set(nodes)
+    assert sorted(g.cycles()) == sorted(fresh.cycles())
+    for mid in nodes:
+        assert g.level(mid) == fresh.level(mid)
+    for (a, b), n in edges.items():
+        if n and not (g.on_cycle(a) and g.comp[a] == g.comp[b]):
+            assert g.order_key(a) < g.order_key(b)
+    for a in nodes:
+        for b in nodes:
+            assert g.reaches(a, b) == (a == b or reaches(edges, a, b))
+
+
+def test_incremental_matches_rebuild():
+    rng = random.Random(4)
+    for _ in range(20):
+        g = DepGraph()
+        nodes = []
+        edges = Counter()
+        for step in range(120):
+            r = rng.random()
+            if r < 0.2 or len(nodes) < 2:
+                mid = max(nodes, default=0) + 1
+                nodes.append(mid)
+                g.add_node(mid)
+            elif r < 0.7:
+                a, b = rng.sample(nodes, 2)
+                if rng.random() < 0.8 and reaches(edges, b, a):
+                    a, b = b, a   # mostly edits the editor would allow, some cycles like a loaded file has
+                g.add_edge(a, b)
+                edges[(a, b)] += 1
+            elif r < 0.9:
+                links = sorted(e for e, n in edges.items() if n)
+                if links:
+                    a, b = rng.choice(links)
+                    g.remove_edge(a, b)
+                    edges[(a, b)] -= 1
+            else:
+                mid = rng.choice(nodes)
+                g.remove_node(mid)
+                nodes.remove(mid)
+                edges = Counter({e: n for e, n in edges.items() if mid not in e})
+            if step % 10 == 0:
+                check(g, nodes, edges)
+        check(g, nodes, edges)
+
+
+def test_check_deps():
+    g = DepGraph()
+    g.rebuild([(1, []), (2, [1]), (3, [2])])
+    assert g.check_deps(3, [1, 2]) == []
+    assert g.check_deps(1, [3]) == ["3 already depends on 1 (cycle)"]
+    assert g.check_deps(2, [2, 1, 1, 9]) == ["can't depend on itself", "1 listed twice", "no mission 9"]
+
+
+def test_cycle_from_a_file_falls_apart_when_a_link_goes():
+    g = DepGraph()
+    g.rebuild([(1, [3]), (2, [1]), (3, [2]), (4, [3])])
+    assert g.cycles() == [[1, 2, 3]] and g.on_cycle(2)
+    g.remove_edge(3, 1)
+    assert g.cycles() == [] and [g.level(mid) for mid in (1, 2, 3, 4)] == [0, 1, 2, 3]
+    assert g.topo_order() == [1, 2, 3, 4]
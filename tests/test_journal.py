@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+import tree_io
+from conftest import rec
+from journal import Journal, JournalError, apply_op
+
+EDITS = [
+    {"op": "create", "rec": rec(1)},
+    {"op": "create", "rec": rec(2, [1])},
+    {"op": "create", "rec": rec(3, [1, 2])},
+    {"op": "move", "id": 2, "x": 40, "y": -8},
+    {"op": "edit", "id": 3, "fields": {"text": "boss", "logic": "OR"}},
+    {"op": "details", "id": 2, "mission": {"rwrd": "gold"}},
+    {"op": "check", "id": 2, "checked": True},
+    {"op": "check", "id": 1, "checked": True},
+    {"op": "delete", "id": 1, "dependents": [2, 3]},
+    {"op": "deps", "id": 3, "deps": [2]},
+    {"op": "move", "id": 99, "x": 0, "y": 0},   # gone already: ignored
+]
+
+
+def replayed(ops=EDITS):
+    tree, checked = {}, set()
+    for op in ops:
+        apply_op(tree, checked, op)
+    return tree, checked
+
+
+def test_apply_op():
+    tree, checked = replayed()
+    assert sorted(tree) == [2, 3]
+    assert (tree[2]["x"], tree[2]["y"], tree[2]["dependencies"]) == (40, -8, [])
+    assert tree[2]["mission"] == {"desc": "", "task": "", "item": "", "rwrd": "gold"}
+    assert (tree[3]["text"], tree[3]["logic"], tree[3]["dependencies"]) == ("boss", "OR", [2])
+    assert checked == {2}
+
+
+def record(journal, ops):
+    for op in ops:
+        journal.record(op)
+    journal.flush()
+
+
+def test_recover_replays_the_edits(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.begin({"base": "empty"})
+    record(journal, EDITS)
+    journal.close()
+    assert Journal(str(tmp_path)).has_recovery()
+    records, checked = Journal(str(tmp_path)).recover()
+    assert ({r["id"]: r for r in records}, checked) == replayed()
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = Journal(str(tmp_path))
+    gen = journal.begin({"base": "empty"})
+    record(journal, EDITS[:3])
+    journal.close()
+    with open(journal._path("journal", gen), "a") as f:
+        f.write('{"op": "delete", "id"')   # the crash hit mid-write
+    records, _ = Journal(str(tmp_path)).recover()
+    assert sorted(r["id"] for r in records) == [1, 2, 3]
+
+
+def test_file_base(tmp_path):
+    path = str(tmp_path / "tree.json")
+    tree_io.save_records([rec(1), rec(2, [1])], path)
+    journal = Journal(str(tmp_path / "journal"))
+    journal.begin_file(path)
+    assert not journal.has_recovery()   # a file with no edits on top: nothing to offer
+    record(journal, [{"op": "move", "id": 2, "x": 5, "y": 5}])
+    journal.close()
+    records, _ = Journal(journal.folder).recover()
+    assert [(r["id"], r["x"]) for r in records] == [(1, 0), (2, 5)]
+
+    # the file changed behind the journal's back: its edits don't apply to it any more
+    tree_io.save_records([rec(1)], path)
+    os.utime(path, (1, 1))
+    with pytest.raises(JournalError):
+        Journal(journal.folder).recover()
+
+
+def test_unfinished_save_falls_back_to_the_generation_before(tmp_path):
+    path = str(tmp_path / "tree.json")
+    journal = Journal(str(tmp_path / "journal"))
+    journal.begin({"base": "empty"})
+    record(journal, EDITS[:3])
+    gen = journal.begin({"base": "save", "path": path})
+    record(journal, [{"op": "delete", "id": 3, "dependents": []}])
+    journal.close()
+    # no confirm_save: whatever is at path can't be trusted
+    records, _ = Journal(journal.folder).recover()
+    assert sorted(r["id"] for r in records) == [1, 2]
+
+    tree_io.save_records([rec(1), rec(2, [1]), rec(3, [1, 2])], path)
+    journal.confirm_save(gen, path)
+    assert journal._gens() == [gen]
+    records, _ = Journal(journal.folder).recover()
+    assert sorted(r["id"] for r in records) == [1, 2]
+
+
+def test_compaction(tmp_path):
+    journal = Journal(str(tmp_path))
+    first = journal.begin({"base": "empty"})
+    record(journal, EDITS[:8])
+    journal.compact()
+    journal.jobs.join()
+    gen = journal.gen
+    assert os.path.exists(journal._path("snapshot", gen))
+    assert journal._gens() == [gen] and first < gen
+    record(journal, EDITS[8:])
+    journal.close()
+    records, checked = Journal(str(tmp_path)).recover()
+    assert ({r["id"]: r for r in records}, checked) == replayed()
@@ -0,0 +1,62 @@
+# main.py's load_file, headless (see the app fixture in conftest.py).
+import os
+
+import pytest
+
+import tree_io
+from journal import Journal
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Examples", "astroneer.anrmt")
+
+
+def records(app):
+    return sorted((m.record() for m in app.missions), key=lambda r: r["id"])
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_broken_file_leaves_the_open_tree_alone(app, tmp_path, binary):
+    app.load_file(EXAMPLE)
+    m = app.create_mission(-500, -500)
+    app.history.push({"op": "create", "rec": m.record()})
+    before = records(app)
+    gen = app.journal.gen
+
+    good = str(tmp_path / ("tree.anrmtb" if binary else "tree.anrmt"))
+    tree_io.save_records(tree_io.load_records(EXAMPLE), good)
+    broken = tmp_path / ("broken.anrmtb" if binary else "broken.anrmt")
+    with open(good, "rb") as f:
+        broken.write_bytes(f.read()[:5000])
+    app.load_file(str(broken))
+
+    assert app.save_message.startswith("Load failed")
+    assert records(app) == before
+    assert m in app.node_index.query_rect(m.rect.x, m.rect.y, 1, 1)
+    assert app.graph.check_deps(m.id, [1]) == [] and len(app.history.undo_steps) == 1
+    assert app.journal.gen == gen   # still journaling on top of the example
+    app.journal.flush()
+    recovered, _ = Journal(app.journal.folder).recover()
+    assert len(recovered) == len(before)
+
+    app.load_file(good)
+    assert records(app) == tree_io.load_records(EXAMPLE)
+    assert not app.history.undo_steps and app.journal.gen > gen
+
+
+GOOD = '{"id": 1, "x": 0, "y": 0, "text": "a", "type": "normal", "color": "#3FA9F5", "dependencies": []}'
+
+
+@pytest.mark.parametrize("content, error", [
+    (b'[' + GOOD.encode() + b', {"id": 2, "text": "\xff"}]', "not UTF-8"),
+    (b'[' + GOOD.replace('"id": 1', '"id": "1"').encode() + b']', "id must be an integer"),
+    (b'[' + GOOD.replace('[]', '["1"]').encode() + b']', "dependencies must be mission ids"),
+    (b'[' + GOOD.replace('"x": 0', '"x": NaN').encode() + b']', "x must be a number"),
+    (b'[' + GOOD.replace('"a"', 'null').encode() + b']', "text must be a string"),
+])
+def test_bad_records_are_load_errors(app, tmp_path, content, error):
+    path = tmp_path / "bad.anrmt"
+    path.write_bytes(content)
+    with pytest.raises(tree_io.TreeFileError, match=error):
+        tree_io.load_records(str(path))
+    app.load_file(str(path))
+    assert app.save_message.startswith("Load failed") and error in app.save_message
+    assert len(app.missions) == 0
@@ -0,0 +1,128 @@
+# Paged mode (paging.py + main.py's PAGED CANVAS) on a tree small enough to build in a test:
+# the paging threshold and cache are turned down so a few thousand missions get paged.
+import os
+import random
+
+import pytest
+
+pytest.importorskip("pygame")   # bench.py draws with it
+
+import bench
+import tree_io
+
+
+def open_paged(app, monkeypatch, path, nodes=3000):
+    monkeypatch.setattr(app, "PAGED_MIN_MISSIONS", 1000)
+    monkeypatch.setattr(app, "PAGE_CACHE", 4)
+    if not os.path.exists(path):
+        tree_io.save_records(bench.generate_tree(nodes), path, binary=True)
+    app.load_file(path)
+    assert app.pager is not None
+    look_at(app, 0, 0)
+
+
+def look_at(app, x, y):
+    """Put the camera on world (x, y) and let the pager catch up."""
+    app.camera_x, app.camera_y = -x, -y
+    for _ in range(50):
+        app.update_pages()
+
+
+def save(app, path):
+    """What Ctrl+S does in paged mode, without the background thread."""
+    records, target, then = app.paged_save(path)
+    tree_io.save_records(records, target, binary=path.endswith(".anrmtb"))
+    if then is not None:
+        then()
+
+
+def test_restored_id_is_not_handed_out_again(app, monkeypatch, tmp_path):
+    path = str(tmp_path / "tree.anrmtb")
+    open_paged(app, monkeypatch, path)
+    m = app.find_mission(5)
+    rec, slots = m.record(), app.dependent_slots(m)
+    app.delete_mission(m)
+    app.restore_mission(rec, slots)   # undo
+    save(app, path)
+    for x, y in ((6000, 0), (12000, 3000), (12000, 6000), (6000, 6000)):
+        look_at(app, x, y)
+    assert 5 not in app.missions   # paged out, but still in the file
+
+    new = app.create_mission(12000, 6000)
+    assert new.id != 5
+    assert app.pager.tree.row_of(new.id) is None
+    save(app, path)
+    ids = [r["id"] for r in tree_io.load_records(path)]
+    assert len(ids) == len(set(ids))
+
+
+def random_session(app, seed, nodes):
+    """Deletes, dependency edits, moves, undos and redos (and panning around), the same in both modes."""
+    rng = random.Random(seed)
+    for _ in range(150):
+        if rng.random() < 0.3:
+            look_at(app, rng.randrange(14000), rng.randrange(7000))
+        kind = rng.random()
+        if kind < 0.15:
+            app.undo()
+            continue
+        if kind < 0.25:
+            app.redo()
+            continue
+        m = app.find_mission(rng.randrange(1, nodes + 1))
+        if m is None:
+            continue
+        if kind < 0.5:
+            step = {"op": "delete", "rec": m.record(), "slots": app.dependent_slots(m), "checked": m.checked}
+            app.delete_mission(m)
+        elif kind < 0.8:
+            before = app.edit_state(m)
+            deps = [d for d in before["deps"] if rng.random() < 0.7]
+            extra = rng.randrange(1, m.id) if m.id > 1 else None   # lower IDs: no cycles in a bench tree
+            if extra is not None and extra not in deps and app.find_mission(extra) is not None:
+                deps.insert(rng.randrange(len(deps) + 1), extra)
+            after = dict(before, deps=deps)
+            app.apply_edit(m, after)
+            step = {"op": "edit", "id": m.id, "before": before, "after": after}
+        else:
+            before = (m.x, m.y)
+            app.set_position(m, m.x + rng.randrange(-300, 300), m.y + rng.randrange(-300, 300))
+            step = {"op": "move", "id": m.id, "before": before, "after": (m.x, m.y)}
+        app.history.push(step)
+    return {r["id"]: r for r in (app.paged_records() if app.pager is not None else
+                                 (m.record() for m in app.missions))}
+
+
+def test_paged_edits_match_in_memory_ones(app, monkeypatch, tmp_path):
+    nodes = 4000
+    path = str(tmp_path / "tree.anrmtb")
+    tree_io.save_records(bench.generate_tree(nodes), path, binary=True)
+    for seed in range(4):
+        app.load_file(path)
+        assert app.pager is None
+        in_memory = random_session(app, seed, nodes)
+        with monkeypatch.context() as patch:
+            open_paged(app, patch, path, nodes)
+            paged = random_session(app, seed, nodes)
+        assert paged == in_memory, seed
+
+
+def test_undo_delete_puts_links_back_in_place(app, monkeypatch, tmp_path):
+    path = str(tmp_path / "tree.anrmtb")
+    open_paged(app, monkeypatch, path)
+    records = {r["id"]: r for r in tree_io.load_records(path)}
+    # a mission with a dependent that's only in memory as a ghost, missing a dependency listed before it
+    for m in list(app.missions):
+        if not app.is_full(m):
+            continue
+        ghost = next((dep for dep in m.dependents if not app.is_full(dep) and any(
+            d not in app.missions for d in records[dep.id]["dependencies"][:records[dep.id]["dependencies"].index(m.id)])),
+            None)
+        if ghost is not None:
+            break
+    assert ghost is not None
+    rec, slots = m.record(), app.dependent_slots(m)
+    app.delete_mission(m)
+    app.restore_mission(rec, slots)
+    restored = {r["id"]: r for r in app.paged_records()}
+    assert restored[ghost.id]["dependencies"] == records[ghost.id]["dependencies"]
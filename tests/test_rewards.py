@@ -0,0 +1,66 @@
+import rewards
+
+
+def test_parse_details_keeps_good_entries_and_lists_bad_ones():
+    tasks, rwrds, problems = rewards.parse_details(
+        {"task": "(Resin,50,collect),(Probe,x,build)", "rwrd": "(Bytes,200,)"})
+    assert tasks == [rewards.Task("Resin", 50, "collect")]
+    assert rwrds == [rewards.Reward("Bytes", 200, "")]
+    assert problems == ["tasks entry 2: count 'x' is not a whole number"]
+
+
+def brute_force(deps, logic, own, mid):
+    """Missions reaching mid takes (AND: all dependencies, OR: the chosen one), walked naively."""
+    reach = rewards.aggregate(deps, logic, own)
+    need = {mid}
+    todo = [mid]
+    while todo:
+        x = todo.pop()
+        ds = [reach[x].via] if reach[x].via is not None else deps[x]
+        for d in ds:
+            if d not in need:
+                need.add(d)
+                todo.append(d)
+    return need
+
+
+def test_shared_prerequisites_count_once():
+    #   1   2
+    #    \ / \
+    #     3   4
+    #      \ /
+    #       5
+    deps = {1: [], 2: [], 3: [1, 2], 4: [2], 5: [3, 4]}
+    own = {mid: ({("Resin", "collect"): mid}, {}) for mid in deps}
+    reach = rewards.aggregate(deps, {}, own)
+    assert reach[5].missions == 5
+    assert reach[5].tasks == {("Resin", "collect"): 1 + 2 + 3 + 4 + 5}
+    assert brute_force(deps, {}, own, 5) == {1, 2, 3, 4, 5}
+
+
+def test_or_goes_through_the_cheapest_dependency():
+    deps = {1: [], 2: [], 3: [1, 2]}
+    own = {1: ({("a", ""): 10}, {}), 2: ({("a", ""): 1}, {}), 3: ({}, {})}
+    reach = rewards.aggregate(deps, {3: "OR"}, own)
+    assert reach[3].via == 2
+    assert reach[3].tasks == {("a", ""): 1}
+    assert reach[3].missions == 2
+
+
+def test_cycles_get_no_totals():
+    reach = rewards.aggregate({1: [2], 2: [1], 3: []}, {}, {})
+    assert 1 not in reach and 2 not in reach
+    assert reach[3].missions == 1
+
+
+def test_separate_groups_add_up_like_one_tree():
+    # the same little tree twice, under different IDs: bitsets are per group, totals must not mix
+    one = {1: [], 2: [1], 3: [1, 2], 4: [3]}
+    both = dict(one)
+    both.update({mid + 10: [d + 10 for d in ds] for mid, ds in one.items()})
+    own = {mid: ({("x", ""): 1}, {}) for mid in both}
+    alone = rewards.aggregate(one, {}, own)
+    together = rewards.aggregate(both, {}, own)
+    for mid in one:
+        assert together[mid] == alone[mid]
+        assert together[mid + 10].missions == alone[mid].missions
@@ -0,0 +1,67 @@
+import io
+
+import pytest
+
+import cli
+import tree_bin
+import tree_io
+from conftest import rec
+
+
+def write(tmp_path, records, name="tree.anrmtb"):
+    path = str(tmp_path / name)
+    tree_io.save_records(records, path)
+    return path
+
+
+def test_round_trip(tmp_path):
+    records = [rec(1, x=10, y=-20.5), rec(2, [1], x=5000, y=3, mission={"desc": "d", "task": "é", "item": "",
+                                                                          "rwrd": "100 gold"}),
+               rec(7, [2, 1, 99])]
+    path = write(tmp_path, records)
+    assert tree_bin.is_binary_file(path)
+    assert tree_io.load_records(path) == records
+    assert isinstance(tree_io.load_records(path)[0]["x"], int)   # ints stay ints, floats stay floats
+
+
+def test_tile_index(tmp_path):
+    records = [rec(3, x=0, y=0), rec(1, [3], x=3 * tree_bin.TILE_SIZE, y=0), rec(2, [1, 42], x=10, y=10)]
+    with tree_bin.BinaryTree(write(tmp_path, records)) as tree:
+        tree.index_tiles()
+        tiles = tree.tiles()
+        assert set(tiles) == {(0, 0), (3, 0)}
+        assert sorted(tree.tile_members(tiles[(0, 0)])) == [0, 2]
+        assert [tree.row_of(mid) for mid in (1, 2, 3, 4)] == [1, 2, 0, None]
+        assert list(tree.dependency_rows(2)) == [1, tree_bin.NO_ROW]
+        assert list(tree.dependent_rows(1)) == [2]
+        assert tree.max_id() == 3
+
+
+def test_broken_files(tmp_path):
+    path = write(tmp_path, [rec(1), rec(2, [1])])
+    with open(path, "rb") as f:
+        data = f.read()
+    for name, content in (("empty", b""), ("header", data[:10]), ("columns", data[:60]),
+                          ("magic", b"X" + data[1:])):
+        broken = tmp_path / name
+        broken.write_bytes(content)
+        with pytest.raises(tree_io.TreeFileError):
+            tree_io.load_records(str(broken))
+
+
+@pytest.mark.parametrize("change", [{"id": "5"}, {"id": 1.5}, {"id": True}, {"id": 2 ** 63},
+                                    {"dependencies": ["1"]}, {"dependencies": [None]}, {"dependencies": 1},
+                                    {"x": "0"}, {"text": 5}])
+def test_wrong_types_are_format_errors(tmp_path, change):
+    with pytest.raises(tree_bin.BinaryFormatError):
+        tree_bin.write_binary([rec(1), rec(2, [1], **change)], io.BytesIO())
+
+
+def test_convert_reports_bad_input(tmp_path, capsys):
+    src = tmp_path / "tree.json"
+    src.write_text('[{"id": 9223372036854775808, "x": 0, "y": 0, "text": "", "type": "Main", "color": "gold",'
+                   ' "logic": "AND", "dependencies": [], "mission": {}}]')   # 2 ** 63: fine in JSON, not in int64
+    out = tmp_path / "tree.anrmtb"
+    assert cli.main(["convert", str(src), str(out)]) == 2
+    assert "mission id must be a 64-bit integer" in capsys.readouterr().err
+    assert not out.exists() and list(tmp_path.iterdir()) == [src]
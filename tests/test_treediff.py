@@ -0,0 +1,75 @@
+import copy
+
+import tree_io
+import treediff
+from conftest import rec
+
+BASE = [rec(1), rec(2, [1]), rec(3, [1, 2]), rec(4, [3])]
+
+
+def edited(*changes):
+    """BASE with (id, key, value) changes; value None deletes the mission."""
+    records = {r["id"]: r for r in copy.deepcopy(BASE)}
+    for mid, key, value in changes:
+        if value is None:
+            del records[mid]
+        elif mid not in records:
+            records[mid] = value
+        elif key in tree_io.MISSION_FIELDS:
+            records[mid]["mission"][key] = value
+        else:
+            records[mid][key] = value
+    return list(records.values())
+
+
+def test_diff():
+    new = edited((1, "text", "start"), (3, "dependencies", [2, 5]), (4, None, None), (5, "", rec(5)),
+                 (2, "x", 7))
+    d = treediff.diff(BASE, new)
+    assert d.added == [5] and d.removed == [4]
+    assert d.changed == {1: ["text"], 2: ["position"], 3: ["dependencies"]}
+    assert sorted(d.links_added) == [(5, 3)]
+    assert sorted(d.links_removed) == [(1, 3), (3, 4)]
+    assert treediff.summary(d) == "+1 -1 ~3 missions, +1 -2 links"
+    assert treediff.summary(treediff.diff(BASE, copy.deepcopy(BASE))) == "no differences"
+
+
+def by_id(records):
+    return {r["id"]: r for r in records}
+
+
+def test_merge_takes_both_sides():
+    ours = edited((1, "text", "start"), (3, "dependencies", [1, 2, 4]), (5, "", rec(5, [1])))
+    theirs = edited((2, "rwrd", "gold"), (3, "dependencies", [2]), (1, "text", "start"), (6, "", rec(6)))
+    merged, conflicts = treediff.merge3(BASE, ours, theirs)
+    assert conflicts == []
+    assert [r["id"] for r in merged] == [1, 2, 3, 4, 5, 6]   # ours' order, then theirs' new ones
+    merged = by_id(merged)
+    assert merged[1]["text"] == "start"
+    assert merged[2]["mission"]["rwrd"] == "gold"
+    assert merged[3]["dependencies"] == [2, 4]   # they dropped 1, we added 4
+    assert merged[3]["text"] == "Mission 3"
+
+
+def test_merge_conflicts():
+    ours = edited((1, "text", "ours"), (2, "x", 10), (3, None, None), (4, "desc", "ours"))
+    theirs = edited((1, "text", "theirs"), (2, "x", 20), (3, "text", "kept"), (4, None, None))
+    merged, conflicts = treediff.merge3(BASE, ours, theirs)
+    merged = by_id(merged)
+    assert merged[1]["text"] == treediff.conflict_marker("ours", "theirs")
+    assert merged[2]["x"] == 10   # a position can't hold markers: ours
+    assert merged[3]["text"] == "kept" and merged[4]["mission"]["desc"] == "ours"
+    assert sorted((c.id, c.field) for c in conflicts) == [(1, "text"), (2, "position"), (3, "mission"),
+                                                          (4, "mission")]
+    assert tree_io.validate_records(list(merged.values()))   # markers left in
+
+
+def test_merge_drops_links_to_deleted_missions():
+    ours = edited((2, None, None))
+    theirs = edited((4, "dependencies", [3, 2]))
+    merged, conflicts = treediff.merge3(BASE, ours, theirs)
+    merged = by_id(merged)
+    assert 2 not in merged
+    assert merged[3]["dependencies"] == [1] and merged[4]["dependencies"] == [3]
+    assert sorted((c.id, c.field, c.base) for c in conflicts) == [(3, "link", 2), (4, "link", 2)]
+    assert all(treediff.describe_conflict(c) for c in conflicts)
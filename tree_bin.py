@@ -0,0 +1,368 @@
+# =====================================================================
+# BINARY .anrmtb FILES — columns + string table, opened with mmap
+# =====================================================================
+# Layout (little-endian, every section padded to 8 bytes):
+#   header        magic, mission count, dependency count, string count, blob size
+#   id            int64   per mission
+#   x, y          float64 per mission
+#   text, type, color, logic, desc, task, item, rwrd
+#                 uint32 string-table index per mission (0 is always "")
+#   flags         uint8 per mission (bit 0/1: x/y were ints in the JSON)
+#   dep_offsets   uint64 per mission + 1   (CSR: deps of i are dep_ids[off[i]:off[i+1]])
+#   dep_ids       int64 per dependency
+#   str_offsets   uint64 per string + 1
+#   blob          utf-8 bytes of every distinct string
+# Repeated strings (colors, types, empty detail blocks...) are stored once.
+#
+# After the blob comes a tile index, for opening huge trees a region at a time
+# (older readers just stop before it; files without one get it built on open):
+#   header        magic, tile size, tile count, missions in tiles, link count
+#   tile_x, tile_y  int32 per tile, sorted (tile = floor(x / size), floor(y / size))
+#   tile_offsets  uint32 per tile + 1      (rows of tile k: tile_rows[off[k]:off[k+1]])
+#   tile_rows     uint32 per mission       (duplicate IDs, which a load skips, left out)
+#   dep_rows      uint32 per dependency    (the row dep_ids points at, NO_ROW if none)
+#   rev_offsets   uint32 per mission + 1   (CSR of the dependents, same as the deps)
+#   rev_rows      uint32 per link
+#   id_rows       uint32 per tiled mission, sorted by ID (a lookup is a bisect)
+import math
+import mmap
+import struct
+import sys
+from array import array
+
+MAGIC = b"ANRMTB\x00\x01"
+HEADER = struct.Struct("<8sQQQQ")
+TILE_MAGIC = b"ANRTILE\x01"
+TILE_HEADER = struct.Struct("<8sQQQQ")
+TILE_SIZE = 2048    # world px per tile side
+NO_ROW = 0xFFFFFFFF
+STRING_COLUMNS = ("text", "type", "color", "logic", "desc", "task", "item", "rwrd")
+DETAIL_COLUMNS = ("desc", "task", "item", "rwrd")
+
+FLAG_X_INT = 1
+FLAG_Y_INT = 2
+
+
+class BinaryFormatError(Exception):
+    pass
+
+
+def is_binary_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _pad(n):
+    return (8 - n % 8) % 8
+
+
+def _layout(n, n_deps, n_strings):
+    """(name, typecode, count) of every column, in file order."""
+    cols = [("id", "q", n), ("x", "d", n), ("y", "d", n)]
+    cols += [(name, "I", n) for name in STRING_COLUMNS]
+    cols += [("flags", "B", n), ("dep_offsets", "Q", n + 1), ("dep_ids", "q", n_deps),
+             ("str_offsets", "Q", n_strings + 1)]
+    return cols
+
+
+def _tile_layout(n, n_deps, n_tiles, n_tiled, n_links):
+    return [("tile_x", "i", n_tiles), ("tile_y", "i", n_tiles), ("tile_offsets", "I", n_tiles + 1),
+            ("tile_rows", "I", n_tiled), ("dep_rows", "I", n_deps), ("rev_offsets", "I", n + 1),
+            ("rev_rows", "I", n_links), ("id_rows", "I", n_tiled)]
+
+
+def tile_of(x, y, size=TILE_SIZE):
+    """(column, row) of the tile the point x, y falls in."""
+    return math.floor(x / size), math.floor(y / size)
+
+
+def tile_columns(ids, xs, ys, dep_offsets, dep_ids, size=TILE_SIZE):
+    """The tile index columns (see the layout above) of a tree's id, x, y and dependency columns."""
+    n = len(ids)
+    row_of = dict(zip(reversed(ids), range(n - 1, -1, -1)))  # first row of every ID wins, like a load
+    rows = sorted(row_of.values())
+
+    tiles = {}
+    for i in rows:
+        key = tile_of(xs[i], ys[i], size)
+        members = tiles.get(key)
+        if members is None:
+            tiles[key] = [i]
+        else:
+            members.append(i)
+    cols = {name: array(code) for name, code, _ in _tile_layout(0, 0, 0, 0, 0)}
+    cols["tile_offsets"].append(0)
+    for key in sorted(tiles):
+        cols["tile_x"].append(key[0])
+        cols["tile_y"].append(key[1])
+        cols["tile_rows"].extend(tiles[key])
+        cols["tile_offsets"].append(len(cols["tile_rows"]))
+
+    dep_rows = cols["dep_rows"]
+    dep_rows.extend(row_of.get(d, NO_ROW) for d in dep_ids)
+
+    # Dependents: count per row, then fill (rows come out in file order)
+    rev_offsets = cols["rev_offsets"] = array("I", [0]) * (n + 1)
+    for i in rows:
+        for k in range(dep_offsets[i], dep_offsets[i + 1]):
+            r = dep_rows[k]
+            if r != NO_ROW:
+                rev_offsets[r + 1] += 1
+    for i in range(n):
+        rev_offsets[i + 1] += rev_offsets[i]
+    fill = rev_offsets[:-1]
+    rev_rows = cols["rev_rows"] = array("I", [0]) * rev_offsets[n]
+    for i in rows:
+        for k in range(dep_offsets[i], dep_offsets[i + 1]):
+            r = dep_rows[k]
+            if r != NO_ROW:
+                rev_rows[fill[r]] = i
+                fill[r] += 1
+
+    cols["id_rows"].extend(sorted(rows, key=ids.__getitem__))
+    return cols
+
+
+# =====================================================================
+# WRITE
+# =====================================================================
+def write_binary(records, f):
+    """Write records to a file opened in binary mode."""
+    strings = {"": 0}
+    columns = {name: array(code) for name, code, _ in _layout(0, 0, 0)}
+
+    def intern(s, what):
+        if not isinstance(s, str):
+            raise BinaryFormatError(f"{what} must be a string, got {s!r}")
+        idx = strings.get(s)
+        if idx is None:
+            idx = strings[s] = len(strings)
+        return idx
+
+    def check_id(value, what):
+        if isinstance(value, bool) or not isinstance(value, int) or not -2 ** 63 <= value < 2 ** 63:
+            raise BinaryFormatError(f"{what} must be a 64-bit integer, got {value!r}")
+        return value
+
+    columns["dep_offsets"].append(0)
+    for r in records:
+        mid = check_id(r["id"], "mission id")
+        columns["id"].append(mid)
+        flags = 0
+        for key, flag in (("x", FLAG_X_INT), ("y", FLAG_Y_INT)):
+            value = r[key]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise BinaryFormatError(f"mission {mid}: {key} must be a number")
+            if isinstance(value, int):
+                flags |= flag
+            columns[key].append(float(value))
+        columns["flags"].append(flags)
+
+        for name in ("text", "type", "color", "logic"):
+            columns[name].append(intern(r[name], f"mission {mid}: {name}"))
+        for name in DETAIL_COLUMNS:
+            columns[name].append(intern(r["mission"].get(name, ""), f"mission {mid}: mission.{name}"))
+
+        deps = r["dependencies"]
+        if not isinstance(deps, (list, tuple)):
+            raise BinaryFormatError(f"mission {mid}: dependencies must be a list, got {deps!r}")
+        columns["dep_ids"].extend(check_id(d, f"mission {mid}: dependency") for d in deps)
+        columns["dep_offsets"].append(len(columns["dep_ids"]))
+
+    blob = bytearray()
+    offsets = columns["str_offsets"]
+    offsets.append(0)
+    for s in strings:  # dicts keep insertion order = index order
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+
+    tiles = tile_columns(columns["id"], columns["x"], columns["y"], columns["dep_offsets"], columns["dep_ids"])
+
+    # records may be any iterable (a paged tree streams them), so count what came in
+    f.write(HEADER.pack(MAGIC, len(columns["id"]), len(columns["dep_ids"]), len(strings), len(blob)))
+    _write_columns(f, columns, _layout(0, 0, 0))
+    f.write(blob)
+    f.write(b"\0" * _pad(len(blob)))
+    f.write(TILE_HEADER.pack(TILE_MAGIC, TILE_SIZE, len(tiles["tile_x"]), len(tiles["tile_rows"]),
+                             len(tiles["rev_rows"])))
+    _write_columns(f, tiles, _tile_layout(0, 0, 0, 0, 0))
+
+
+def _write_columns(f, columns, layout):
+    for name, _, _ in layout:
+        col = columns[name]
+        if sys.byteorder != "little":
+            col.byteswap()
+        data = col.tobytes()
+        f.write(data)
+        f.write(b"\0" * _pad(len(data)))
+
+
+# =====================================================================
+# READ (mmap, strings decoded on demand)
+# =====================================================================
+class BinaryTree:
+    """A memory-mapped .anrmtb file. Columns are zero-copy views into the map."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise BinaryFormatError(f"{path}: empty file")
+        self._views = []
+
+        try:
+            magic, n, n_deps, n_strings, blob_size = HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            self.close()
+            raise BinaryFormatError(f"{path}: truncated header")
+        if magic != MAGIC:
+            self.close()
+            raise BinaryFormatError(f"{path}: not a binary mission tree")
+
+        self.count = n
+        pos = HEADER.size
+        for name, code, count in _layout(n, n_deps, n_strings):
+            size = struct.calcsize(code) * count
+            if pos + size > len(self._map):
+                self.close()
+                raise BinaryFormatError(f"{path}: truncated {name} column")
+            setattr(self, name, self._column(pos, size, code))
+            pos += size + _pad(size)
+        if pos + blob_size > len(self._map):
+            self.close()
+            raise BinaryFormatError(f"{path}: truncated string table")
+        self._blob = pos
+
+        # The tile index, if the file has one (a broken one gets rebuilt by index_tiles)
+        self.tile_size = None
+        pos += blob_size + _pad(blob_size)
+        try:
+            magic, tile_size, n_tiles, n_tiled, n_links = TILE_HEADER.unpack_from(self._map, pos)
+        except struct.error:
+            return
+        if magic != TILE_MAGIC:
+            return
+        pos += TILE_HEADER.size
+        for name, code, count in _tile_layout(n, n_deps, n_tiles, n_tiled, n_links):
+            size = struct.calcsize(code) * count
+            if pos + size > len(self._map):
+                return
+            setattr(self, name, self._column(pos, size, code))
+            pos += size + _pad(size)
+        self.tile_size = tile_size
+
+    def _column(self, pos, size, code):
+        if sys.byteorder != "little":
+            col = array(code, self._map[pos:pos + size])
+            col.byteswap()
+            return col
+        raw = memoryview(self._map)[pos:pos + size]
+        view = raw.cast(code)
+        self._views += [view, raw]
+        return view
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    # ---- per-mission access ----
+    def string(self, idx):
+        if idx == 0:
+            return ""
+        start = self._blob + self.str_offsets[idx]
+        end = self._blob + self.str_offsets[idx + 1]
+        try:
+            return self._map[start:end].decode("utf-8")
+        except UnicodeDecodeError as ex:
+            raise BinaryFormatError(f"{self.path}: string {idx} isn't UTF-8 ({ex.reason})")
+
+    def number(self, i, key):
+        value = (self.x if key == "x" else self.y)[i]
+        flag = FLAG_X_INT if key == "x" else FLAG_Y_INT
+        return int(value) if self.flags[i] & flag else value
+
+    def dependencies(self, i):
+        return list(self.dep_ids[self.dep_offsets[i]:self.dep_offsets[i + 1]])
+
+    def has_details(self, i):
+        """False when every detail field of mission i is empty (nothing to decode)."""
+        return any(getattr(self, name)[i] for name in DETAIL_COLUMNS)
+
+    def details(self, i):
+        """The mission block of mission i (only decoded when asked for)."""
+        return {name: self.string(getattr(self, name)[i]) for name in DETAIL_COLUMNS}
+
+    def record(self, i):
+        return {
+            "id": self.id[i],
+            "x": self.number(i, "x"),
+            "y": self.number(i, "y"),
+            "text": self.string(self.text[i]),
+            "type": self.string(self.type[i]),
+            "color": self.string(self.color[i]),
+            "logic": self.string(self.logic[i]),
+            "dependencies": self.dependencies(i),
+            "mission": self.details(i),
+        }
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.record(i)
+
+    # ---- tile index (call index_tiles() first) ----
+    def index_tiles(self):
+        """Make sure the tile index is there: files without one get it built in memory."""
+        if self.tile_size is None:
+            for name, col in tile_columns(self.id, self.x, self.y, self.dep_offsets, self.dep_ids).items():
+                setattr(self, name, col)
+            self.tile_size = TILE_SIZE
+
+    def tiles(self):
+        """(column, row) -> tile number, for every tile with missions in it."""
+        return {key: k for k, key in enumerate(zip(self.tile_x, self.tile_y))}
+
+    def tile_members(self, k):
+        return self.tile_rows[self.tile_offsets[k]:self.tile_offsets[k + 1]]
+
+    def dependency_rows(self, i):
+        """Rows of mission i's dependencies, in order (NO_ROW for an ID that isn't in the file)."""
+        return self.dep_rows[self.dep_offsets[i]:self.dep_offsets[i + 1]]
+
+    def dependent_rows(self, i):
+        return self.rev_rows[self.rev_offsets[i]:self.rev_offsets[i + 1]]
+
+    def row_of(self, mid):
+        """File row of mission mid, or None if it isn't in the file."""
+        rows = self.id_rows
+        ids = self.id
+        lo, hi = 0, len(rows)
+        while lo < hi:
+            half = (lo + hi) // 2
+            if ids[rows[half]] < mid:
+                lo = half + 1
+            else:
+                hi = half
+        if lo < len(rows) and ids[rows[lo]] == mid:
+            return rows[lo]
+        return None
+
+    def max_id(self):
+        return self.id[self.id_rows[-1]] if len(self.id_rows) else 0
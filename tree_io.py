@@ -0,0 +1,344 @@
+# =====================================================================
+# .anrmt FILES — plain records, no pygame / tkinter
+# =====================================================================
+# A mission tree on disk is a JSON list of records like:
+#   {"id": 1, "x": 419, "y": 126, "text": "Planetfall", "type": "special",
+#    "color": "#3FA9F5", "logic": "AND", "dependencies": [],
+#    "mission": {"desc": "", "task": "", "item": "", "rwrd": ""}}
+# Both the editor and the headless CLI go through these helpers. Files in
+# the binary .anrmtb container (tree_bin.py) are detected and handled too.
+import codecs
+import json
+import math
+import os
+import shutil
+from collections import Counter, deque
+
+import rewards
+import tree_bin
+
+MISSION_FIELDS = ("desc", "task", "item", "rwrd")
+MISSION_TYPES = ("normal", "special")
+LOGIC_TYPES = ("AND", "OR")
+# What treediff.merge3 puts around both versions of a name/detail both sides changed
+CONFLICT_START, CONFLICT_SEP, CONFLICT_END = "<<<<<<<", "=======", ">>>>>>>"
+
+
+class TreeFileError(Exception):
+    """The file isn't a mission tree we can read."""
+
+
+def normalize_record(raw):
+    """Fill in the optional keys (logic, mission block) the same way the editor does.
+    Values the editor couldn't even hold (an id that isn't a number...) are a TreeFileError."""
+    block = raw.get("mission") or {}
+    r = {
+        "id": raw["id"],
+        "x": raw["x"],
+        "y": raw["y"],
+        "text": raw["text"],
+        "type": raw["type"],
+        "color": raw["color"],
+        "logic": raw.get("logic", "AND"),
+        "dependencies": list(raw.get("dependencies", [])),
+        "mission": {field: block.get(field, "") for field in MISSION_FIELDS},
+    }
+    _check_types(r)
+    return r
+
+
+def _check_types(r):
+    mid = r["id"]
+    if isinstance(mid, bool) or not isinstance(mid, int):
+        raise TreeFileError(f"mission id must be an integer, got {mid!r}")
+    for key in ("x", "y"):
+        value = r[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise TreeFileError(f"mission {mid}: {key} must be a number, got {value!r}")
+    for dep in r["dependencies"]:
+        if isinstance(dep, bool) or not isinstance(dep, int):
+            raise TreeFileError(f"mission {mid}: dependencies must be mission ids, got {dep!r}")
+    for key in ("text", "type", "color", "logic"):
+        if not isinstance(r[key], str):
+            raise TreeFileError(f"mission {mid}: {key} must be a string, got {r[key]!r}")
+    for field in MISSION_FIELDS:
+        if not isinstance(r["mission"][field], str):
+            raise TreeFileError(f"mission {mid}: mission.{field} must be a string, got {r['mission'][field]!r}")
+
+
+def is_binary_path(path):
+    return path.lower().endswith(".anrmtb")
+
+
+def iter_records(path, progress=None, chunk_size=1 << 16):
+    """Stream normalized records out of the top-level JSON list, one at a time.
+
+    Only the current chunk and record are held in memory. progress, if given,
+    is called as progress(bytes_read, total_bytes) after every chunk.
+    """
+    if tree_bin.is_binary_file(path):
+        yield from _iter_binary_records(path, progress)
+        return
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    total = os.path.getsize(path)
+    done = 0
+    buf = ""
+    pos = 0
+    eof = False
+
+    with open(path, "rb") as f:
+        def read_more():
+            nonlocal buf, pos, done, eof
+            chunk = f.read(chunk_size)
+            done += len(chunk)
+            eof = not chunk
+            try:
+                buf = buf[pos:] + utf8.decode(chunk, final=eof)
+            except UnicodeDecodeError as ex:
+                raise TreeFileError(f"{path}: not UTF-8 text ({ex.reason} near byte {done - len(chunk) + ex.start})")
+            pos = 0
+            if progress is not None:
+                progress(done, total)
+
+        def skip_space():
+            # skip whitespace up to the next token, reading more if needed
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                read_more()
+
+        skip_space()
+        if pos >= len(buf) or buf[pos] != "[":
+            raise TreeFileError(f"{path}: expected a list of missions")
+        pos += 1
+
+        first = True
+        while True:
+            skip_space()
+            if pos >= len(buf):
+                raise TreeFileError(f"{path}: file ends in the middle of the mission list")
+            if buf[pos] == "]":
+                return
+            if not first:
+                if buf[pos] != ",":
+                    raise TreeFileError(f"{path}: expected ',' between missions")
+                pos += 1
+                skip_space()
+            first = False
+
+            while True:
+                try:
+                    raw, end = decoder.raw_decode(buf, pos)
+                    break
+                except ValueError as ex:
+                    if eof:
+                        raise TreeFileError(f"{path}: not valid JSON ({ex})")
+                    read_more()
+            pos = end
+
+            try:
+                yield normalize_record(raw)
+            except (KeyError, TypeError, AttributeError) as ex:
+                raise TreeFileError(f"{path}: malformed mission record ({ex!r})")
+            except TreeFileError as ex:
+                raise TreeFileError(f"{path}: {ex}")
+
+
+def _iter_binary_records(path, progress):
+    try:
+        with tree_bin.BinaryTree(path) as tree:
+            total = os.path.getsize(path)
+            for i in range(len(tree)):
+                if progress is not None and i % 4096 == 0:
+                    progress(total * i // len(tree), total)
+                yield tree.record(i)
+    except tree_bin.BinaryFormatError as ex:
+        raise TreeFileError(str(ex))
+    if progress is not None:
+        progress(total, total)
+
+
+def load_records(path):
+    return list(iter_records(path))
+
+
+def save_records(records, path, compact=False, binary=None):
+    """Write records as JSON, or as .anrmtb when binary is set (default: by extension).
+
+    Everything goes to a temp file next to path that is then renamed over it,
+    so a crash halfway through never leaves a half-written tree behind.
+    """
+    if binary is None:
+        binary = is_binary_path(path)
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp, "wb" if binary else "w") as f:
+            if binary:
+                tree_bin.write_binary(records, f)
+            elif not isinstance(records, list):
+                _dump_streamed(records, f, compact)
+            elif compact:
+                json.dump(records, f, separators=(",", ":"))
+            else:
+                json.dump(records, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except tree_bin.BinaryFormatError as ex:
+        _remove_quietly(tmp)
+        raise TreeFileError(f"{path}: {ex}")
+    except BaseException:
+        _remove_quietly(tmp)
+        raise
+
+
+def _dump_streamed(records, f, compact):
+    """The same text json.dump writes, one record at a time (a paged tree streams its records)."""
+    first = True
+    for r in records:
+        if compact:
+            f.write("[" if first else ",")
+            f.write(json.dumps(r, separators=(",", ":")))
+        else:
+            f.write("[\n    " if first else ",\n    ")
+            f.write(json.dumps(r, indent=4).replace("\n", "\n    "))
+        first = False
+    f.write("[]" if first else "]" if compact else "\n]")
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# =====================================================================
+# VALIDATION + STATS
+# =====================================================================
+def _is_hex_color(color):
+    digits = color[1:]
+    return len(digits) in (3, 6, 8) and all(c in "0123456789abcdefABCDEF" for c in digits)
+
+
+def find_cycle_ids(records):
+    """IDs of missions that sit on (or behind) a dependency cycle, via Kahn's algorithm."""
+    ids = {r["id"] for r in records}
+    indegree = {r["id"]: 0 for r in records}
+    dependents = {r["id"]: [] for r in records}
+    for r in records:
+        for dep in set(r["dependencies"]):
+            if dep in ids and dep != r["id"]:
+                indegree[r["id"]] += 1
+                dependents[dep].append(r["id"])
+
+    queue = deque(mid for mid, n in indegree.items() if n == 0)
+    while queue:
+        mid = queue.popleft()
+        for nxt in dependents[mid]:
+            indegree[nxt] -= 1
+            if indegree[nxt] == 0:
+                queue.append(nxt)
+    return sorted(mid for mid, n in indegree.items() if n > 0)
+
+
+def validate_records(records):
+    """List of human-readable problems (empty list = the tree is fine)."""
+    problems = []
+    seen = set()
+    ids = {r["id"] for r in records if isinstance(r["id"], int)}
+
+    for r in records:
+        mid = r["id"]
+        where = f"mission {mid!r}"
+        if not isinstance(mid, int) or isinstance(mid, bool) or mid < 1:
+            problems.append(f"{where}: id must be a positive integer")
+        elif mid in seen:
+            problems.append(f"{where}: duplicate id")
+        seen.add(mid)
+
+        for key in ("x", "y"):
+            if not isinstance(r[key], (int, float)) or isinstance(r[key], bool):
+                problems.append(f"{where}: {key} must be a number")
+        if not isinstance(r["text"], str):
+            problems.append(f"{where}: text must be a string")
+        if r["type"] not in MISSION_TYPES:
+            problems.append(f"{where}: unknown type {r['type']!r}")
+        if r["logic"] not in LOGIC_TYPES:
+            problems.append(f"{where}: unknown logic {r['logic']!r}")
+        if not isinstance(r["color"], str) or (r["color"].startswith("#") and not _is_hex_color(r["color"])):
+            problems.append(f"{where}: bad color {r['color']!r}")
+        for field in MISSION_FIELDS:
+            if not isinstance(r["mission"][field], str):
+                problems.append(f"{where}: mission.{field} must be a string")
+        for key, value in [("text", r["text"])] + [(f"mission.{f}", r["mission"][f]) for f in MISSION_FIELDS]:
+            if isinstance(value, str) and CONFLICT_START in value:
+                problems.append(f"{where}: unresolved merge conflict in {key}")
+        if isinstance(r["mission"]["task"], str) and isinstance(r["mission"]["rwrd"], str):
+            for p in rewards.parse_details(r["mission"])[2]:
+                problems.append(f"{where}: {p}")
+
+        deps_seen = set()
+        for dep in r["dependencies"]:
+            if dep == mid:
+                problems.append(f"{where}: depends on itself")
+            elif dep in deps_seen:
+                problems.append(f"{where}: dependency {dep!r} listed twice")
+            elif dep not in ids:
+                problems.append(f"{where}: dependency {dep!r} does not exist")
+            deps_seen.add(dep)
+
+    cycle = find_cycle_ids([r for r in records if isinstance(r["id"], int)])
+    if cycle:
+        problems.append(f"dependency cycle through missions {', '.join(map(str, cycle))}")
+    return problems
+
+
+def tree_stats(records):
+    ids = {r["id"] for r in records}
+    links = [(r["id"], d) for r in records for d in r["dependencies"] if d in ids]
+    has_dependents = {d for _, d in links}
+
+    stats = {
+        "missions": len(records),
+        "links": len(links),
+        "roots": sum(1 for r in records if not any(d in ids for d in r["dependencies"])),
+        "leaves": sum(1 for r in records if r["id"] not in has_dependents),
+        "types": dict(Counter(r["type"] for r in records)),
+        "logic": dict(Counter(r["logic"] for r in records)),
+        "with_details": sum(1 for r in records if any(r["mission"].values())),
+        "longest_chain": None,
+    }
+    if records:
+        xs = [r["x"] for r in records]
+        ys = [r["y"] for r in records]
+        stats["bounds"] = [min(xs), min(ys), max(xs), max(ys)]
+
+    # Longest prerequisite chain (only meaningful without cycles)
+    if not find_cycle_ids(records):
+        by_id = {r["id"]: r for r in records}
+        depth = {}
+        for r in records:
+            stack = [r["id"]]
+            while stack:
+                mid = stack[-1]
+                if mid in depth:
+                    stack.pop()
+                    continue
+                deps = [d for d in by_id[mid]["dependencies"] if d in by_id and d != mid]
+                todo = [d for d in deps if d not in depth]
+                if todo:
+                    stack.extend(todo)
+                else:
+                    depth[mid] = 1 + max((depth[d] for d in deps), default=0)
+                    stack.pop()
+        stats["longest_chain"] = max(depth.values(), default=0)
+    return stats
@@ -0,0 +1,174 @@
+# =====================================================================
+# TREE DIFF + THREE-WAY MERGE — records matched by id, no pygame
+# =====================================================================
+# Every record gets a fingerprint: the hash of its fields and dependency
+# list. Two versions of a mission with the same fingerprint count as the
+# same, so an unchanged mission costs a dict lookup and an int compare and
+# only the changed ones are looked at field by field. Two 100k mission trees
+# diff in under a second; reading the files takes longer.
+#
+# merge3 goes field by field, the way a text merge goes line by line: a
+# field changed on one side takes that change, the same change on both
+# sides is taken once, and two different changes are a conflict. Dependency
+# lists merge as sets of links (a link added on either side is kept, one
+# removed on either side goes), so they never conflict. In a conflicting
+# name or detail field both versions end up in the value between markers:
+#   <<<<<<< ours ======= theirs >>>>>>>
+# (tree_io.validate_records complains until they're gone). Position, type,
+# color and logic can't hold markers, so they keep ours.
+from collections import namedtuple
+
+from tree_io import CONFLICT_END, CONFLICT_SEP, CONFLICT_START, MISSION_FIELDS
+
+FIELDS = ("position", "text", "type", "color", "logic", "dependencies") + MISSION_FIELDS
+TEXT_FIELDS = ("text",) + MISSION_FIELDS  # the ones conflict markers can go in
+
+# added / removed: ids; changed: id -> names of the fields that differ;
+# links_added / links_removed: (dependency, mission) pairs
+Diff = namedtuple("Diff", "added removed changed links_added links_removed")
+# One field both sides changed differently, values as in field_values. Two special
+# fields: "mission" (deleted on one side, changed on the other; the deleted side is
+# None) and "link" (base: a dependency that no longer exists, so the link was dropped).
+Conflict = namedtuple("Conflict", "id field base ours theirs")
+
+
+def field_values(r):
+    """A record as a tuple in FIELDS order (hashable)."""
+    block = r["mission"]
+    return ((r["x"], r["y"]), r["text"], r["type"], r["color"], r["logic"],
+            tuple(r["dependencies"])) + tuple(block[field] for field in MISSION_FIELDS)
+
+
+def fingerprints(records):
+    """id -> hash of the record's fields."""
+    return {r["id"]: hash(field_values(r)) for r in records}
+
+
+def _record(mid, values):
+    (x, y), text, mtype, color, logic, deps = values[:6]
+    return {"id": mid, "x": x, "y": y, "text": text, "type": mtype, "color": color, "logic": logic,
+            "dependencies": list(deps), "mission": dict(zip(MISSION_FIELDS, values[6:]))}
+
+
+def diff(old, new):
+    """What changed from the old records to the new ones."""
+    old_by_id = {r["id"]: r for r in old}
+    new_by_id = {r["id"]: r for r in new}
+    old_prints = fingerprints(old)
+    added = [mid for mid in new_by_id if mid not in old_by_id]
+    removed = [mid for mid in old_by_id if mid not in new_by_id]
+    changed = {}
+    links_added = [(d, mid) for mid in added for d in dict.fromkeys(new_by_id[mid]["dependencies"])]
+    links_removed = [(d, mid) for mid in removed for d in dict.fromkeys(old_by_id[mid]["dependencies"])]
+
+    for r in new:
+        mid = r["id"]
+        if mid not in old_by_id:
+            continue
+        a = field_values(r)
+        if hash(a) == old_prints[mid]:
+            continue
+        b = field_values(old_by_id[mid])
+        changed[mid] = [name for name, x, y in zip(FIELDS, b, a) if x != y]
+        if a[5] != b[5]:
+            before = set(b[5])
+            after = set(a[5])
+            links_added += [(d, mid) for d in dict.fromkeys(a[5]) if d not in before]
+            links_removed += [(d, mid) for d in dict.fromkeys(b[5]) if d not in after]
+    return Diff(added, removed, changed, links_added, links_removed)
+
+
+def summary(d):
+    """"+3 -1 ~5 missions, +4 -2 links" ("no differences" when there are none)."""
+    if not (d.added or d.removed or d.changed or d.links_added or d.links_removed):
+        return "no differences"
+    return (f"+{len(d.added)} -{len(d.removed)} ~{len(d.changed)} missions, "
+            f"+{len(d.links_added)} -{len(d.links_removed)} links")
+
+
+def conflict_marker(ours, theirs):
+    return f"{CONFLICT_START} {ours} {CONFLICT_SEP} {theirs} {CONFLICT_END}"
+
+
+def _merge_links(base, ours, theirs):
+    """Dependency lists merged as link sets, in ours' order, then theirs' new ones."""
+    base, ours_set, theirs_set = set(base), set(ours), set(theirs)
+    kept = [d for d in ours if d in theirs_set or d not in base]
+    return tuple(dict.fromkeys(kept + [d for d in theirs if d not in ours_set and d not in base]))
+
+
+def _merge_fields(mid, base, ours, theirs, conflicts):
+    """Field-by-field merge of two changed versions (base None: both sides added the id)."""
+    merged = []
+    for i, name in enumerate(FIELDS):
+        o = ours[i]
+        t = theirs[i]
+        b = base[i] if base is not None else None
+        if o == t or t == b:
+            merged.append(o)
+        elif o == b:
+            merged.append(t)
+        elif name == "dependencies":
+            merged.append(_merge_links(b or (), o, t))
+        else:
+            conflicts.append(Conflict(mid, name, b, o, t))
+            merged.append(conflict_marker(o, t) if name in TEXT_FIELDS else o)
+    return tuple(merged)
+
+
+def merge3(base, ours, theirs):
+    """Three-way merge of record lists. Returns (records, [Conflict, ...]).
+
+    Records come out in ours' order, followed by the ones only theirs has.
+    Links to a mission that ended up deleted are dropped (a "link" conflict).
+    """
+    base_by_id = {r["id"]: r for r in base}
+    ours_by_id = {r["id"]: r for r in ours}
+    theirs_by_id = {r["id"]: r for r in theirs}
+    base_prints = fingerprints(base)
+    theirs_prints = fingerprints(theirs)
+    conflicts = []
+    merged = {}
+
+    for mid in list(ours_by_id) + [mid for mid in theirs_by_id if mid not in ours_by_id]:
+        o = ours_by_id.get(mid)
+        t = theirs_by_id.get(mid)
+        b = base_by_id.get(mid)
+        ov = field_values(o) if o is not None else None
+        oh = hash(ov) if ov is not None else None
+        th = theirs_prints.get(mid)
+        bh = base_prints.get(mid)
+
+        if oh == th or th == bh:      # theirs has nothing new
+            if o is not None:
+                merged[mid] = ov
+        elif oh == bh:                # ours has nothing new
+            if t is not None:
+                merged[mid] = field_values(t)
+        elif o is None or t is None:  # deleted on one side, changed on the other: keep the change
+            kept = o if o is not None else t
+            merged[mid] = field_values(kept)
+            conflicts.append(Conflict(mid, "mission", b, o, t))
+        else:
+            bv = field_values(b) if b is not None else None
+            merged[mid] = _merge_fields(mid, bv, ov, field_values(t), conflicts)
+
+    records = []
+    for mid, values in merged.items():
+        deps = values[5]
+        if any(d not in merged for d in deps):
+            conflicts += [Conflict(mid, "link", d, None, None) for d in deps if d not in merged]
+            values = values[:5] + (tuple(d for d in deps if d in merged),) + values[6:]
+        records.append(_record(mid, values))
+    return records, conflicts
+
+
+def describe_conflict(c):
+    """One line for a Conflict."""
+    if c.field == "mission":
+        side = "we deleted it, they changed it" if c.ours is None else "we changed it, they deleted it"
+        return f"mission {c.id}: {side} (the changed version was kept)"
+    if c.field == "link":
+        return f"mission {c.id}: dependency {c.base} is gone (deleted on one side), link dropped"
+    kept = "both kept in markers" if c.field in TEXT_FIELDS else "kept ours"
+    return f"mission {c.id}: {c.field} changed on both sides: {c.ours!r} / {c.theirs!r} ({kept})"